@@ -0,0 +1,143 @@
+import os
+import threading
+import numpy as np
+
+
+class KerasBackend:
+    """Serve the full Keras .h5 model.
+
+    uint8 batches go through a wrapper that rescales to [0, 1] inside the
+    graph, so callers never build a float32 copy of the pixels.
+    """
+
+    name = "keras"
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+        inputs = tf.keras.Input(shape=self.model.input_shape[1:], dtype="uint8")
+        outputs = self.model(tf.keras.layers.Rescaling(1.0 / 255)(inputs), training=False)
+        self.uint8_model = tf.keras.Model(inputs, outputs, name="pawscan_uint8_input")
+        # Distilled variants from src/distill.py take 128-192 px inputs instead of 224
+        self.input_size = int(self.model.input_shape[1])
+
+    def predict(self, x):
+        model = self.uint8_model if x.dtype == np.uint8 else self.model
+        return model.predict(x, batch_size=len(x), verbose=0)
+
+
+def _load_interpreter(model_path, num_threads):
+    # Prefer the standalone runtime when installed; it avoids importing all of TensorFlow
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+class TFLiteBackend:
+    """Serve a float16 or full-INT8 .tflite model produced by src/convert_tflite.py.
+
+    Inputs are float32 in [0, 1] or raw uint8 pixels and outputs are float32
+    probabilities, so quantized models are a drop-in replacement for the Keras
+    backend. The INT8 model's uint8 input uses scale 1/255, so raw pixels are
+    fed to it without any conversion.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.interpreter = _load_interpreter(model_path, self.num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        self.input_size = int(self._input["shape"][1])
+        # The interpreter is not thread-safe
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            shape = list(self._input["shape"])
+            shape[0] = batch_size
+            self.interpreter.resize_tensor_input(self._input["index"], shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+
+    def _quantize(self, x):
+        dtype = self._input["dtype"]
+        scale, zero_point = self._input["quantization"]
+        if x.dtype == np.uint8:
+            if dtype == np.uint8 and zero_point == 0 and abs(scale * 255 - 1) < 1e-6:
+                return x
+            x = x.astype(np.float32) / 255.0
+        if dtype == np.float32:
+            return x.astype(np.float32, copy=False)
+        info = np.iinfo(dtype)
+        return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(dtype)
+
+    def _dequantize(self, y):
+        if self._output["dtype"] == np.float32:
+            return y
+        scale, zero_point = self._output["quantization"]
+        return (y.astype(np.float32) - zero_point) * scale
+
+    def predict(self, x):
+        with self._lock:
+            self._resize(len(x))
+            self.interpreter.set_tensor(self._input["index"], self._quantize(x))
+            self.interpreter.invoke()
+            return self._dequantize(self.interpreter.get_tensor(self._output["index"]).copy())
+
+
+class RemoteBackend:
+    """Forward batches to a local api.inference_server process over shared memory.
+
+    The HTTP worker never imports TensorFlow or holds model weights; one
+    inference process serves every worker on the machine.
+    """
+
+    name = "remote"
+
+    def __init__(self, model_path, socket_path=None, connections=4):
+        from .inference_server import DEFAULT_SOCKET, InferenceClient
+        self.model_path = model_path
+        self.client = InferenceClient(socket_path or DEFAULT_SOCKET, connections=connections)
+        self.input_size = int(self.client.info["img_size"])
+        # Fingerprint of the model the inference server actually loaded, not of model_path
+        self.version = self.client.info.get("version")
+
+    def predict(self, x):
+        return self.client.predict(x)
+
+
+BACKENDS = {"keras": KerasBackend, "tflite": TFLiteBackend, "remote": RemoteBackend}
+
+
+def import_runtime(name):
+    """Import the heavy runtime a backend needs, so startup can time it separately."""
+    if name == "remote":
+        return
+    if name == "tflite":
+        try:
+            import tflite_runtime.interpreter  # noqa: F401
+            return
+        except ImportError:
+            pass
+    import tensorflow  # noqa: F401
+
+
+def load_backend(name, model_path, num_threads=None, socket_path=None, connections=4):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown MODEL_BACKEND '{name}', expected one of {sorted(BACKENDS)}")
+    if name == "tflite":
+        return TFLiteBackend(model_path, num_threads=num_threads)
+    if name == "remote":
+        return RemoteBackend(model_path, socket_path=socket_path, connections=connections)
+    return BACKENDS[name](model_path)
@@ -0,0 +1,164 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+from .executors import QueueFullError
+
+
+class MicroBatcher:
+    """Collect preprocessed images from concurrent requests into shared batches.
+
+    Callers submit an (n, H, W, C) array and get back a Future that resolves to
+    their own (n, num_classes) rows. A background thread flushes the queue as a
+    single forward pass once `max_batch_size` rows are pending or the oldest
+    request has waited `max_wait_ms`, whichever comes first. Requests are never
+    split, so a single request larger than `max_batch_size` runs on its own.
+    When `max_queue_rows` is set, submissions that would push the backlog past
+    it raise QueueFullError instead of waiting. `on_batch(rows, waits_s,
+    predict_s)` is called after every flush, e.g. to feed metrics.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, max_queue_rows=None, retry_after=1,
+                 on_batch=None):
+        self.predict_fn = predict_fn
+        self.on_batch = on_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue_rows = max_queue_rows
+        self.retry_after = retry_after
+        self._queue = queue.Queue()
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "requests": 0,
+            "rows": 0,
+            "max_queue_depth": 0,
+            "rejected": 0,
+            "total_wait_s": 0.0,
+            "total_predict_s": 0.0,
+        }
+        self._batch_sizes = Counter()
+        self._carry = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="pawscan-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, images):
+        """Queue a batch of images; returns a Future with the matching predictions."""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        with self._lock:
+            # Always admit into an empty queue so oversized requests can still run
+            if self.max_queue_rows and self._pending_rows and self._pending_rows + len(images) > self.max_queue_rows:
+                self._stats["rejected"] += 1
+                raise QueueFullError("inference queue is full", retry_after=self.retry_after)
+            self._pending_rows += len(images)
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._pending_rows)
+        self._queue.put((images, future, time.perf_counter()))
+        return future
+
+    def predict(self, images):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(images).result()
+
+    def queue_depth(self):
+        """Number of image rows waiting for a batch slot."""
+        with self._lock:
+            return self._pending_rows
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["queue_depth"] = self._pending_rows
+            s["batch_size_histogram"] = dict(sorted(self._batch_sizes.items()))
+        batches = max(s["batches"], 1)
+        s["avg_batch_size"] = s["rows"] / batches
+        s["avg_wait_ms"] = s.pop("total_wait_s") / max(s["requests"], 1) * 1000
+        s["avg_predict_ms"] = s.pop("total_predict_s") / batches * 1000
+        s["max_batch_size"] = self.max_batch_size
+        s["max_wait_ms"] = self.max_wait * 1000
+        return s
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _collect(self):
+        # A request that did not fit in the previous batch opens the next one
+        item, self._carry = (self._carry, None) if self._carry is not None else (self._queue.get(), None)
+        if item is None:
+            return None
+        items = [item]
+        rows = len(item[0])
+        deadline = item[2] + self.max_wait
+        while rows < self.max_batch_size:
+            # Past the deadline we still drain requests that are already queued
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Flush what we have, then stop on the next loop iteration
+                self._queue.put(None)
+                break
+            if rows + len(item[0]) > self.max_batch_size:
+                self._carry = item
+                break
+            items.append(item)
+            rows += len(item[0])
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            if items is None:
+                return
+            queued = sum(len(images) for images, _, _ in items)
+            # Claiming a future makes it uncancellable, so set_result/set_exception below cannot race
+            # a cancel(); requests cancelled while queued are dropped here
+            items = [item for item in items if item[1].set_running_or_notify_cancel()]
+            if not items:
+                with self._lock:
+                    self._pending_rows -= queued
+                continue
+            sizes = [len(images) for images, _, _ in items]
+            total = sum(sizes)
+            start = time.perf_counter()
+            try:
+                batch = items[0][0] if len(items) == 1 else np.concatenate([images for images, _, _ in items])
+                preds = np.asarray(self.predict_fn(batch))
+            except Exception as exc:
+                for _, future, _ in items:
+                    future.set_exception(exc)
+                preds = None
+            elapsed = time.perf_counter() - start
+            waits = [start - enqueued for _, _, enqueued in items]
+
+            with self._lock:
+                self._pending_rows -= queued
+                self._stats["batches"] += 1
+                self._stats["requests"] += len(items)
+                self._stats["rows"] += total
+                self._stats["total_wait_s"] += sum(waits)
+                self._stats["total_predict_s"] += elapsed
+                self._batch_sizes[total] += 1
+            if self.on_batch is not None:
+                try:
+                    self.on_batch(total, waits, elapsed)
+                except Exception as exc:
+                    print(f"⚠️  on_batch hook failed: {exc}")
+
+            if preds is None:
+                continue
+            offset = 0
+            for (images, future, _), size in zip(items, sizes):
+                future.set_result(preds[offset:offset + size])
+                offset += size
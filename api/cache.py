@@ -0,0 +1,163 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def model_fingerprint(model_path):
+    """Content hash of a model file (or every file under a SavedModel directory)."""
+    digest = hashlib.sha256()
+    if os.path.isdir(model_path):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(model_path) for name in names)
+    else:
+        paths = [model_path]
+    for path in paths:
+        if path != model_path:
+            digest.update(os.path.relpath(path, model_path).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class PredictionCache:
+    """Content-addressed cache of per-image probabilities.
+
+    Keys are the SHA-256 of the raw upload bytes salted with the model
+    fingerprint, so switching models never serves stale predictions. The
+    in-memory tier is an LRU bounded by `max_entries` with a TTL; the optional
+    SQLite tier under `disk_dir` survives restarts and follows the same TTL.
+    """
+
+    def __init__(self, fingerprint, max_entries=4096, ttl_seconds=3600, disk_dir=None):
+        self.fingerprint = fingerprint
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self._db = None
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(disk_dir, "predictions.sqlite"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT, created REAL, probs BLOB)"
+            )
+            self._db.commit()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def key(self, image_bytes, fingerprint=None):
+        return self.key_from_digest(hashlib.sha256(image_bytes).hexdigest(), fingerprint)
+
+    def key_from_digest(self, content_digest, fingerprint=None):
+        """Cache key from a sha256 hex digest of the image bytes, e.g. computed while streaming.
+
+        Pass the fingerprint of the model that will serve the request, so a model
+        swapped in mid-request never receives another version's predictions.
+        """
+        return hashlib.sha256(f"{fingerprint or self.fingerprint}:{content_digest}".encode()).hexdigest()
+
+    def set_fingerprint(self, fingerprint):
+        """Switch to a new model; drops the memory tier and stale disk rows."""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            self.fingerprint = fingerprint
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions WHERE fingerprint != ?", (fingerprint,))
+                self._db.commit()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, probs = entry
+                if now - created <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return probs
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, probs FROM predictions WHERE key = ? AND fingerprint = ?",
+                    (key, self.fingerprint),
+                ).fetchone()
+                if row is not None and now - row[0] <= self.ttl:
+                    probs = np.frombuffer(row[1], dtype=np.float32)
+                    self._insert(key, row[0], probs)
+                    self._counters["disk_hits"] += 1
+                    return probs
+
+            self._counters["misses"] += 1
+            return None
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def put(self, key, probs):
+        self.put_many([(key, probs)])
+
+    def put_many(self, items):
+        """Store (key, probs) pairs; the disk tier gets a single commit for all of them."""
+        if not self.enabled or not items:
+            return
+        created = time.time()
+        rows = [(key, np.asarray(probs, dtype=np.float32)) for key, probs in items]
+        with self._lock:
+            for key, probs in rows:
+                self._insert(key, created, probs)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)",
+                    [(key, self.fingerprint, created, probs.tobytes()) for key, probs in rows],
+                )
+                self._db.commit()
+
+    def _insert(self, key, created, probs):
+        self._entries[key] = (created, probs)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def purge_expired(self):
+        """Drop expired rows from both tiers."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for key in [k for k, (created, _) in self._entries.items() if created < cutoff]:
+                del self._entries[key]
+                self._counters["expirations"] += 1
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions WHERE created < ?", (cutoff,))
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._counters)
+            s["entries"] = len(self._entries)
+        lookups = s["hits"] + s["disk_hits"] + s["misses"]
+        s["hit_rate"] = (s["hits"] + s["disk_hits"]) / lookups if lookups else 0.0
+        s["max_entries"] = self.max_entries
+        s["ttl_seconds"] = self.ttl
+        s["disk"] = self._db is not None
+        s["model_fingerprint"] = self.fingerprint
+        return s
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a bounded queue cannot accept more work; mapped to HTTP 503."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """Thread pool that rejects new work instead of queueing it without limit.
+
+    At most `max_pending` tasks (running + queued) are admitted at a time.
+    Submissions beyond that raise QueueFullError so the caller can shed load.
+    """
+
+    def __init__(self, max_workers, max_pending, name="pawscan", retry_after=1):
+        self.max_pending = max(int(max_pending), int(max_workers))
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.name = name
+
+    def _reserve(self, n):
+        with self._lock:
+            # An idle pool always admits, so one oversized request cannot be rejected forever
+            if self._pending and self._pending + n > self.max_pending:
+                raise QueueFullError(f"{self.name} queue is full", retry_after=self.retry_after)
+            self._pending += n
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def submit(self, fn, *args):
+        self._reserve(1)
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    async def map(self, fn, items):
+        """Run fn over items concurrently; all-or-nothing admission for the whole list."""
+        items = list(items)
+        self._reserve(len(items))
+        futures = []
+        for item in items:
+            future = self._pool.submit(fn, item)
+            future.add_done_callback(self._release)
+            futures.append(asyncio.wrap_future(future))
+        return await asyncio.gather(*futures)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
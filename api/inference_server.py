@@ -0,0 +1,313 @@
+"""Dedicated inference process shared by several HTTP workers.
+
+One process loads the model once and serves every uvicorn worker on the
+machine. Workers write preprocessed image tensors into a slot of a shared-memory
+segment and send only the row count over a Unix socket. The server runs the
+rows through a MicroBatcher, so images from different workers share forward
+passes, and writes the probabilities back into the same slot. No array is ever
+pickled or copied through the socket.
+
+Usage:
+    python -m api.inference_server --model models/pawscan_final.h5
+    MODEL_BACKEND=remote uvicorn api.main:app --workers 4
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import struct
+import threading
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from .batching import MicroBatcher
+from .backends import import_runtime, load_backend
+from .cache import model_fingerprint
+from .executors import QueueFullError
+from .registry import select_variant
+
+DEFAULT_SOCKET = "/tmp/pawscan-infer.sock"
+
+_REQUEST = struct.Struct("!I")
+_REPLY = struct.Struct("!BI")
+_STATUS_OK, _STATUS_ERROR = 0, 1
+
+
+def _send_frame(sock, payload):
+    sock.sendall(_REQUEST.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("inference server connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv_frame(sock):
+    (length,) = _REQUEST.unpack(_recv_exact(sock, _REQUEST.size))
+    return _recv_exact(sock, length)
+
+
+def _slot_views(buf, slot, slot_rows, img_size, num_classes, dtype):
+    """(input, output) ndarray views of one slot in the shared segment."""
+    image_shape = (img_size, img_size, 3)
+    in_bytes = slot_rows * int(np.prod(image_shape)) * np.dtype(dtype).itemsize
+    out_bytes = slot_rows * num_classes * 4
+    offset = slot * (in_bytes + out_bytes)
+    inputs = np.ndarray((slot_rows,) + image_shape, dtype=dtype, buffer=buf, offset=offset)
+    outputs = np.ndarray((slot_rows, num_classes), dtype=np.float32, buffer=buf, offset=offset + in_bytes)
+    return inputs, outputs
+
+
+def _attach(name):
+    # Attaching must not register the segment for cleanup; only the server unlinks it
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track=False; skip the registration instead of undoing it, which
+        # would also drop the server's own registration when both share a resource tracker
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class InferenceServer:
+    """Own the model and serve predictions over shared memory to local clients.
+
+    Each client connection is assigned one of `slots` fixed-size slots holding
+    up to `slot_rows` images plus their output probabilities.
+    """
+
+    def __init__(self, model, socket_path=DEFAULT_SOCKET, slots=32, slot_rows=32, dtype=np.uint8,
+                 max_batch_size=64, max_wait_ms=5.0, version=None):
+        self.model = model
+        self.socket_path = str(socket_path)
+        self.slots = int(slots)
+        self.slot_rows = int(slot_rows)
+        self.dtype = np.dtype(dtype)
+        self.version = version
+        self.img_size = int(getattr(model, "input_size", 224))
+        blank = np.zeros((1, self.img_size, self.img_size, 3), dtype=self.dtype)
+        self.num_classes = int(np.asarray(model.predict(blank)).shape[-1])
+
+        in_bytes = self.slot_rows * self.img_size * self.img_size * 3 * self.dtype.itemsize
+        out_bytes = self.slot_rows * self.num_classes * 4
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slots * (in_bytes + out_bytes))
+        self.batcher = MicroBatcher(model.predict, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self._free_slots = list(range(self.slots))
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._sock = None
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        self._sock.listen(self.slots)
+        print(f"🧠 Inference server {self.version} on {self.socket_path}: "
+              f"{self.slots} slots x {self.slot_rows} rows, shared memory {self.shm.size / 1e6:.0f} MB")
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(conn,), name="pawscan-infer-conn", daemon=True).start()
+
+    def _handle(self, conn):
+        with self._lock:
+            slot = self._free_slots.pop() if self._free_slots else None
+        try:
+            if slot is None:
+                _send_frame(conn, json.dumps({"error": "all inference slots are in use"}).encode())
+                return
+            _send_frame(conn, json.dumps({
+                "shm": self.shm.name,
+                "slot": slot,
+                "slot_rows": self.slot_rows,
+                "img_size": self.img_size,
+                "num_classes": self.num_classes,
+                "dtype": self.dtype.str,
+                "version": self.version,
+            }).encode())
+            inputs, outputs = _slot_views(self.shm.buf, slot, self.slot_rows, self.img_size, self.num_classes,
+                                          self.dtype)
+            while True:
+                (n,) = _REQUEST.unpack(_recv_exact(conn, _REQUEST.size))
+                try:
+                    outputs[:n] = self.batcher.predict(inputs[:n])
+                except Exception as exc:
+                    message = f"{type(exc).__name__}: {exc}".encode()
+                    conn.sendall(_REPLY.pack(_STATUS_ERROR, len(message)) + message)
+                    continue
+                conn.sendall(_REPLY.pack(_STATUS_OK, n))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            conn.close()
+            if slot is not None:
+                with self._lock:
+                    self._free_slots.append(slot)
+
+    def close(self):
+        self._closed.set()
+        if self._sock is not None:
+            self._sock.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        self.batcher.close()
+        try:
+            self.shm.close()
+        except BufferError:
+            # Connection threads still hold views; the mapping goes away with the process
+            pass
+        self.shm.unlink()
+
+
+class _Connection:
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        info = json.loads(_recv_frame(self.sock))
+        if "error" in info:
+            self.sock.close()
+            raise QueueFullError(f"inference server: {info['error']}")
+        self.info = info
+        self.slot_rows = info["slot_rows"]
+        self.shm = _attach(info["shm"])
+        self.inputs, self.outputs = _slot_views(self.shm.buf, info["slot"], self.slot_rows, info["img_size"],
+                                                info["num_classes"], np.dtype(info["dtype"]))
+
+    def predict(self, x):
+        n = len(x)
+        self.inputs[:n] = x
+        self.sock.sendall(_REQUEST.pack(n))
+        status, length = _REPLY.unpack(_recv_exact(self.sock, _REPLY.size))
+        if status != _STATUS_OK:
+            raise RuntimeError(_recv_exact(self.sock, length).decode())
+        return self.outputs[:n].copy()
+
+    def close(self):
+        self.sock.close()
+        del self.inputs, self.outputs
+        self.shm.close()
+
+
+class InferenceClient:
+    """Thread-safe client for InferenceServer; holds up to `connections` slots.
+
+    Batches larger than the server's slot are sent in slot-sized chunks.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, connections=4):
+        self.socket_path = str(socket_path)
+        self.max_connections = max(1, int(connections))
+        self._idle = []
+        self._opened = 0
+        self._cond = threading.Condition()
+        # Connect once up front so a missing server fails at startup, not on the first scan
+        conn = _Connection(self.socket_path)
+        self.info = conn.info
+        self.dtype = np.dtype(conn.info["dtype"])
+        self._opened, self._idle = 1, [conn]
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and self._opened >= self.max_connections:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._opened += 1
+        try:
+            return _Connection(self.socket_path)
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, conn, broken=False):
+        with self._cond:
+            if broken:
+                self._opened -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def predict(self, x):
+        if x.dtype != self.dtype:
+            raise ValueError(f"Inference server expects {self.dtype} input, got {x.dtype}; check FAST_DECODE")
+        conn = self._acquire()
+        try:
+            step = conn.slot_rows
+            preds = np.concatenate([conn.predict(x[i:i + step]) for i in range(0, len(x), step)])
+        except (ConnectionError, OSError):
+            self._release(conn, broken=True)
+            raise
+        self._release(conn)
+        return preds
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def main():
+    model_dir = Path(__file__).resolve().parents[1] / "models"
+    backend = os.environ.get("MODEL_BACKEND", "keras").lower()
+    backend = "keras" if backend == "remote" else backend
+    parser = argparse.ArgumentParser(description="Serve one model to all local API workers over shared memory")
+    parser.add_argument("--backend", default=backend, choices=["keras", "tflite"])
+    parser.add_argument("--model", default=os.environ.get("MODEL_PATH"),
+                        help="Model to serve (default: models/pawscan_final.h5, or a variant chosen by the latency budget)")
+    parser.add_argument("--latency-budget-ms", type=float, default=float(os.environ.get("MODEL_LATENCY_BUDGET_MS", "0")),
+                        help="Serve the most accurate variant in --variants whose p95 latency fits")
+    parser.add_argument("--variants", default=os.environ.get("MODEL_VARIANTS_PATH", str(model_dir / "variants.json")))
+    parser.add_argument("--socket", default=os.environ.get("INFER_SOCKET", DEFAULT_SOCKET))
+    parser.add_argument("--slots", type=int, default=int(os.environ.get("INFER_SLOTS", "32")),
+                        help="Concurrent client connections (sum over all workers)")
+    parser.add_argument("--slot-rows", type=int, default=int(os.environ.get("INFER_SLOT_ROWS", "32")),
+                        help="Max images per round trip")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("TFLITE_NUM_THREADS", str(os.cpu_count() or 1))))
+    parser.add_argument("--batch-size", type=int, default=int(os.environ.get("BATCH_MAX_SIZE", "64")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.environ.get("BATCH_MAX_WAIT_MS", "5")))
+    args = parser.parse_args()
+    if args.model is None:
+        if args.latency_budget_ms > 0:
+            args.model, variant = select_variant(args.variants, args.latency_budget_ms)
+            print(f"🎯 Latency budget {args.latency_budget_ms:.1f} ms: serving {variant['name']}")
+        else:
+            args.model = str(model_dir / "pawscan_final.h5")
+
+    # Must match the API workers' decode path: uint8 pixels with FAST_DECODE=1, float32 otherwise
+    dtype = np.uint8 if os.environ.get("FAST_DECODE", "1") == "1" else np.float32
+    import_runtime(args.backend)
+    model = load_backend(args.backend, args.model, num_threads=args.threads)
+    server = InferenceServer(model, args.socket, args.slots, args.slot_rows, dtype, args.batch_size,
+                             args.max_wait_ms, version=model_fingerprint(args.model))
+    signal.signal(signal.SIGTERM, lambda *_: server.close())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if not server._closed.is_set():
+            server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+import json
+import os
+import queue
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class JobStore:
+    """SQLite-backed store of bulk scan jobs and their per-image results.
+
+    Uploaded images are copied to `root/<job_id>/` and every processed batch is
+    committed as it finishes, so a restarted worker resumes a job from the first
+    image without a result instead of starting over.
+
+    Several worker processes can share one store. A job is processed by the
+    worker holding its lease (`claim`, renewed after every batch); a job whose
+    lease has expired, because its worker died, can be claimed by any other.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / "jobs.sqlite", check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT, created REAL, updated REAL,"
+            " total INTEGER, done INTEGER, failed INTEGER, result TEXT, error TEXT,"
+            " owner TEXT, lease REAL);"
+            "CREATE TABLE IF NOT EXISTS job_images ("
+            " job_id TEXT, idx INTEGER, filename TEXT, path TEXT, status TEXT,"
+            " prediction TEXT, model_version TEXT, error TEXT, PRIMARY KEY (job_id, idx));"
+        )
+        # Stores created before leases existed
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease", "REAL")):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._db.commit()
+
+    def create(self, uploads):
+        """Persist the uploads of a new job and return its id."""
+        job_id = uuid.uuid4().hex
+        job_dir = self.root / job_id
+        job_dir.mkdir()
+        rows = []
+        for idx, upload in enumerate(uploads):
+            path = job_dir / f"{idx:05d}"
+            with open(path, "wb") as out:
+                shutil.copyfileobj(upload.file, out, 1 << 20)
+            rows.append((job_id, idx, upload.filename, str(path), "pending", None, None, None))
+        now = time.time()
+        with self._lock:
+            self._db.executemany("INSERT INTO job_images VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("INSERT INTO jobs VALUES (?, 'queued', ?, ?, ?, 0, 0, NULL, NULL, NULL, NULL)",
+                             (job_id, now, now, len(rows)))
+            self._db.commit()
+        return job_id
+
+    def claimable(self):
+        """Ids of queued jobs and of running jobs whose worker let the lease expire, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND (lease IS NULL OR lease < ?))"
+                " ORDER BY created",
+                (time.time(),),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def claim(self, job_id, owner, lease_seconds):
+        """Atomically take a claimable job for `owner`; False if another live worker holds it."""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, lease = ?, updated = ? WHERE id = ? AND"
+                " (status = 'queued' OR (status = 'running' AND (lease IS NULL OR lease < ? OR owner = ?)))",
+                (owner, now + lease_seconds, now, job_id, now, owner),
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    def renew(self, job_id, owner, lease_seconds):
+        """Extend `owner`'s lease; False once another worker has taken the job over."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET lease = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + lease_seconds, job_id, owner),
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    def release(self, job_id, owner):
+        """Hand a job `owner` stopped working on back to the queue."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease = NULL WHERE id = ? AND owner = ?"
+                " AND status = 'running'",
+                (job_id, owner),
+            )
+            self._db.commit()
+
+    def set_status(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, updated = ?, result = ?, error = ? WHERE id = ?",
+                (status, time.time(), json.dumps(result) if result is not None else None, error, job_id),
+            )
+            self._db.commit()
+
+    def fail_unfinished(self, error):
+        """Fail every claimable job, e.g. when no model could be loaded to run them."""
+        job_ids = self.claimable()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET status = 'failed', updated = ?, error = ? WHERE id = ?",
+                [(time.time(), error, job_id) for job_id in job_ids],
+            )
+            self._db.commit()
+        for job_id in job_ids:
+            self.remove_uploads(job_id)
+        return job_ids
+
+    def pending_images(self, job_id, limit):
+        """(idx, path) of the next images without a result."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT idx, path FROM job_images WHERE job_id = ? AND status = 'pending' ORDER BY idx LIMIT ?",
+                (job_id, limit),
+            ).fetchall()
+
+    def record(self, job_id, results, model_version):
+        """Commit one batch: `results` is a list of (idx, prediction dict or Exception).
+
+        Only images still pending are updated and counted, so a batch recorded twice
+        (e.g. by a worker that lost its lease mid-batch) never pushes done + failed past total.
+        """
+        done = [(json.dumps(r), model_version, job_id, idx) for idx, r in results if not isinstance(r, Exception)]
+        failed = [(f"{type(r).__name__}: {r}", job_id, idx) for idx, r in results if isinstance(r, Exception)]
+        with self._lock:
+            done_rows = self._db.executemany(
+                "UPDATE job_images SET status = 'done', prediction = ?, model_version = ?"
+                " WHERE job_id = ? AND idx = ? AND status = 'pending'",
+                done,
+            ).rowcount
+            failed_rows = self._db.executemany(
+                "UPDATE job_images SET status = 'failed', error = ? WHERE job_id = ? AND idx = ? AND status = 'pending'",
+                failed,
+            ).rowcount
+            self._db.execute(
+                "UPDATE jobs SET done = done + ?, failed = failed + ?, updated = ? WHERE id = ?",
+                (done_rows, failed_rows, time.time(), job_id),
+            )
+            self._db.commit()
+
+    def predictions(self, job_id):
+        """Successful per-image predictions in upload order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT prediction FROM job_images WHERE job_id = ? AND status = 'done' ORDER BY idx", (job_id,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def model_versions(self, job_id):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT model_version FROM job_images WHERE job_id = ? AND model_version IS NOT NULL",
+                (job_id,),
+            ).fetchall()
+        return sorted(r[0] for r in rows)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, created, updated, total, done, failed, result, error FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, created, updated, total, done, failed, result, error = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "created": created,
+            "updated": updated,
+            "total": total,
+            "done": done,
+            "failed": failed,
+            "progress": (done + failed) / total if total else 1.0,
+            "result": json.loads(result) if result else None,
+            "error": error,
+        }
+
+    def images(self, job_id, offset=0, limit=100):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, filename, status, prediction, model_version, error FROM job_images"
+                " WHERE job_id = ? ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset),
+            ).fetchall()
+        return [
+            {"index": idx, "filename": filename, "status": status,
+             "prediction": json.loads(prediction) if prediction else None,
+             "model_version": model_version, "error": error}
+            for idx, filename, status, prediction, model_version, error in rows
+        ]
+
+    def remove_uploads(self, job_id):
+        """Delete a finished job's image files; its results stay in the store."""
+        shutil.rmtree(self.root / job_id, ignore_errors=True)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class JobRunner:
+    """Worker threads that drain bulk jobs in large inference batches.
+
+    `process_fn(paths)` classifies one batch of image files and returns
+    (per-image prediction dict or Exception, model version); `aggregate_fn`
+    turns a job's predictions into its final result. Each job is claimed with a
+    `lease_seconds` lease before it is processed, so runners in several processes
+    can share one store. Idle workers re-queue jobs whose lease has expired.
+    `close()` lets each worker finish its current batch and hands its job back to the queue.
+    """
+
+    def __init__(self, store, process_fn, aggregate_fn, workers=1, batch_size=64, lease_seconds=60.0):
+        self.store = store
+        self.process_fn = process_fn
+        self.aggregate_fn = aggregate_fn
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.lease_seconds = float(lease_seconds)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        self.requeue_claimable()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"pawscan-jobs-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, job_id):
+        # A job can be both submitted and found unfinished at startup; queue it once
+        with self._lock:
+            if job_id in self._queued:
+                return
+            self._queued.add(job_id)
+        self._queue.put(job_id)
+
+    def requeue_claimable(self):
+        for job_id in self.store.claimable():
+            self.submit(job_id)
+
+    def queued(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=30):
+        """Stop the workers after their current batch; True once every worker has exited."""
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in self._threads)
+
+    def _run(self):
+        while True:
+            try:
+                job_id = self._queue.get(timeout=self.lease_seconds / 2)
+            except queue.Empty:
+                # Picks up jobs from workers (in any process) that died holding a lease
+                self.requeue_claimable()
+                continue
+            if job_id is None or self._stopping.is_set():
+                return
+            try:
+                self._process(job_id)
+            except Exception as exc:
+                print(f"❌ Job {job_id} failed: {exc}")
+                self.store.set_status(job_id, "failed", error=f"{type(exc).__name__}: {exc}")
+            finally:
+                with self._lock:
+                    self._queued.discard(job_id)
+
+    def _process(self, job_id):
+        if not self.store.claim(job_id, self.owner, self.lease_seconds):
+            # Another live worker holds the lease
+            return
+        while True:
+            if self._stopping.is_set():
+                self.store.release(job_id, self.owner)
+                return
+            batch = self.store.pending_images(job_id, self.batch_size)
+            if not batch:
+                break
+            results, model_version = self.process_fn([path for _, path in batch])
+            self.store.record(job_id, [(idx, r) for (idx, _), r in zip(batch, results)], model_version)
+            if not self.store.renew(job_id, self.owner, self.lease_seconds):
+                print(f"⚠️  Lost the lease on job {job_id}; another worker continues it")
+                return
+
+        predictions = self.store.predictions(job_id)
+        if not predictions:
+            self.store.set_status(job_id, "failed", error="No image in the job could be analysed")
+        else:
+            result = self.aggregate_fn(predictions)
+            result["model_versions"] = self.store.model_versions(job_id)
+            self.store.set_status(job_id, "completed", result=result)
+        self.store.remove_uploads(job_id)
@@ -1,69 +1,659 @@
 import os
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from typing import List
-import tensorflow as tf
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.formparsers import MultiPartException
+from typing import Optional
+from PIL import UnidentifiedImageError
 import numpy as np
-from .utils import preprocess_image_bytes
-
-app = FastAPI(title="PawScan ML API")
+from .utils import (preprocess_image_bytes, decode_image_bytes, aggregate_predictions, ImageTooLargeError,
+                    tta_views, tta_candidates, average_tta, perceptual_hash, near_duplicate_groups)
+from .batching import MicroBatcher
+from .executors import BoundedExecutor, QueueFullError
+from .backends import import_runtime, load_backend
+from .cache import PredictionCache, model_fingerprint
+from .metrics import MetricsRegistry, StageTimer, BYTES_BUCKETS, COUNT_BUCKETS
+from .uploads import read_uploads, read_body, UploadTooLargeError
+from .tensors import parse_payload, decode_tensor, tensor_hash, PayloadError, CONTENT_TYPE as TENSORS_CONTENT_TYPE
+from .registry import ModelRegistry, ModelVersion, ModelWatcher, ModelLoadError, golden_set_check, select_variant
+from .jobs import JobStore, JobRunner, TERMINAL_STATUSES
 
 
-from pathlib import Path
-from src.config import MODEL_SAVE_PATH
-MODEL_PATH = os.environ.get("MODEL_PATH", str(Path(MODEL_SAVE_PATH) / "pawscan_final.h5"))
+# Resolved here rather than via src.config, which prints and creates directories on import
+MODEL_SAVE_PATH = Path(__file__).resolve().parents[1] / "models"
+# MODEL_BACKEND=keras serves the .h5 graph, MODEL_BACKEND=tflite a model from src/convert_tflite.py,
+# MODEL_BACKEND=remote forwards to a shared `python -m api.inference_server` process
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "keras").lower()
+DEFAULT_MODEL_FILE = "pawscan_final_int8.tflite" if MODEL_BACKEND == "tflite" else "pawscan_final.h5"
+MODEL_PATH = os.environ.get("MODEL_PATH", str(Path(MODEL_SAVE_PATH) / DEFAULT_MODEL_FILE))
+# With a budget (and no explicit MODEL_PATH) serve the most accurate variant from `python -m src.distill`
+# whose measured p95 latency fits it
+MODEL_LATENCY_BUDGET_MS = float(os.environ.get("MODEL_LATENCY_BUDGET_MS", "0"))
+MODEL_VARIANTS_PATH = os.environ.get("MODEL_VARIANTS_PATH", str(Path(MODEL_SAVE_PATH) / "variants.json"))
+TFLITE_NUM_THREADS = int(os.environ.get("TFLITE_NUM_THREADS", str(os.cpu_count() or 1)))
+INFER_SOCKET = os.environ.get("INFER_SOCKET", "/tmp/pawscan-infer.sock")
+INFER_CONNECTIONS = int(os.environ.get("INFER_CONNECTIONS", "4"))
+# FAST_DECODE=1 uses reduced-resolution JPEG decoding and feeds uint8 pixels to the model
+FAST_DECODE = os.environ.get("FAST_DECODE", "1") == "1"
 LABELS_PATH = os.environ.get("LABELS_PATH", str(Path(MODEL_SAVE_PATH) / "labels.txt"))
+# Cross-request micro-batching: flush at BATCH_MAX_SIZE images or after BATCH_MAX_WAIT_MS
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+# Backpressure: requests beyond these limits get 503 + Retry-After instead of queueing
+DECODE_WORKERS = int(os.environ.get("DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+DECODE_MAX_PENDING = int(os.environ.get("DECODE_MAX_PENDING", "64"))
+INFERENCE_MAX_QUEUE = int(os.environ.get("INFERENCE_MAX_QUEUE", "256"))
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", "1"))
+# Prediction cache keyed on image bytes + model fingerprint; CACHE_MAX_ENTRIES=0 disables it
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "4096"))
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", "3600"))
+CACHE_DIR = os.environ.get("CACHE_DIR")
+# Upload limits, enforced while the multipart body streams in (413 when exceeded)
+MAX_FILES_PER_REQUEST = int(os.environ.get("MAX_FILES_PER_REQUEST", "10"))
+MAX_FILE_BYTES = int(os.environ.get("MAX_FILE_BYTES", str(15 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.environ.get("MAX_REQUEST_BYTES", str(60 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", "50000000"))
+# Per-file bytes held in memory before an upload spills to a temporary file
+UPLOAD_SPOOL_BYTES = int(os.environ.get("UPLOAD_SPOOL_BYTES", str(256 * 1024)))
+# Hot reload: candidates must pass GOLDEN_SET_PATH (one folder per label) before they are swapped in
+GOLDEN_SET_PATH = os.environ.get("GOLDEN_SET_PATH", str(Path(MODEL_SAVE_PATH) / "golden"))
+GOLDEN_MIN_ACCURACY = float(os.environ.get("GOLDEN_MIN_ACCURACY", "0.8"))
+# Loaded versions kept in memory; the previous one makes rollback instant
+MODEL_KEEP_VERSIONS = int(os.environ.get("MODEL_KEEP_VERSIONS", "2"))
+# MODEL_WATCH_INTERVAL > 0 polls MODEL_PATH every N seconds and reloads it when it changes
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", "0"))
+# Admin endpoints require this token in X-Admin-Token; unset = localhost only
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# Bulk scan jobs: uploads and results persist under JOBS_DIR so jobs survive restarts
+JOBS_DIR = os.environ.get("JOBS_DIR", str(Path(__file__).resolve().parents[1] / "jobs"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+JOB_BATCH_SIZE = int(os.environ.get("JOB_BATCH_SIZE", "64"))
+JOB_MAX_FILES = int(os.environ.get("JOB_MAX_FILES", "1000"))
+JOB_MAX_REQUEST_BYTES = int(os.environ.get("JOB_MAX_REQUEST_BYTES", str(1024 * 1024 * 1024)))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+# Workers (in every process sharing JOBS_DIR) hold a lease on the job they run; an expired lease is taken over
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+# TTA_ENABLED=1 re-scores images whose confidence is in [TTA_BAND_LOW, TTA_BAND_HIGH) as the mean over
+# the original and TTA_VIEWS, so borderline scans do not flip severity between near-identical photos
+TTA_ENABLED = os.environ.get("TTA_ENABLED", "0") == "1"
+TTA_BAND_LOW = float(os.environ.get("TTA_BAND_LOW", "0.5"))
+TTA_BAND_HIGH = float(os.environ.get("TTA_BAND_HIGH", "0.9"))
+# NEAR_DUP_ENABLED=1 hashes every image of an /analyze_files or /analyze_tensors request from a small
+# decode (dHash); images within NEAR_DUP_MAX_DISTANCE bits of an earlier one (burst shots) reuse its inference.
+# Lossy (smooth, low-texture photos of different lesions can share a hash), so it is opt-in.
+NEAR_DUP_ENABLED = os.environ.get("NEAR_DUP_ENABLED", "0") == "1"
+NEAR_DUP_MAX_DISTANCE = int(os.environ.get("NEAR_DUP_MAX_DISTANCE", "6"))
+# SERVER_TIMING=1 adds a per-stage Server-Timing header to /analyze_files and /analyze_tensors responses
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+# Populated by load_model_state() once the lifespan hook has loaded the model
+registry = None
+watcher = None
+cache = None
+job_store = None
+job_runner = None
+STARTUP_TIMINGS = {}
+_ready = threading.Event()
+_startup_lock = threading.Lock()
+_startup_error = None
+
+# PIL decode/resize runs in a bounded thread pool; inference runs on the batcher's own thread
+decode_pool = BoundedExecutor(DECODE_WORKERS, DECODE_MAX_PENDING, name="pawscan-decode", retry_after=RETRY_AFTER_SECONDS)
+# Bulk jobs decode on their own threads so they never take slots from interactive scans
+job_decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="pawscan-job-decode")
+
+# Prometheus metrics served on GET /metrics
+metrics = MetricsRegistry()
+HTTP_REQUESTS = metrics.counter("pawscan_http_requests_total", "HTTP requests by route and status code", ("path", "status"))
+HTTP_SECONDS = metrics.histogram("pawscan_http_request_seconds", "End-to-end HTTP request latency", labelnames=("path",))
+STAGE_SECONDS = metrics.histogram("pawscan_stage_seconds", "Per-request time spent in each /analyze_files stage",
+                                  labelnames=("stage",))
+DECODE_SECONDS = metrics.histogram("pawscan_image_decode_seconds", "Decode and resize time per image")
+REQUEST_IMAGES = metrics.histogram("pawscan_request_images", "Images per /analyze_files request", COUNT_BUCKETS)
+IMAGE_BYTES = metrics.histogram("pawscan_image_bytes", "Upload size per image", BYTES_BUCKETS)
+REQUEST_BYTES = metrics.histogram("pawscan_request_bytes", "Total upload size per request", BYTES_BUCKETS)
+CACHE_LOOKUPS = metrics.counter("pawscan_cache_lookups_total", "Prediction cache lookups by result", ("result",))
+BATCH_ROWS = metrics.histogram("pawscan_inference_batch_size", "Images per inference batch", COUNT_BUCKETS)
+BATCH_WAIT_SECONDS = metrics.histogram("pawscan_inference_queue_wait_seconds", "Time a request waited for its batch")
+BATCH_PREDICT_SECONDS = metrics.histogram("pawscan_inference_seconds", "Forward-pass time per inference batch")
+TTA_IMAGES = metrics.counter("pawscan_tta_images_total", "Images re-scored with test-time augmentation")
+NEAR_DUP_IMAGES = metrics.counter("pawscan_near_duplicate_images_total",
+                                  "Uploads that reused the inference of a near-duplicate in the same request")
+
+def observe_batch(rows, waits, predict_s):
+    BATCH_ROWS.observe(rows)
+    BATCH_PREDICT_SECONDS.observe(predict_s)
+    for wait in waits:
+        BATCH_WAIT_SECONDS.observe(wait)
+
+def blank_input(size=224):
+    return np.zeros((1, size, size, 3), dtype=np.uint8 if FAST_DECODE else np.float32)
+
+def build_model_version(path, labels_path):
+    """Load a model and its labels, run a warmup inference and give it its own batcher."""
+    start = time.perf_counter()
+    model = load_backend(MODEL_BACKEND, path, num_threads=TFLITE_NUM_THREADS, socket_path=INFER_SOCKET,
+                         connections=INFER_CONNECTIONS)
+    with open(labels_path, "r") as f:
+        labels = [l.strip() for l in f.readlines() if l.strip()]
+    # A remote backend serves whatever the inference server loaded, so it reports its own version
+    fingerprint = getattr(model, "version", None) or model_fingerprint(path)
+    input_size = getattr(model, "input_size", 224)
+    loaded = time.perf_counter()
+
+    # First call traces the graph; pay for it here instead of on the first scan
+    model.predict(blank_input(input_size))
+    warmed = time.perf_counter()
+
+    batcher = MicroBatcher(
+        model.predict,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_queue_rows=INFERENCE_MAX_QUEUE,
+        retry_after=RETRY_AFTER_SECONDS,
+        on_batch=observe_batch,
+    )
+    timings = {"load_s": round(loaded - start, 3), "warmup_s": round(warmed - loaded, 3)}
+    # Cached probabilities are final (post-TTA), so the TTA settings are part of the cache key
+    cache_fingerprint = fingerprint + ("-fast" if FAST_DECODE else "")
+    if TTA_ENABLED:
+        cache_fingerprint += f"-tta{TTA_BAND_LOW:g}-{TTA_BAND_HIGH:g}"
+    return ModelVersion(fingerprint, path, labels_path, labels, model, batcher, cache_fingerprint, timings,
+                        input_size)
+
+def check_model_version(version):
+    start = time.perf_counter()
+    result = golden_set_check(version, GOLDEN_SET_PATH, lambda b: decode_upload(b, version.input_size),
+                              blank_input(version.input_size), GOLDEN_MIN_ACCURACY)
+    version.timings["check_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+def on_model_activated(version):
+    # Cache keys are salted per version, so a swap (or rollback) never serves the other model's results
+    if cache is not None:
+        cache.set_fingerprint(version.cache_fingerprint)
+
+def load_model_state():
+    """Import the inference runtime, load model and labels, and run a warmup inference.
+
+    Idempotent; returns the startup-time breakdown in seconds.
+    """
+    global registry, watcher, cache, MODEL_PATH
+    with _startup_lock:
+        if _ready.is_set():
+            return STARTUP_TIMINGS
+
+        start = time.perf_counter()
+        if MODEL_LATENCY_BUDGET_MS > 0 and "MODEL_PATH" not in os.environ:
+            MODEL_PATH, variant = select_variant(MODEL_VARIANTS_PATH, MODEL_LATENCY_BUDGET_MS)
+            print(f"🎯 Latency budget {MODEL_LATENCY_BUDGET_MS:.1f} ms: serving {variant['name']} "
+                  f"(p95 {variant['latency_p95_ms']:.1f} ms, accuracy {variant['accuracy']:.3f})")
+        import_runtime(MODEL_BACKEND)
+        imported = time.perf_counter()
+
+        # A remote worker may have no local model file: the inference server reports what it serves
+        registry = ModelRegistry(build_model_version, check_model_version, MODEL_KEEP_VERSIONS, on_model_activated,
+                                 fingerprint_fn=None if MODEL_BACKEND == "remote" else model_fingerprint)
+        version = registry.reload(MODEL_PATH, LABELS_PATH)
+        cache = PredictionCache(
+            version.cache_fingerprint,
+            max_entries=CACHE_MAX_ENTRIES,
+            ttl_seconds=CACHE_TTL_SECONDS,
+            disk_dir=CACHE_DIR,
+        )
+        cache.purge_expired()
+        if MODEL_WATCH_INTERVAL > 0:
+            watcher = ModelWatcher(registry, MODEL_PATH, LABELS_PATH, MODEL_WATCH_INTERVAL).start()
+        finished = time.perf_counter()
 
-# Load model and labels once at startup
-model = tf.keras.models.load_model(MODEL_PATH)
-with open(LABELS_PATH, "r") as f:
-    LABELS = [l.strip() for l in f.readlines() if l.strip()]
+        STARTUP_TIMINGS.update({
+            "import_s": round(imported - start, 3),
+            "load_s": version.timings["load_s"],
+            "warmup_s": version.timings["warmup_s"],
+            "check_s": version.timings.get("check_s", 0.0),
+            "total_s": round(finished - start, 3),
+        })
+        print(f"🚀 PawScan API ready in {STARTUP_TIMINGS['total_s']:.2f}s "
+              f"(import {STARTUP_TIMINGS['import_s']:.2f}s, load {STARTUP_TIMINGS['load_s']:.2f}s, "
+              f"warmup {STARTUP_TIMINGS['warmup_s']:.2f}s, check {STARTUP_TIMINGS['check_s']:.2f}s)")
+        _ready.set()
+        return STARTUP_TIMINGS
 
-def predict_image_bytes(image_bytes):
-    x = preprocess_image_bytes(image_bytes, target_size=(224,224))
-    preds = model.predict(x)  # shape (1, num_classes)
-    preds = preds[0]  # numpy array
+def _load_in_background():
+    global _startup_error
+    try:
+        load_model_state()
+        job_runner.start()
+    except Exception as exc:
+        _startup_error = f"{type(exc).__name__}: {exc}"
+        print(f"❌ Model startup failed: {_startup_error}")
+        # Without a model the job workers never start, so queued jobs would wait forever
+        failed = job_store.fail_unfinished(f"Model failed to load: {_startup_error}")
+        if failed:
+            print(f"❌ Failed {len(failed)} queued job(s)")
+
+@asynccontextmanager
+async def lifespan(app):
+    global job_store, job_runner
+    # Jobs can be submitted while the model loads; workers start once it is ready
+    job_store = JobStore(JOBS_DIR)
+    job_runner = JobRunner(job_store, process_job_batch, aggregate_predictions, JOB_WORKERS, JOB_BATCH_SIZE,
+                           JOB_LEASE_SECONDS)
+    # Load in the background so liveness checks answer while the model warms up
+    threading.Thread(target=_load_in_background, name="pawscan-startup", daemon=True).start()
+    yield
+    # Workers write to the store until they exit, so it is closed only after all of them have
+    if job_runner.close():
+        job_store.close()
+    else:
+        print("⚠️  Job workers still running at shutdown; leaving the job store open")
+    job_decode_pool.shutdown(wait=False, cancel_futures=True)
+    if watcher is not None:
+        watcher.stop()
+    if registry is not None:
+        registry.close()
+    decode_pool.shutdown()
+    if cache is not None:
+        cache.close()
+
+app = FastAPI(title="PawScan ML API", lifespan=lifespan)
+
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template so unknown URLs cannot blow up label cardinality
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    HTTP_REQUESTS.inc(path=path, status=response.status_code)
+    HTTP_SECONDS.observe(time.perf_counter() - start, path=path)
+    return response
+
+def require_ready():
+    if not _ready.is_set():
+        detail = f"Model failed to load: {_startup_error}" if _startup_error else "Model is loading"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Server busy: {exc}"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(UploadTooLargeError)
+async def upload_too_large_handler(request: Request, exc: UploadTooLargeError):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+@app.exception_handler(ImageTooLargeError)
+async def image_too_large_handler(request: Request, exc: ImageTooLargeError):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+@app.exception_handler(UnidentifiedImageError)
+async def unidentified_image_handler(request: Request, exc: UnidentifiedImageError):
+    return JSONResponse(status_code=400, content={"detail": "Upload is not a supported image"})
+
+def require_admin(request: Request):
+    if ADMIN_TOKEN:
+        if request.headers.get("x-admin-token") != ADMIN_TOKEN:
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to use admin endpoints remotely")
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving, whether or not the model is ready."""
+    return {"status": "alive", "ready": _ready.is_set(), "startup": STARTUP_TIMINGS, "error": _startup_error}
+
+@app.get("/health/ready")
+def readiness():
+    """Readiness: 200 once the model is loaded and warmed up, 503 before that."""
+    require_ready()
+    return {"status": "ready", "backend": MODEL_BACKEND, "model_version": registry.active.version,
+            "startup": STARTUP_TIMINGS}
+
+def format_prediction(preds, labels):
     idx = int(np.argmax(preds))
-    return {"disease": LABELS[idx], "confidence": float(preds[idx]), "all": [float(p) for p in preds]}
+    return {"disease": labels[idx], "confidence": float(preds[idx]), "all": [float(p) for p in preds]}
+
+def decode_upload(image_bytes, size=224):
+    """Decode one upload (bytes or a spooled file) into a (1, size, size, 3) batch for the model's input size."""
+    start = time.perf_counter()
+    # Both paths check the header's pixel count before decoding (decompression bombs -> 413)
+    if FAST_DECODE:
+        x = decode_image_bytes(image_bytes, target_size=(size, size), max_pixels=MAX_IMAGE_PIXELS)
+    else:
+        x = preprocess_image_bytes(image_bytes, target_size=(size, size), max_pixels=MAX_IMAGE_PIXELS)
+    DECODE_SECONDS.observe(time.perf_counter() - start)
+    return x
+
+def decode_payload_image(image, size=224):
+    """Decode one /analyze_tensors image; RAW images already at `size` are only reshaped."""
+    start = time.perf_counter()
+    x = decode_tensor(image, size)
+    if not FAST_DECODE:
+        # Same dtype and scale as decode_upload: both endpoints share one batcher, and a uint8 row
+        # concatenated with float32 [0, 1] rows would reach the model as 0-255 floats
+        x = x.astype(np.float32) / 255.0
+    DECODE_SECONDS.observe(time.perf_counter() - start)
+    return x
 
-@app.post("/analyze_files")
-async def analyze_files(files: List[UploadFile] = File(...)):
+def hash_upload(f):
+    """Perceptual hash of a spooled upload, rewound afterwards for the full decode."""
+    try:
+        return perceptual_hash(f, max_pixels=MAX_IMAGE_PIXELS)
+    finally:
+        f.seek(0)
+
+def uncertain_images(preds):
+    return tta_candidates(preds, TTA_BAND_LOW, TTA_BAND_HIGH) if TTA_ENABLED else []
+
+def _classify_job_image(path, version):
+    data = Path(path).read_bytes()
+    key = cache.key(data, version.cache_fingerprint)
+    preds = cache.get(key)
+    if preds is not None:
+        return key, preds, None
+    try:
+        return key, None, decode_upload(data, version.input_size)
+    except (OSError, ValueError) as exc:
+        # Unreadable or oversized images fail individually instead of failing the job
+        return key, exc, None
+
+def process_job_batch(paths):
+    """Classify one batch of stored job images in a single forward pass.
+
+    Returns a prediction dict (or the exception) per image, plus the model version used.
+    """
+    with registry.acquire() as version:
+        decoded = list(job_decode_pool.map(lambda p: _classify_job_image(p, version), paths))
+        results = [None] * len(paths)
+        todo = []
+        for i, (key, preds, x) in enumerate(decoded):
+            if x is not None:
+                todo.append((i, key, x))
+            else:
+                results[i] = preds if isinstance(preds, Exception) else format_prediction(preds, version.labels)
+        if todo:
+            preds = version.model.predict(np.concatenate([x for _, _, x in todo]))
+            uncertain = uncertain_images(preds)
+            if uncertain:
+                views = np.concatenate([tta_views(todo[j][2]) for j in uncertain])
+                average_tta(preds, uncertain, version.model.predict(views))
+                TTA_IMAGES.inc(len(uncertain))
+            cache.put_many([(key, p) for (_, key, _), p in zip(todo, preds)])
+            for (i, _, _), p in zip(todo, preds):
+                results[i] = format_prediction(p, version.labels)
+        return results, version.version
+
+# The body is parsed by read_uploads rather than File(...) so limits apply while it streams in
+ANALYZE_FILES_BODY = {
+    "required": True,
+    "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["files"],
+        "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+    }}},
+}
+
+@app.post("/analyze_files", openapi_extra={"requestBody": ANALYZE_FILES_BODY})
+async def analyze_files(request: Request, response: Response):
+    require_ready()
+    timer = StageTimer(STAGE_SECONDS)
+    try:
+        with timer.stage("read"):
+            files = await read_uploads(
+                request,
+                max_files=MAX_FILES_PER_REQUEST,
+                max_file_bytes=MAX_FILE_BYTES,
+                max_request_bytes=MAX_REQUEST_BYTES,
+                spool_bytes=UPLOAD_SPOOL_BYTES,
+            )
+    except MultiPartException as exc:
+        raise HTTPException(status_code=400, detail=exc.message)
+    try:
+        # The request finishes on this version even if a new one is swapped in meanwhile
+        with registry.acquire() as version:
+            return await analyze_uploads(files, version, timer, response)
+    finally:
+        for f in files:
+            f.close()
+
+async def analyze_uploads(files, version, timer, response):
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
-
-    per_image_predictions = []
+    REQUEST_IMAGES.observe(len(files))
+    REQUEST_BYTES.observe(sum(f.size for f in files))
     for f in files:
-        content = await f.read()
-        pred = predict_image_bytes(content)
-        per_image_predictions.append(pred)
-
-    # Aggregation: majority vote + avg confidence for winning class
-    counts = {}
-    for p in per_image_predictions:
-        counts[p["disease"]] = counts.get(p["disease"], 0) + 1
-
-    final_disease = max(counts.items(), key=lambda x: (x[1], x[0]))[0]
-    confidences = [p["confidence"] for p in per_image_predictions if p["disease"]==final_disease]
-    avg_conf = float(sum(confidences)/len(confidences)) if confidences else 0.0
-
-    if avg_conf >= 0.85:
-        severity = "severe"
-    elif avg_conf >= 0.6:
-        severity = "moderate"
-    else:
-        severity = "mild"
-
-    description = f"Likely {final_disease} detected aggregated over {len(files)} images."
-    recommendations = [
-        "Keep the area clean",
-        "Book a vet appointment",
-        "Avoid applying unverified home remedies"
-    ]
-
-    return {
-        "disease": final_disease,
-        "confidence": round(avg_conf * 100, 2),
-        "severity": severity,
-        "description": description,
-        "recommendations": recommendations,
-        "per_image_predictions": per_image_predictions
-    }
+        IMAGE_BYTES.observe(f.size)
+
+    # Digests were computed while streaming, so the bytes are never copied for hashing.
+    # Images are decoded straight from each spooled upload, no intermediate bytes copy.
+    keys = [cache.key_from_digest(f.digest, version.cache_fingerprint) for f in files]
+    return await analyze_images(
+        keys,
+        lambda i: decode_upload(files[i].file, version.input_size),
+        lambda i: hash_upload(files[i].file),
+        version, timer, response,
+    )
+
+async def analyze_images(keys, decode, phash, version, timer, response):
+    """Shared by /analyze_files and /analyze_tensors: cache lookup, near-duplicate collapsing,
+    batched inference, TTA and aggregation. decode(i) returns image i as a (1, H, W, 3) batch
+    and phash(i) its dHash; both run on the decode pool."""
+    with timer.stage("cache"):
+        # With CACHE_DIR set, lookups and stores hit SQLite, so they stay off the event loop
+        preds = await asyncio.to_thread(cache.get_many, keys)
+
+    # Only decode and run inference on images we have not seen with this model
+    missing = [i for i, p in enumerate(preds) if p is None]
+    CACHE_LOOKUPS.inc(len(keys) - len(missing), result="hit")
+    CACHE_LOOKUPS.inc(len(missing), result="miss")
+    # Burst shots of the same lesion share the inference of the first one
+    owners = {i: i for i in missing}
+    if NEAR_DUP_ENABLED and len(missing) > 1:
+        with timer.stage("dedup"):
+            hashes = await decode_pool.map(phash, missing)
+        owners = {i: missing[j] for i, j in zip(missing, near_duplicate_groups(hashes, NEAR_DUP_MAX_DISTANCE))}
+    unique = [i for i in missing if owners[i] == i]
+    NEAR_DUP_IMAGES.inc(len(missing) - len(unique))
+    if unique:
+        with timer.stage("decode"):
+            arrays = await decode_pool.map(decode, unique)
+        # Includes the wait for a shared batch slot, see pawscan_inference_queue_wait_seconds
+        with timer.stage("inference"):
+            fresh = await asyncio.wrap_future(version.batcher.submit(np.concatenate(arrays)))
+        uncertain = uncertain_images(fresh)
+        if uncertain:
+            # All views of all borderline images go through one batched pass
+            with timer.stage("tta"):
+                views = await decode_pool.map(tta_views, [arrays[j] for j in uncertain])
+                view_preds = await asyncio.wrap_future(version.batcher.submit(np.concatenate(views)))
+            average_tta(fresh, uncertain, view_preds)
+            TTA_IMAGES.inc(len(uncertain))
+        for i, p in zip(unique, fresh):
+            preds[i] = p
+        await asyncio.to_thread(cache.put_many, [(keys[i], preds[i]) for i in unique])
+    # Duplicates are not cached under their own key: scanned alone they get their own inference
+    for i in missing:
+        preds[i] = preds[owners[i]]
+    aggregate_start = time.perf_counter()
+    per_image_predictions = [format_prediction(p, version.labels) for p in preds]
+    for i in missing:
+        if owners[i] != i:
+            per_image_predictions[i]["duplicate_of"] = owners[i]
+    result = aggregate_predictions(per_image_predictions)
+
+    timer.record("aggregate", time.perf_counter() - aggregate_start)
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = timer.server_timing()
+    result["per_image_predictions"] = per_image_predictions
+    result["model_version"] = version.version
+    return result
+
+ANALYZE_TENSORS_BODY = {
+    "required": True,
+    "content": {TENSORS_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}}},
+}
+
+@app.post("/analyze_tensors", openapi_extra={"requestBody": ANALYZE_TENSORS_BODY})
+async def analyze_tensors(request: Request, response: Response):
+    """Like /analyze_files, for images the client already downscaled (layout in api/tensors.py).
+
+    Same limits and response schema. RAW images at the model's input size skip decoding entirely.
+    """
+    require_ready()
+    timer = StageTimer(STAGE_SECONDS)
+    with timer.stage("read"):
+        body = await read_body(request, max_request_bytes=MAX_REQUEST_BYTES)
+        try:
+            images = parse_payload(body, max_images=MAX_FILES_PER_REQUEST, max_pixels=MAX_IMAGE_PIXELS)
+        except PayloadError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    REQUEST_IMAGES.observe(len(images))
+    REQUEST_BYTES.observe(len(body))
+    for image in images:
+        IMAGE_BYTES.observe(image.size)
+
+    with registry.acquire() as version:
+        keys = [cache.key_from_digest(image.digest, version.cache_fingerprint) for image in images]
+        return await analyze_images(
+            keys,
+            lambda i: decode_payload_image(images[i], version.input_size),
+            lambda i: tensor_hash(images[i]),
+            version, timer, response,
+        )
+
+def reject_jobs_without_model():
+    # Jobs are accepted while the model is still loading, but not once loading has failed
+    if _startup_error:
+        raise HTTPException(status_code=503, detail=f"Model failed to load: {_startup_error}",
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+@app.post("/jobs", status_code=202, openapi_extra={"requestBody": ANALYZE_FILES_BODY})
+async def submit_job(request: Request):
+    """Queue a bulk scan (up to JOB_MAX_FILES images) and return its job id immediately."""
+    reject_jobs_without_model()
+    try:
+        files = await read_uploads(
+            request,
+            max_files=JOB_MAX_FILES,
+            max_file_bytes=MAX_FILE_BYTES,
+            max_request_bytes=JOB_MAX_REQUEST_BYTES,
+            spool_bytes=UPLOAD_SPOOL_BYTES,
+        )
+    except MultiPartException as exc:
+        raise HTTPException(status_code=400, detail=exc.message)
+    try:
+        if not files:
+            raise HTTPException(status_code=400, detail="No files uploaded")
+        job_id = await asyncio.to_thread(job_store.create, files)
+    finally:
+        for f in files:
+            f.close()
+    if _startup_error:
+        # Startup failed while the uploads were stored, after fail_unfinished() already ran
+        await asyncio.to_thread(job_store.fail_unfinished, f"Model failed to load: {_startup_error}")
+        reject_jobs_without_model()
+    job_runner.submit(job_id)
+    return {"job_id": job_id, "status": "queued", "total": len(files)}
+
+def get_job_or_404(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """Progress counters, and the aggregated result once the job has completed."""
+    return get_job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/images")
+def job_images(job_id: str, offset: int = 0, limit: int = 100):
+    """Per-image predictions of a job, in upload order."""
+    get_job_or_404(job_id)
+    return {"job_id": job_id, "offset": offset, "images": job_store.images(job_id, offset, min(limit, 1000))}
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: a `progress` event on every change, then a final `result` event."""
+    get_job_or_404(job_id)
+
+    async def events():
+        last = None
+        while True:
+            job = await asyncio.to_thread(job_store.get, job_id)
+            terminal = job["status"] in TERMINAL_STATUSES
+            snapshot = (job["status"], job["done"], job["failed"])
+            if terminal:
+                yield f"event: result\ndata: {json.dumps(job)}\n\n"
+                return
+            if snapshot != last:
+                last = snapshot
+                yield f"event: progress\ndata: {json.dumps(job)}\n\n"
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/stats/batching")
+def batching_stats():
+    """Queue-depth and batch-size statistics for tuning BATCH_MAX_SIZE / BATCH_MAX_WAIT_MS."""
+    require_ready()
+    return registry.active.batcher.stats()
+
+@app.get("/stats/cache")
+def cache_stats():
+    """Prediction cache hit, miss and eviction counters."""
+    require_ready()
+    return cache.stats()
+
+@app.get("/admin/models")
+def list_models(request: Request):
+    """Loaded model versions, newest first; the first one is serving."""
+    require_admin(request)
+    require_ready()
+    return {"versions": registry.versions()}
+
+@app.post("/admin/models/reload")
+def reload_model(request: Request, path: Optional[str] = None, labels_path: Optional[str] = None):
+    """Load, warm up and golden-check a model, then swap it in; the old version stays loaded.
+
+    Defaults to MODEL_PATH / LABELS_PATH, e.g. after a new pawscan_final.h5 was copied in place.
+    """
+    require_admin(request)
+    require_ready()
+    candidate = Path(path or MODEL_PATH).resolve()
+    labels = Path(labels_path or LABELS_PATH).resolve()
+    allowed = [Path(MODEL_SAVE_PATH).resolve(), Path(MODEL_PATH).resolve().parent]
+    for p in (candidate, labels):
+        if not any(p == root or root in p.parents for root in allowed):
+            raise HTTPException(status_code=400, detail=f"{p} is outside the models directory")
+    try:
+        version = registry.reload(str(candidate), str(labels))
+    except ModelLoadError as exc:
+        raise HTTPException(status_code=422, detail=f"Model rejected, still serving {registry.active.version}: {exc}")
+    return {"active": version.info(), "versions": registry.versions()}
+
+@app.post("/admin/models/rollback")
+def rollback_model(request: Request):
+    """Swap the previously active version back in (instant, it is still loaded)."""
+    require_admin(request)
+    require_ready()
+    try:
+        version = registry.rollback()
+    except ModelLoadError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return {"active": version.info(), "versions": registry.versions()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latencies, payload sizes and batch sizes in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
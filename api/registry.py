@@ -0,0 +1,287 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from .cache import model_fingerprint
+
+
+class ModelLoadError(RuntimeError):
+    """Raised when a candidate model cannot be loaded or fails its sanity check."""
+
+
+class ModelVersion:
+    """One loaded model: backend, labels, its own micro-batcher and in-flight request count."""
+
+    def __init__(self, version, path, labels_path, labels, model, batcher, cache_fingerprint, timings=None,
+                 input_size=224):
+        self.version = version
+        self.path = str(path)
+        self.labels_path = str(labels_path)
+        self.labels = labels
+        self.model = model
+        self.batcher = batcher
+        self.cache_fingerprint = cache_fingerprint
+        self.timings = timings or {}
+        self.input_size = int(input_size)
+        self.loaded_at = time.time()
+        self.golden = None
+        self._in_flight = 0
+        self._retired = False
+
+    def info(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "labels_path": self.labels_path,
+            "num_classes": len(self.labels),
+            "input_size": self.input_size,
+            "loaded_at": self.loaded_at,
+            "timings": self.timings,
+            "golden": self.golden,
+            "in_flight": self._in_flight,
+        }
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+
+def select_variant(manifest_path, budget_ms):
+    """Pick the most accurate model from a src.distill variants manifest within a latency budget.
+
+    Compares each variant's p95 single-image CPU latency with `budget_ms`; if
+    none fits, the fastest variant is returned. Returns (model path, entry).
+    """
+    manifest_path = Path(manifest_path)
+    with open(manifest_path) as f:
+        variants = json.load(f)["variants"]
+    if not variants:
+        raise ModelLoadError(f"{manifest_path} lists no model variants")
+    fitting = [v for v in variants if v["latency_p95_ms"] <= budget_ms]
+    if fitting:
+        entry = max(fitting, key=lambda v: (v["accuracy"], -v["latency_p95_ms"]))
+    else:
+        entry = min(variants, key=lambda v: v["latency_p95_ms"])
+        print(f"⚠️  No model variant meets {budget_ms:.1f} ms p95, using the fastest ({entry['name']})")
+    return str(manifest_path.parent / entry["path"]), entry
+
+
+def golden_set_check(version, golden_dir, decode_fn, blank_input, min_accuracy=0.8):
+    """Sanity-check a candidate model on a small labelled golden set.
+
+    `golden_dir` holds one sub-folder per label (same layout as data/dataset/test).
+    Fails on wrong output shapes, non-finite or non-normalised probabilities, and
+    on top-1 accuracy below `min_accuracy`. Without a golden set only the output
+    for `blank_input` is checked.
+    """
+    golden_dir = Path(golden_dir) if golden_dir else None
+    files = []
+    if golden_dir is not None and golden_dir.is_dir():
+        for class_dir in sorted(p for p in golden_dir.iterdir() if p.is_dir()):
+            if class_dir.name not in version.labels:
+                raise ModelLoadError(f"Golden set class {class_dir.name!r} is not in the model's labels")
+            label = version.labels.index(class_dir.name)
+            files.extend((path, label) for path in sorted(class_dir.iterdir()) if path.is_file())
+
+    if files:
+        x = np.concatenate([decode_fn(path.read_bytes()) for path, _ in files])
+    else:
+        x = blank_input
+    preds = np.asarray(version.model.predict(x))
+
+    if preds.shape != (len(x), len(version.labels)):
+        raise ModelLoadError(f"Model outputs {preds.shape}, expected {(len(x), len(version.labels))}")
+    if not np.isfinite(preds).all():
+        raise ModelLoadError("Model outputs non-finite probabilities")
+    if not np.allclose(preds.sum(axis=1), 1.0, atol=1e-2):
+        raise ModelLoadError("Model outputs do not sum to 1")
+    if not files:
+        return {"images": 0}
+
+    labels = np.array([label for _, label in files])
+    accuracy = float(np.mean(np.argmax(preds, axis=1) == labels))
+    if accuracy < min_accuracy:
+        raise ModelLoadError(f"Golden set accuracy {accuracy:.3f} is below {min_accuracy:.3f}")
+    return {"images": len(files), "accuracy": accuracy}
+
+
+class ModelRegistry:
+    """Serve the active ModelVersion and swap in new ones without dropping requests.
+
+    `load_fn(path, labels_path)` builds a warmed-up ModelVersion and `check_fn`
+    raises if it misbehaves. Requests hold the active version via `acquire()`
+    until they finish, so a swap never changes the model under an in-flight
+    request. The `keep` most recent versions stay loaded for instant rollback;
+    older ones are closed once their last request completes.
+
+    `fingerprint_fn(path)` identifies a model file before loading it, so an
+    unchanged file is not loaded twice. Pass None when the served model is not
+    the local file (remote backend): candidates are then always loaded and
+    matched on the version the backend reports.
+    """
+
+    def __init__(self, load_fn, check_fn=None, keep=2, on_activate=None, fingerprint_fn=model_fingerprint):
+        self.load_fn = load_fn
+        self.fingerprint_fn = fingerprint_fn
+        self.check_fn = check_fn
+        self.keep = max(1, int(keep))
+        self.on_activate = on_activate
+        self._versions = []  # newest first; [0] is active
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    @property
+    def active(self):
+        with self._lock:
+            return self._versions[0] if self._versions else None
+
+    @contextmanager
+    def acquire(self):
+        """Pin the active version for the duration of one request."""
+        with self._lock:
+            if not self._versions:
+                raise ModelLoadError("No model loaded")
+            version = self._versions[0]
+            version._in_flight += 1
+        try:
+            yield version
+        finally:
+            with self._lock:
+                version._in_flight -= 1
+                idle = version._retired and version._in_flight == 0
+            if idle:
+                version.close()
+
+    def load(self, path, labels_path):
+        """Load, warm up and sanity-check a candidate without activating it."""
+        try:
+            version = self.load_fn(path, labels_path)
+        except Exception as exc:
+            raise ModelLoadError(f"Failed to load {path}: {type(exc).__name__}: {exc}") from exc
+        try:
+            if self.check_fn is not None:
+                version.golden = self.check_fn(version)
+        except Exception as exc:
+            version.close()
+            if isinstance(exc, ModelLoadError):
+                raise
+            raise ModelLoadError(f"Sanity check of {path} failed: {type(exc).__name__}: {exc}") from exc
+        return version
+
+    def reload(self, path, labels_path):
+        """Load a model and make it active; returns the new (or already loaded) version."""
+        with self._reload_lock:
+            loaded = None
+            if self.fingerprint_fn is not None:
+                loaded = self._find(self.fingerprint_fn(path), labels_path)
+            if loaded is None:
+                candidate = self.load(path, labels_path)
+                loaded = self._find(candidate.version, labels_path)
+                if loaded is None:
+                    loaded = candidate
+                else:
+                    # Same model as an already loaded version, e.g. an unchanged inference server
+                    candidate.close()
+            self.activate(loaded)
+            return loaded
+
+    def _find(self, version, labels_path):
+        with self._lock:
+            return next((v for v in self._versions if v.version == version and v.labels_path == str(labels_path)),
+                        None)
+
+    def activate(self, version):
+        """Atomically make `version` active; in-flight requests finish on the old one."""
+        with self._lock:
+            self._versions = [version] + [v for v in self._versions if v is not version]
+            retired = self._versions[self.keep:]
+            del self._versions[self.keep:]
+            idle = []
+            for v in retired:
+                v._retired = True
+                if v._in_flight == 0:
+                    idle.append(v)
+        if self.on_activate is not None:
+            self.on_activate(version)
+        for v in idle:
+            v.close()
+        print(f"🔁 Active model: {version.version} ({version.path})")
+
+    def rollback(self):
+        """Switch back to the previously active version, which is still loaded."""
+        with self._reload_lock:
+            with self._lock:
+                if len(self._versions) < 2:
+                    raise ModelLoadError("No previous model version to roll back to")
+                previous = self._versions[1]
+            self.activate(previous)
+            return previous
+
+    def versions(self):
+        with self._lock:
+            return [dict(v.info(), active=(i == 0)) for i, v in enumerate(self._versions)]
+
+    def close(self):
+        with self._lock:
+            versions, self._versions = self._versions, []
+        for v in versions:
+            v.close()
+
+
+class ModelWatcher:
+    """Poll a model file (or SavedModel directory) and hot-reload it when it changes.
+
+    A change is only acted on once the file has stopped changing for one full
+    interval, so a model that is still being written is never loaded. A version
+    that fails its check is not retried until the file changes again.
+    """
+
+    def __init__(self, registry, model_path, labels_path, interval=10.0):
+        self.registry = registry
+        self.model_path = str(model_path)
+        self.labels_path = str(labels_path)
+        self.interval = float(interval)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pawscan-model-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _signature(self):
+        paths = [self.labels_path]
+        if os.path.isdir(self.model_path):
+            paths += sorted(os.path.join(root, n) for root, _, names in os.walk(self.model_path) for n in names)
+        else:
+            paths.append(self.model_path)
+        try:
+            return tuple((p, os.stat(p).st_size, os.stat(p).st_mtime_ns) for p in paths)
+        except FileNotFoundError:
+            return None
+
+    def _run(self):
+        current, pending = self._signature(), None
+        while not self._stop.wait(self.interval):
+            signature = self._signature()
+            if signature is None or signature == current:
+                pending = None
+                continue
+            if signature != pending:
+                # Changed since the last poll: wait until the write has settled
+                pending = signature
+                continue
+            current, pending = signature, None
+            try:
+                self.registry.reload(self.model_path, self.labels_path)
+            except Exception as exc:
+                active = self.registry.active
+                print(f"❌ Hot reload of {self.model_path} rejected, still serving "
+                      f"{active.version if active else 'nothing'}: {exc}")
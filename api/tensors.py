@@ -0,0 +1,139 @@
+"""Compact binary payload of client-downscaled images for POST /analyze_tensors.
+
+Layout, all integers little-endian:
+
+    header  magic b"PWST" | version u8 (1) | count u16
+    image   kind u8 | height u16 | width u16 | length u32 | payload (length bytes), repeated count times
+
+kind 0 (RAW) is uint8 RGB pixels, row-major H x W x 3, so length == H * W * 3.
+kind 1 (JPEG) is a JPEG thumbnail whose header must match the declared H x W.
+Images already at the model's input size go to inference without any decode
+or resize. Other sizes are resized like an upload.
+"""
+import hashlib
+import io
+import struct
+import numpy as np
+from PIL import Image
+
+from .utils import MAX_IMAGE_PIXELS, open_image, decode_image_bytes, dhash_image
+
+MAGIC = b"PWST"
+VERSION = 1
+KIND_RAW = 0
+KIND_JPEG = 1
+CONTENT_TYPE = "application/x-pawscan-tensors"
+
+_HEADER = struct.Struct("<4sBH")
+_ENTRY = struct.Struct("<BHHI")
+
+
+class PayloadError(ValueError):
+    """Raised for a malformed /analyze_tensors body; mapped to HTTP 400."""
+
+
+class TensorImage:
+    """One image of a payload: kind, declared shape and a zero-copy view of its bytes."""
+
+    def __init__(self, kind, height, width, data):
+        self.kind = kind
+        self.height = height
+        self.width = width
+        self.data = data
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def digest(self):
+        """sha256 over kind, shape and payload, so equal pixels with another shape never share a cache key."""
+        digest = hashlib.sha256(_ENTRY.pack(self.kind, self.height, self.width, len(self.data)))
+        digest.update(self.data)
+        return digest.hexdigest()
+
+    def pixels(self):
+        """The RAW payload as an (H, W, 3) uint8 array (no copy)."""
+        return np.frombuffer(self.data, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+
+def encode_payload(images, quality=None):
+    """Pack (H, W, 3) uint8 arrays as RAW images, or as JPEG thumbnails when `quality` is given."""
+    parts = [_HEADER.pack(MAGIC, VERSION, len(images))]
+    for arr in images:
+        arr = np.ascontiguousarray(arr, dtype=np.uint8)
+        height, width = arr.shape[:2]
+        if quality is None:
+            kind, data = KIND_RAW, arr.tobytes()
+        else:
+            buf = io.BytesIO()
+            Image.fromarray(arr, "RGB").save(buf, format="JPEG", quality=quality)
+            kind, data = KIND_JPEG, buf.getvalue()
+        parts.append(_ENTRY.pack(kind, height, width, len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def parse_payload(body, max_images=10, max_pixels=MAX_IMAGE_PIXELS):
+    """Split a payload into TensorImages, checking every header before anything is decoded."""
+    view = memoryview(body)
+    if len(view) < _HEADER.size:
+        raise PayloadError("Payload is shorter than its header")
+    magic, version, count = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise PayloadError("Payload does not start with the PWST magic")
+    if version != VERSION:
+        raise PayloadError(f"Unsupported payload version {version}")
+    if count == 0:
+        raise PayloadError("Payload holds no images")
+    if count > max_images:
+        raise PayloadError(f"At most {max_images} images per request")
+
+    images, offset = [], _HEADER.size
+    for i in range(count):
+        if offset + _ENTRY.size > len(view):
+            raise PayloadError(f"Image {i}: truncated header")
+        kind, height, width, length = _ENTRY.unpack_from(view, offset)
+        offset += _ENTRY.size
+        if offset + length > len(view):
+            raise PayloadError(f"Image {i}: declares {length} bytes, {len(view) - offset} left")
+        if not height or not width or (max_pixels and height * width > max_pixels):
+            raise PayloadError(f"Image {i}: invalid shape {height}x{width}")
+        data = view[offset:offset + length]
+        offset += length
+        if kind == KIND_RAW:
+            if length != height * width * 3:
+                raise PayloadError(f"Image {i}: RAW {height}x{width}x3 needs {height * width * 3} bytes, got {length}")
+        elif kind == KIND_JPEG:
+            try:
+                img = open_image(io.BytesIO(data), max_pixels)
+            except (OSError, ValueError) as exc:
+                raise PayloadError(f"Image {i}: unreadable JPEG ({exc})") from exc
+            if img.format != "JPEG" or img.size != (width, height):
+                raise PayloadError(f"Image {i}: expected a {height}x{width} JPEG, got {img.format} {img.height}x{img.width}")
+        else:
+            raise PayloadError(f"Image {i}: unknown kind {kind}")
+        images.append(TensorImage(kind, height, width, data))
+    if offset != len(view):
+        raise PayloadError(f"{len(view) - offset} trailing bytes after the last image")
+    return images
+
+
+def decode_tensor(image, size=224):
+    """Return one payload image as a (1, size, size, 3) uint8 batch."""
+    if image.kind == KIND_JPEG:
+        return decode_image_bytes(io.BytesIO(image.data), target_size=(size, size), max_pixels=None)
+    arr = image.pixels()
+    if arr.shape[:2] != (size, size):
+        arr = np.asarray(Image.fromarray(arr, "RGB").resize((size, size), reducing_gap=3.0))
+    return arr[np.newaxis]
+
+
+def tensor_hash(image):
+    """Perceptual hash (dHash) of a payload image, for near-duplicate collapsing."""
+    if image.kind == KIND_JPEG:
+        img = Image.open(io.BytesIO(image.data))
+        img.draft("L", (64, 64))
+    else:
+        img = Image.fromarray(image.pixels(), "RGB")
+    return dhash_image(img)
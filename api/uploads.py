@@ -0,0 +1,131 @@
+import hashlib
+
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+
+class UploadTooLargeError(ValueError):
+    """Raised while streaming a request that breaks an upload limit; mapped to HTTP 413."""
+
+
+class Upload:
+    """One streamed file part: its spooled file, byte count and sha256 content digest."""
+
+    def __init__(self, upload_file, size, digest):
+        self.upload_file = upload_file
+        self.filename = upload_file.filename
+        self.size = size
+        self.digest = digest
+
+    @property
+    def file(self):
+        """The underlying binary file, rewound so it can be handed straight to PIL."""
+        self.upload_file.file.seek(0)
+        return self.upload_file.file
+
+    def read(self):
+        return self.file.read()
+
+    def close(self):
+        self.upload_file.file.close()
+
+
+class LimitedMultiPartParser(MultiPartParser):
+    """Starlette's multipart parser with per-file size limits and streaming digests.
+
+    Every file part is hashed and counted as its chunks arrive, so an oversized
+    file is rejected as soon as it crosses `max_file_bytes` rather than after the
+    whole body has been spooled. File data stays in memory up to `spool_bytes`
+    per file and rolls over to a temporary file beyond that.
+    """
+
+    def __init__(self, headers, stream, max_files, max_file_bytes, spool_bytes):
+        super().__init__(headers, stream, max_files=max_files)
+        self.max_file_bytes = max_file_bytes
+        self.spool_max_size = spool_bytes
+        self.uploads = []
+        self._hash = None
+        self._size = 0
+
+    def on_headers_finished(self):
+        super().on_headers_finished()
+        if self._current_part.file is not None:
+            self._hash = hashlib.sha256()
+            self._size = 0
+
+    def on_part_data(self, data, start, end):
+        if self._current_part.file is not None:
+            self._size += end - start
+            if self.max_file_bytes and self._size > self.max_file_bytes:
+                raise UploadTooLargeError(
+                    f"File {self._current_part.file.filename!r} exceeds {self.max_file_bytes} bytes"
+                )
+            self._hash.update(data[start:end])
+        super().on_part_data(data, start, end)
+
+    def on_part_end(self):
+        if self._current_part.file is not None:
+            self.uploads.append(Upload(self._current_part.file, self._size, self._hash.hexdigest()))
+        super().on_part_end()
+
+
+async def _limited_stream(stream, max_request_bytes):
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if max_request_bytes and received > max_request_bytes:
+            raise UploadTooLargeError(f"Request body exceeds {max_request_bytes} bytes")
+        yield chunk
+
+
+async def read_body(request, max_request_bytes=None):
+    """Read a raw (non-multipart) request body, enforcing max_request_bytes as it streams in."""
+    content_length = request.headers.get("content-length")
+    if max_request_bytes and content_length and content_length.isdigit() and int(content_length) > max_request_bytes:
+        raise UploadTooLargeError(f"Request body exceeds {max_request_bytes} bytes")
+    body = bytearray()
+    async for chunk in _limited_stream(request.stream(), max_request_bytes):
+        body += chunk
+    return bytes(body)
+
+
+async def read_uploads(request, field="files", max_files=10, max_file_bytes=None, max_request_bytes=None,
+                       spool_bytes=256 * 1024):
+    """Stream a multipart request into spooled Uploads, enforcing the limits as bytes arrive.
+
+    Raises UploadTooLargeError for size or file-count violations and
+    MultiPartException for malformed bodies or a non-multipart content type.
+    Only parts named `field` are kept.
+    """
+    content_type = request.headers.get("content-type", "").lower()
+    if not content_type.startswith("multipart/form-data") or "boundary=" not in content_type:
+        raise MultiPartException("Expected a multipart/form-data body with a boundary")
+    content_length = request.headers.get("content-length")
+    if max_request_bytes and content_length and content_length.isdigit() and int(content_length) > max_request_bytes:
+        raise UploadTooLargeError(f"Request body exceeds {max_request_bytes} bytes")
+
+    parser = LimitedMultiPartParser(
+        request.headers,
+        _limited_stream(request.stream(), max_request_bytes),
+        max_files=max_files,
+        max_file_bytes=max_file_bytes,
+        spool_bytes=spool_bytes,
+    )
+    try:
+        form = await parser.parse()
+    except BaseException as exc:
+        # Spooled files of every rejected request are closed here, whatever the error
+        for upload in parser.uploads:
+            upload.close()
+        if isinstance(exc, MultiPartException) and "Too many files" in str(exc):
+            raise UploadTooLargeError(f"At most {max_files} files per request") from exc
+        raise
+
+    wanted = {id(f) for f in form.getlist(field) if isinstance(f, UploadFile)}
+    uploads = []
+    for upload in parser.uploads:
+        if id(upload.upload_file) in wanted:
+            uploads.append(upload)
+        else:
+            upload.close()
+    return uploads
@@ -2,10 +2,182 @@ from PIL import Image
 import io
 import numpy as np
 
-def preprocess_image_bytes(image_bytes, target_size=(224,224)):
-    """Return a numpy array shaped (1, H, W, C) normalized 0-1."""
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+# Decompression-bomb guard: uploads whose header declares more pixels are rejected before decoding
+MAX_IMAGE_PIXELS = 50_000_000
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image header declares more than the allowed number of pixels."""
+
+
+def open_image(source, max_pixels=MAX_IMAGE_PIXELS):
+    """Open image bytes or a binary file object lazily and check its declared size.
+
+    Image.open only parses the header, so an oversized image is rejected
+    without allocating its pixel buffer.
+    """
+    try:
+        img = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+    except Image.DecompressionBombError as exc:
+        # Pillow's own guard (2x Image.MAX_IMAGE_PIXELS) fires inside Image.open, before the check below
+        raise ImageTooLargeError(str(exc)) from exc
+    if max_pixels and img.width * img.height > max_pixels:
+        raise ImageTooLargeError(f"Image is {img.width}x{img.height}, limit is {max_pixels} pixels")
+    return img
+
+
+def preprocess_image_bytes(image_bytes, target_size=(224,224), max_pixels=MAX_IMAGE_PIXELS):
+    """Return a numpy array shaped (1, H, W, C) normalized 0-1.
+
+    Accepts raw bytes or a binary file object (e.g. a spooled upload).
+    """
+    img = open_image(image_bytes, max_pixels).convert("RGB")
     img = img.resize(target_size)
     arr = np.asarray(img).astype("float32") / 255.0
     arr = np.expand_dims(arr, axis=0)
     return arr
+
+
+def preprocess_images_bytes(images_bytes, target_size=(224,224)):
+    """Decode a list of uploads into a single (N, H, W, C) batch normalized 0-1."""
+    batch = np.empty((len(images_bytes), target_size[1], target_size[0], 3), dtype="float32")
+    for i, image_bytes in enumerate(images_bytes):
+        batch[i] = preprocess_image_bytes(image_bytes, target_size=target_size)[0]
+    return batch
+
+
+def decode_image_bytes(image_bytes, target_size=(224,224), max_pixels=MAX_IMAGE_PIXELS):
+    """Fast path: return a uint8 array shaped (1, H, W, C), normalization is left to the model.
+
+    JPEGs are decoded with the decoder's native DCT downscaling (draft mode) to the
+    smallest 1/2, 1/4 or 1/8 scale that still covers target_size, so a 12 MP photo
+    never materializes at full resolution before the final resize. Accepts raw
+    bytes or a binary file object.
+    """
+    img = open_image(image_bytes, max_pixels)
+    if img.format == "JPEG":
+        img.draft("RGB", target_size)
+    img = img.convert("RGB")
+    # reducing_gap lets Pillow box-reduce large non-JPEG inputs before resampling
+    img = img.resize(target_size, reducing_gap=3.0)
+    return np.asarray(img)[np.newaxis]
+
+
+def dhash_image(img, size=8):
+    """64-bit difference hash of a PIL image: the sign of horizontal gradients on a
+    (size+1) x size grayscale thumbnail (same bits as src/dataset_index.dhash)."""
+    small = np.asarray(img.convert("L").resize((size + 1, size), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def perceptual_hash(source, size=8, max_pixels=MAX_IMAGE_PIXELS):
+    """dHash of an upload from a small grayscale decode.
+
+    JPEGs decode at 1/8 scale in draft mode, so hashing costs a fraction of the full decode.
+    """
+    img = open_image(source, max_pixels)
+    if img.format == "JPEG":
+        img.draft("L", (size * 8, size * 8))
+    return dhash_image(img, size)
+
+
+def near_duplicate_groups(hashes, max_distance):
+    """Index of the image each one shares its inference with: the first earlier image whose
+    hash is within max_distance bits (Hamming distance), or its own index."""
+    owners, representatives = [], []
+    for i, h in enumerate(hashes):
+        owner = next((j for j in representatives if bin(h ^ hashes[j]).count("1") <= max_distance), None)
+        if owner is None:
+            owner = i
+            representatives.append(i)
+        owners.append(owner)
+    return owners
+
+
+# Cheap views averaged with the original image by test-time augmentation
+TTA_VIEWS = ("hflip", "center_crop", "brighter", "darker")
+
+
+def tta_views(x, crop=0.875, brightness=0.1):
+    """Return the TTA_VIEWS of one decoded image batch (1, H, W, C) as (len(TTA_VIEWS), H, W, C).
+
+    Works on uint8 pixels (fast decode) and on float inputs in [0, 1], and keeps the dtype.
+    """
+    img = x[0]
+    height, width = img.shape[:2]
+    top, left = int(height * (1 - crop) / 2), int(width * (1 - crop) / 2)
+    if img.dtype == np.uint8:
+        cropped = Image.fromarray(img[top:height - top, left:width - left])
+        cropped = np.asarray(cropped.resize((width, height), Image.BILINEAR))
+        limit = 255
+    else:
+        # Mode "F" images are single-channel, so float crops are resized per channel
+        cropped = np.stack([
+            np.asarray(Image.fromarray(img[top:height - top, left:width - left, c].astype("float32"), "F")
+                       .resize((width, height), Image.BILINEAR))
+            for c in range(img.shape[-1])
+        ], axis=-1)
+        limit = 1.0
+    scaled = img.astype("float32")
+    views = [
+        img[:, ::-1],
+        cropped,
+        np.clip(scaled * (1 + brightness), 0, limit),
+        np.clip(scaled * (1 - brightness), 0, limit),
+    ]
+    return np.stack([v.astype(img.dtype) for v in views])
+
+
+def tta_candidates(preds, low, high):
+    """Indices of predictions whose top-1 confidence falls inside [low, high)."""
+    return [i for i, p in enumerate(preds) if low <= float(np.max(p)) < high]
+
+
+def average_tta(preds, candidates, view_preds):
+    """Replace each candidate's probabilities, in place, with the mean over the original and its views.
+
+    `view_preds` holds len(TTA_VIEWS) consecutive rows per candidate, in candidate order.
+    """
+    n = len(TTA_VIEWS)
+    for k, i in enumerate(candidates):
+        preds[i] = (preds[i] + view_preds[k * n:(k + 1) * n].sum(axis=0)) / (n + 1)
+    return preds
+
+
+def aggregate_predictions(per_image_predictions):
+    """Combine per-image predictions into one diagnosis.
+
+    Majority vote over the predicted diseases (ties go to the later label name),
+    confidence is the average over the images that voted for the winner, and
+    severity is bucketed from that confidence.
+    """
+    counts = {}
+    for p in per_image_predictions:
+        counts[p["disease"]] = counts.get(p["disease"], 0) + 1
+
+    final_disease = max(counts.items(), key=lambda x: (x[1], x[0]))[0]
+    confidences = [p["confidence"] for p in per_image_predictions if p["disease"]==final_disease]
+    avg_conf = float(sum(confidences)/len(confidences)) if confidences else 0.0
+
+    if avg_conf >= 0.85:
+        severity = "severe"
+    elif avg_conf >= 0.6:
+        severity = "moderate"
+    else:
+        severity = "mild"
+
+    description = f"Likely {final_disease} detected aggregated over {len(per_image_predictions)} images."
+    recommendations = [
+        "Keep the area clean",
+        "Book a vet appointment",
+        "Avoid applying unverified home remedies"
+    ]
+
+    return {
+        "disease": final_disease,
+        "confidence": round(avg_conf * 100, 2),
+        "severity": severity,
+        "description": description,
+        "recommendations": recommendations,
+    }
@@ -0,0 +1,173 @@
+"""Load test and latency benchmark for the /analyze_files endpoint.
+
+Starts the API in-process on a local port, serving a randomly initialised model
+from create_mobilenet_model (no trained weights or network access needed), and
+drives it with synthetic phone-sized JPEGs at each concurrency / images-per-request
+combination. Writes a machine-readable JSON report; with --baseline, any scenario
+that regresses beyond --tolerance makes the run exit non-zero.
+
+Usage:
+    python -m benchmarks.bench_api_load --output benchmarks/baseline_api_load.json
+    python -m benchmarks.bench_api_load --baseline benchmarks/baseline_api_load.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.common import PHONE_SIZES, current_rss_mb, make_image_bytes, peak_rss_mb, percentiles
+
+
+def build_random_model(path):
+    from src.model_architecture import create_mobilenet_model
+    model, _ = create_mobilenet_model(weights=None)
+    model.save(path)
+    return path
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(model_path, timeout=300):
+    """Run uvicorn with api.main:app in a background thread; returns (server, base_url)."""
+    os.environ["MODEL_PATH"] = model_path
+    # Every request must pay for decode + inference, so the prediction cache is off
+    os.environ["CACHE_MAX_ENTRIES"] = "0"
+    # Synthetic gradient images all share one dHash; collapsing them would skip the inferences under test
+    os.environ["NEAR_DUP_ENABLED"] = "0"
+    import uvicorn
+    from api.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="bench-uvicorn", daemon=True).start()
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/health/ready", timeout=1).status_code == 200:
+                return server, base_url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API did not become ready in time")
+
+
+def run_scenario(base_url, pool, concurrency, images_per_request, num_requests):
+    local = threading.local()
+
+    def one_request(i):
+        session = getattr(local, "session", None) or requests.Session()
+        local.session = session
+        files = [("files", (f"image_{j}.jpg", pool[(i + j) % len(pool)], "image/jpeg")) for j in range(images_per_request)]
+        start = time.perf_counter()
+        response = session.post(f"{base_url}/analyze_files", files=files, timeout=120)
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(num_requests)))
+    wall = time.perf_counter() - start
+
+    latencies = [lat * 1000 for lat, status in results if status == 200]
+    errors = sum(1 for _, status in results if status != 200)
+    ok = len(latencies)
+    return {
+        "concurrency": concurrency,
+        "images_per_request": images_per_request,
+        "requests": num_requests,
+        "errors": errors,
+        "latency_ms": percentiles(latencies) if latencies else {},
+        "requests_per_sec": ok / wall,
+        "images_per_sec": ok * images_per_request / wall,
+        "rss_mb": current_rss_mb(),
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """Return a list of human-readable regressions against a previous report."""
+    regressions = []
+    for key, current in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(key)
+        if not base or not base.get("latency_ms") or not current.get("latency_ms"):
+            continue
+        if current["latency_ms"]["p95"] > base["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {current['latency_ms']['p95']:.1f} ms vs baseline {base['latency_ms']['p95']:.1f} ms")
+        if current["images_per_sec"] < base["images_per_sec"] * (1 - tolerance):
+            regressions.append(f"{key}: {current['images_per_sec']:.2f} img/s vs baseline {base['images_per_sec']:.2f} img/s")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{key}: {current['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--images", type=int, nargs="+", default=[1, 4, 8], help="Images per request")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per scenario")
+    parser.add_argument("--pool-size", type=int, default=12, help="Distinct synthetic photos to draw from")
+    parser.add_argument("--model", default=None, help="Serve this model instead of a random one")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Fail if results regress against this report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    model_path = args.model or build_random_model(os.path.join(tmp.name, "random_mobilenet.h5"))
+    pool = [make_image_bytes(*PHONE_SIZES[i % len(PHONE_SIZES)], seed=i) for i in range(args.pool_size)]
+    server, base_url = start_server(model_path)
+    startup = requests.get(f"{base_url}/health").json().get("startup", {})
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "model": "random" if args.model is None else args.model,
+        "startup": startup,
+        "scenarios": {},
+    }
+    print("=" * 84)
+    print("🔥 /analyze_files LOAD TEST")
+    print("=" * 84)
+    print(f"{'conc':>5} {'imgs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'img/s':>8} {'err':>5} {'RSS MB':>8}")
+    for concurrency in args.concurrency:
+        for images in args.images:
+            r = run_scenario(base_url, pool, concurrency, images, args.requests)
+            report["scenarios"][f"c{concurrency}_i{images}"] = r
+            lat = r["latency_ms"] or {"p50": float("nan"), "p95": float("nan"), "p99": float("nan")}
+            print(f"{concurrency:>5} {images:>5} {lat['p50']:>9.1f} {lat['p95']:>9.1f} {lat['p99']:>9.1f} "
+                  f"{r['requests_per_sec']:>8.2f} {r['images_per_sec']:>8.2f} {r['errors']:>5} {r['rss_mb']:>8.0f}")
+    report["peak_rss_mb"] = peak_rss_mb()
+    server.should_exit = True
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%} of {args.baseline}:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
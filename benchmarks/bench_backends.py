@@ -0,0 +1,86 @@
+"""Parity and latency report for the Keras and TFLite inference backends on the test split.
+
+Usage:
+    python -m benchmarks.bench_backends --tflite models/pawscan_final_fp16.tflite models/pawscan_final_int8.tflite
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from api.backends import KerasBackend, TFLiteBackend
+from benchmarks.common import percentiles
+from src.data_preprocessing import create_data_generators, iterate_batches
+from src.config import MODEL_SAVE_PATH
+
+
+def run_backend(backend, images):
+    """Predict one image at a time, returning (probabilities, per-image latencies in ms)."""
+    backend.predict(images[:1])  # warmup
+    preds, latencies = [], []
+    for img in images:
+        start = time.perf_counter()
+        preds.append(backend.predict(img[np.newaxis])[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.stack(preds), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keras", default=os.path.join(MODEL_SAVE_PATH, "pawscan_final.h5"))
+    parser.add_argument("--tflite", nargs="+", default=[
+        os.path.join(MODEL_SAVE_PATH, "pawscan_final_fp16.tflite"),
+        os.path.join(MODEL_SAVE_PATH, "pawscan_final_int8.tflite"),
+    ])
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N test images")
+    parser.add_argument("--output", default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+
+    _, _, test_gen = create_data_generators()
+    images, labels = [], []
+    for batch_x, batch_y in iterate_batches(test_gen):
+        images.append(batch_x)
+        labels.append(np.argmax(batch_y, axis=1))
+    images, labels = np.concatenate(images), np.concatenate(labels)
+    if args.limit:
+        images, labels = images[:args.limit], labels[:args.limit]
+
+    backends = {"keras": KerasBackend(args.keras)}
+    for path in args.tflite:
+        backends[os.path.basename(path)] = TFLiteBackend(path, num_threads=args.threads)
+
+    report, reference = {}, None
+    for name, backend in backends.items():
+        preds, latencies = run_backend(backend, images)
+        top1 = np.argmax(preds, axis=1)
+        if reference is None:
+            reference = top1
+        accuracy = float(np.mean(top1 == labels))
+        report[name] = {
+            "accuracy": accuracy,
+            "top1_agreement_vs_keras": float(np.mean(top1 == reference)),
+            "latency_ms": percentiles(latencies, qs=(50, 99)),
+            "size_mb": os.path.getsize(backend.model_path) / 1e6,
+        }
+    keras_acc = report["keras"]["accuracy"]
+    for entry in report.values():
+        entry["accuracy_delta"] = entry["accuracy"] - keras_acc
+
+    print("=" * 78)
+    print(f"📊 BACKEND PARITY REPORT ({len(images)} test images, {args.threads} TFLite threads)")
+    print("=" * 78)
+    print(f"{'backend':<32} {'acc':>6} {'Δacc':>7} {'agree':>6} {'p50 ms':>8} {'p99 ms':>8} {'MB':>6}")
+    for name, r in report.items():
+        print(f"{name:<32} {r['accuracy']:>6.3f} {r['accuracy_delta']:>+7.3f} {r['top1_agreement_vs_keras']:>6.3f} "
+              f"{r['latency_ms']['p50']:>8.2f} {r['latency_ms']['p99']:>8.2f} {r['size_mb']:>6.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare per-image inference against a single batched forward pass.
+
+Usage:
+    python -m benchmarks.bench_batched_inference --sizes 1 4 8 16 --repeats 5
+"""
+import argparse
+import numpy as np
+
+from api.main import decode_upload, format_prediction, load_model_state, registry
+from benchmarks.common import make_image_bytes, time_call
+
+
+def predict_image_bytes(image_bytes):
+    """One forward pass per upload."""
+    version = registry.active
+    preds = version.model.predict(decode_upload(image_bytes, version.input_size))  # shape (1, num_classes)
+    return format_prediction(preds[0], version.labels)
+
+
+def predict_images_bytes(images_bytes):
+    """Decode every upload and run a single forward pass over the stacked batch."""
+    version = registry.active
+    x = np.concatenate([decode_upload(b, version.input_size) for b in images_bytes])
+    preds = version.model.predict(x)  # shape (N, num_classes)
+    return [format_prediction(p, version.labels) for p in preds]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1200)
+    args = parser.parse_args()
+    load_model_state()
+
+    print("=" * 60)
+    print("⏱️  PER-IMAGE vs BATCHED INFERENCE")
+    print("=" * 60)
+    print(f"{'N':>4} {'per-image (ms)':>16} {'batched (ms)':>14} {'speedup':>9}")
+
+    for n in args.sizes:
+        images = [make_image_bytes(args.width, args.height, seed=i) for i in range(n)]
+
+        # Sanity check: both paths must agree on every image
+        looped = [predict_image_bytes(b) for b in images]
+        batched = predict_images_bytes(images)
+        for a, b in zip(looped, batched):
+            assert a["disease"] == b["disease"]
+            assert np.allclose(a["all"], b["all"], atol=1e-4)
+
+        per_image = np.median(time_call(lambda: [predict_image_bytes(b) for b in images], args.repeats))
+        single_pass = np.median(time_call(lambda: predict_images_bytes(images), args.repeats))
+        print(f"{n:>4} {per_image * 1000:>16.1f} {single_pass * 1000:>14.1f} {per_image / single_pass:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Decode-time, peak-RSS and prediction-drift benchmark for the fast decode path.
+
+Compares the reference path (preprocess_image_bytes: full decode, float32) with
+the fast path (decode_image_bytes: JPEG draft-mode decode, uint8) on large
+synthetic JPEG and PNG inputs.
+
+Usage:
+    python -m benchmarks.bench_decode --repeats 10
+    python -m benchmarks.bench_decode --model models/pawscan_final.h5 --tolerance 0.02
+"""
+import argparse
+import multiprocessing as mp
+import sys
+import numpy as np
+
+from api.utils import preprocess_image_bytes, decode_image_bytes
+from benchmarks.common import make_image_bytes, peak_rss_mb, time_call
+
+PATHS = {"reference": preprocess_image_bytes, "fast": decode_image_bytes}
+
+
+def _measure_peak_rss(path_name, image_bytes, conn):
+    # Runs in a fresh process so each path starts from the same baseline
+    before = peak_rss_mb()
+    PATHS[path_name](image_bytes)
+    conn.send(peak_rss_mb() - before)
+    conn.close()
+
+
+def peak_rss_delta(path_name, image_bytes):
+    ctx = mp.get_context("spawn")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_measure_peak_rss, args=(path_name, image_bytes, child))
+    proc.start()
+    delta = parent.recv()
+    proc.join()
+    return delta
+
+
+def prediction_drift(model_path, inputs):
+    from api.backends import load_backend
+    backend = load_backend("tflite" if model_path.endswith(".tflite") else "keras", model_path)
+    ref = backend.predict(np.concatenate([preprocess_image_bytes(b) for b in inputs]))
+    fast = backend.predict(np.concatenate([decode_image_bytes(b) for b in inputs]))
+    return float(np.max(np.abs(ref - fast))), float(np.mean(np.argmax(ref, 1) == np.argmax(fast, 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--model", default=None, help="Model used to check prediction drift")
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="Max allowed absolute drift (pixels in [0, 1], or probabilities with --model)")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"🖼️  DECODE BENCHMARK ({args.width}x{args.height} synthetic inputs)")
+    print("=" * 70)
+    print(f"{'format':<6} {'path':<10} {'median ms':>10} {'peak RSS +MB':>13} {'pixel drift':>12}")
+
+    ok = True
+    samples = {}
+    for fmt in ("JPEG", "PNG"):
+        image_bytes = make_image_bytes(args.width, args.height, fmt=fmt)
+        samples[fmt] = image_bytes
+        ref = preprocess_image_bytes(image_bytes)
+        drift = float(np.max(np.abs(ref - decode_image_bytes(image_bytes) / 255.0)))
+        ok &= drift <= args.tolerance
+        for name, fn in PATHS.items():
+            ms = np.median(time_call(lambda: fn(image_bytes), args.repeats)) * 1000
+            rss = peak_rss_delta(name, image_bytes)
+            shown = f"{drift:.4f}" if name == "fast" else "-"
+            print(f"{fmt:<6} {name:<10} {ms:>10.1f} {rss:>13.1f} {shown:>12}")
+
+    if args.model:
+        max_diff, agreement = prediction_drift(args.model, list(samples.values()))
+        print(f"\nPrediction drift vs reference: max |Δp| = {max_diff:.4f}, top-1 agreement = {agreement:.3f}")
+        ok = ok and max_diff <= args.tolerance and agreement == 1.0
+
+    print(f"\n{'✅' if ok else '❌'} Drift {'within' if ok else 'exceeds'} tolerance {args.tolerance}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
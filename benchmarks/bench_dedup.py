@@ -0,0 +1,152 @@
+"""Near-duplicate collapsing on synthetic burst uploads to /analyze_files.
+
+Every request holds --bursts lesions with --shots burst shots each. The shots
+of a lesion are slightly shifted, brightened and re-encoded copies of one
+synthetic photo. The same requests are sent with NEAR_DUP_ENABLED off and on,
+to the API running in-process with the prediction cache disabled. The report
+covers:
+- inferences saved
+- latency per request
+- shots not merged with their burst, and merges across different lesions
+- whether the aggregated diagnosis (disease, severity, confidence) changed
+
+Usage:
+    python -m benchmarks.bench_dedup
+    python -m benchmarks.bench_dedup --model models/pawscan_final.h5 --bursts 2 --shots 5 --max-distance 6
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import requests
+from PIL import Image
+
+from benchmarks.bench_api_load import build_random_model, start_server
+from benchmarks.common import percentiles
+
+
+def make_lesion(seed, width=1920, height=1440):
+    """A synthetic photo whose coarse structure (and so its dHash) differs from seed to seed."""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (9, 12, 3), dtype=np.uint8)
+    img = Image.fromarray(blocks, "RGB").resize((width, height), Image.BICUBIC)
+    noise = rng.normal(0, 6, (height, width, 3))
+    return Image.fromarray(np.clip(np.asarray(img) + noise, 0, 255).astype("uint8"), "RGB")
+
+
+def burst_shot(img, rng):
+    """A burst shot: shifted by up to 1.5%, brightness +-3%, re-encoded at JPEG quality 85-95."""
+    width, height = img.size
+    dx, dy = (int(v) for v in rng.integers(0, [width * 0.015, height * 0.015]))
+    shot = img.crop((dx, dy, width - int(width * 0.015) + dx, height - int(height * 0.015) + dy)).resize(img.size)
+    arr = np.asarray(shot).astype("float32") * rng.uniform(0.97, 1.03)
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(arr, 0, 255).astype("uint8")).save(buf, format="JPEG", quality=int(rng.integers(85, 96)))
+    return buf.getvalue()
+
+
+def make_requests(num_requests, bursts, shots, seed=0):
+    """Per request: the upload bytes and the lesion each upload shows."""
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for r in range(num_requests):
+        lesions = [make_lesion(seed * 100_000 + r * bursts + b) for b in range(bursts)]
+        images, lesion_ids = [], []
+        for s in range(shots):
+            for b, lesion in enumerate(lesions):
+                images.append(burst_shot(lesion, rng))
+                lesion_ids.append(b)
+        payloads.append((images, lesion_ids))
+    return payloads
+
+
+def run_mode(base_url, payloads):
+    session = requests.Session()
+    results, latencies = [], []
+    for images, _ in payloads:
+        files = [("files", (f"shot_{i}.jpg", data, "image/jpeg")) for i, data in enumerate(images)]
+        start = time.perf_counter()
+        response = session.post(f"{base_url}/analyze_files", files=files, timeout=120)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        results.append(response.json())
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=None, help="Model to serve (default: randomly initialised MobileNetV2)")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--bursts", type=int, default=2, help="Lesions per request")
+    parser.add_argument("--shots", type=int, default=4, help="Burst shots per lesion")
+    parser.add_argument("--max-distance", type=int, default=6, help="NEAR_DUP_MAX_DISTANCE")
+    parser.add_argument("--output", default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+
+    os.environ["NEAR_DUP_MAX_DISTANCE"] = str(args.max_distance)
+    tmp = tempfile.TemporaryDirectory()
+    model_path = args.model or build_random_model(os.path.join(tmp.name, "random_model.h5"))
+    server, base_url = start_server(model_path)
+    import api.main as api_main
+
+    payloads = make_requests(args.requests, args.bursts, args.shots)
+    images = sum(len(p[0]) for p in payloads)
+    run_mode(base_url, payloads[:2])  # warmup
+
+    report = {}
+    responses = {}
+    for mode, enabled in (("off", False), ("on", True)):
+        api_main.NEAR_DUP_ENABLED = enabled
+        responses[mode], latencies = run_mode(base_url, payloads)
+        duplicates = sum("duplicate_of" in p for r in responses[mode] for p in r["per_image_predictions"])
+        report[mode] = {
+            "images": images,
+            "inferences": images - duplicates,
+            "latency_ms": dict(percentiles(latencies), mean=float(np.mean(latencies))),
+        }
+
+    # Merge quality: each shot should point at an earlier shot of its own lesion, never another lesion
+    missed, wrong = 0, 0
+    for (_, lesion_ids), result in zip(payloads, responses["on"]):
+        for i, p in enumerate(result["per_image_predictions"]):
+            first = lesion_ids.index(lesion_ids[i])
+            owner = p.get("duplicate_of", i)
+            wrong += lesion_ids[owner] != lesion_ids[i]
+            missed += owner == i and i != first
+    changed, max_conf_diff = 0, 0.0
+    for off, on in zip(responses["off"], responses["on"]):
+        changed += (off["disease"], off["severity"]) != (on["disease"], on["severity"])
+        max_conf_diff = max(max_conf_diff, abs(off["confidence"] - on["confidence"]))
+    report["merge"] = {"missed": missed, "cross_lesion": wrong,
+                       "ideal_inferences": args.requests * args.bursts}
+    report["aggregate"] = {"requests": args.requests, "diagnosis_changed": changed,
+                           "max_confidence_diff": max_conf_diff}
+    saved = 1 - report["on"]["inferences"] / report["off"]["inferences"]
+
+    print("=" * 72)
+    print(f"🖼️  NEAR-DUPLICATE COLLAPSING ({args.requests} requests x {args.bursts} lesions x {args.shots} shots, "
+          f"max distance {args.max_distance})")
+    print("=" * 72)
+    print(f"{'mode':<6} {'images':>7} {'inferences':>11} {'mean ms':>9} {'p95 ms':>9}")
+    for mode in ("off", "on"):
+        r = report[mode]
+        print(f"{mode:<6} {r['images']:>7} {r['inferences']:>11} {r['latency_ms']['mean']:>9.1f} "
+              f"{r['latency_ms']['p95']:>9.1f}")
+    print(f"\nInference work saved: {saved * 100:.1f}% (ideal {report['merge']['ideal_inferences']} inferences)")
+    print(f"Shots not merged: {missed}, merged across lesions: {wrong}")
+    print(f"Aggregated diagnosis changed in {changed}/{args.requests} requests "
+          f"(max confidence difference {max_conf_diff:.2f} points)")
+
+    server.should_exit = True
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
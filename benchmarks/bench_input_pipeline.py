@@ -0,0 +1,74 @@
+"""Images/sec of the ImageDataGenerator and tf.data input pipelines.
+
+Usage:
+    python -m benchmarks.bench_input_pipeline --dataset data/dataset --epochs 2
+    python -m benchmarks.bench_input_pipeline --synthetic 200   # no dataset needed
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import make_image_bytes
+from src.data_preprocessing import create_data_generators, iterate_batches
+from src.config import DATASET_PATH
+
+
+def make_synthetic_dataset(root, per_class, classes=6, width=800, height=600):
+    """Write a train/valid/test tree of synthetic JPEGs shaped like data/dataset."""
+    root = Path(root)
+    for split, count in (("train", per_class), ("valid", max(1, per_class // 5)), ("test", max(1, per_class // 5))):
+        for c in range(classes):
+            class_dir = root / split / f"class_{c}"
+            class_dir.mkdir(parents=True, exist_ok=True)
+            for i in range(count):
+                (class_dir / f"img_{i}.jpg").write_bytes(make_image_bytes(width, height, seed=c * 10000 + i))
+    return root
+
+
+def images_per_sec(split, epochs):
+    """Return images/sec for each epoch over one split."""
+    rates = []
+    for _ in range(epochs):
+        start, seen = time.perf_counter(), 0
+        for batch_x, _ in iterate_batches(split):
+            seen += len(batch_x)
+        rates.append(seen / (time.perf_counter() - start))
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default=str(DATASET_PATH))
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N train images per class instead")
+    parser.add_argument("--epochs", type=int, default=2, help="Epochs per split (later epochs show caching)")
+    args = parser.parse_args()
+
+    tmp = None
+    dataset_path = Path(args.dataset)
+    if args.synthetic:
+        tmp = tempfile.TemporaryDirectory()
+        dataset_path = make_synthetic_dataset(tmp.name, args.synthetic)
+
+    results = {}
+    for backend in ("generator", "tfdata"):
+        train, val, _ = create_data_generators(dataset_path, backend=backend)
+        results[backend] = {"train": images_per_sec(train, args.epochs), "valid": images_per_sec(val, args.epochs)}
+
+    print("=" * 60)
+    print("🚚 INPUT PIPELINE THROUGHPUT (images/sec)")
+    print("=" * 60)
+    print(f"{'backend':<10} {'split':<6} " + " ".join(f"{'epoch ' + str(e + 1):>10}" for e in range(args.epochs)))
+    for backend, splits in results.items():
+        for split, rates in splits.items():
+            print(f"{backend:<10} {split:<6} " + " ".join(f"{r:>10.1f}" for r in rates))
+    for split in ("train", "valid"):
+        speedup = results["tfdata"][split][-1] / results["generator"][split][-1]
+        print(f"tf.data speedup on {split} (last epoch): {speedup:.2f}x")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Throughput and total memory: one model per worker vs a shared inference process.
+
+Each simulated HTTP worker is a separate process that repeatedly submits a
+preprocessed uint8 batch, so the comparison isolates model serving from
+decoding. In "per-worker" mode every process loads its own copy of the model,
+as with `uvicorn --workers N` today. In "shared" mode one api.inference_server
+process owns the model and the workers use the remote backend over shared
+memory. Memory is the sum of PSS over all processes, so pages shared between
+processes are counted once.
+
+Usage:
+    python -m benchmarks.bench_multiprocess --workers 1 2 4 --duration 10
+    python -m benchmarks.bench_multiprocess --model models/pawscan_final.h5 --output results/multiprocess.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import signal
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import pss_mb
+
+
+def _serve(model_path, socket_path, backend):
+    from api.backends import import_runtime, load_backend
+    from api.inference_server import InferenceServer
+    import_runtime(backend)
+    server = InferenceServer(load_backend(backend, model_path), socket_path, slots=64)
+    # terminate() sends SIGTERM; close() unlinks the shared-memory segment
+    signal.signal(signal.SIGTERM, lambda *_: server.close())
+    server.serve_forever()
+
+
+def _worker(mode, model_path, socket_path, backend, images_per_request, ready, start, results, release):
+    from api.backends import import_runtime, load_backend
+    if mode == "shared":
+        model = load_backend("remote", model_path, socket_path=socket_path, connections=1)
+    else:
+        import_runtime(backend)
+        model = load_backend(backend, model_path)
+    x = np.random.default_rng(os.getpid()).integers(0, 256, (images_per_request, 224, 224, 3), dtype=np.uint8)
+    model.predict(x)  # warmup
+    ready.put(os.getpid())
+    deadline = start.get()
+    images, calls = 0, 0
+    while time.time() < deadline:
+        model.predict(x)
+        images += len(x)
+        calls += 1
+    results.put((images, calls))
+    # Stay alive until the parent has taken its last memory sample
+    release.get()
+
+
+def _wait_for_socket(path, process, timeout=300):
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if not process.is_alive() or time.time() > deadline:
+            raise RuntimeError("Inference server did not start")
+        time.sleep(0.1)
+
+
+def run(mode, workers, model_path, backend, images_per_request, duration):
+    ctx = mp.get_context("spawn")
+    socket_path = os.path.join(tempfile.mkdtemp(), "infer.sock")
+    processes = []
+    if mode == "shared":
+        server = ctx.Process(target=_serve, args=(model_path, socket_path, backend), daemon=True)
+        server.start()
+        processes.append(server)
+        _wait_for_socket(socket_path, server)
+
+    ready, start, results, release = ctx.Queue(), ctx.Queue(), ctx.Queue(), ctx.Queue()
+    for _ in range(workers):
+        p = ctx.Process(target=_worker, args=(mode, model_path, socket_path, backend, images_per_request,
+                                              ready, start, results, release), daemon=True)
+        p.start()
+        processes.append(p)
+    for _ in range(workers):
+        ready.get(timeout=600)
+
+    deadline = time.time() + duration
+    for _ in range(workers):
+        start.put(deadline)
+    peak_mb = 0.0
+    while time.time() < deadline:
+        time.sleep(min(0.5, max(0.0, deadline - time.time())))
+        peak_mb = max(peak_mb, sum(pss_mb(p.pid) or 0.0 for p in processes))
+    counts = [results.get(timeout=600) for _ in range(workers)]
+    for _ in range(workers):
+        release.put(None)
+    for p in processes:
+        p.terminate()
+        p.join()
+
+    images = sum(c[0] for c in counts)
+    return {
+        "mode": mode,
+        "workers": workers,
+        "images_per_sec": images / duration,
+        "requests_per_sec": sum(c[1] for c in counts) / duration,
+        "total_pss_mb": peak_mb,
+        "pss_per_worker_mb": peak_mb / workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--images", type=int, default=4, help="Images per simulated request")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per run")
+    parser.add_argument("--backend", default="keras", choices=["keras", "tflite"])
+    parser.add_argument("--model", default=None, help="Model to serve (default: a random MobileNetV2)")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    model_path = args.model
+    if model_path is None:
+        from benchmarks.bench_api_load import build_random_model
+        model_path = build_random_model(os.path.join(tmp.name, "random_mobilenet.h5"))
+
+    rows = []
+    for workers in args.workers:
+        for mode in ("per-worker", "shared"):
+            rows.append(run(mode, workers, model_path, args.backend, args.images, args.duration))
+
+    print("=" * 72)
+    print("🏭 ONE MODEL PER WORKER vs SHARED INFERENCE PROCESS")
+    print("=" * 72)
+    print(f"{'workers':>8} {'mode':<11} {'img/s':>9} {'req/s':>9} {'total MB':>10} {'MB/worker':>10}")
+    for r in rows:
+        print(f"{r['workers']:>8} {r['mode']:<11} {r['images_per_sec']:>9.1f} {r['requests_per_sec']:>9.1f} "
+              f"{r['total_pss_mb']:>10.0f} {r['pss_per_worker_mb']:>10.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n💾 Results saved to: {args.output}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
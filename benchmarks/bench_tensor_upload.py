@@ -0,0 +1,155 @@
+"""Bytes on the wire and server CPU per scan: /analyze_files multipart vs /analyze_tensors.
+
+Each scan is --images phone-sized JPEGs, sent three ways to the API running
+in-process, with the prediction cache disabled:
+- multipart: the full-resolution JPEGs to /analyze_files (decoded and resized on the server)
+- raw: the client resizes to the model input size and sends uint8 pixels to /analyze_tensors
+- jpeg: the same client-side thumbnails, re-encoded as JPEG at --quality
+
+The client downscales like the server's decode path (api.utils.decode_image_bytes).
+Server CPU is the process CPU time minus the CPU time of the benchmark's own
+(client) thread, so it covers the event loop, decode pool and inference threads.
+The report also shows the decode histogram from /metrics, latency, client-side
+preparation time, and the drift of each mode's predictions against multipart.
+
+Usage:
+    python -m benchmarks.bench_tensor_upload
+    python -m benchmarks.bench_tensor_upload --model models/pawscan_final.h5 --scans 30 --images 3 --quality 90
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import requests
+
+from api.tensors import CONTENT_TYPE, encode_payload
+from api.utils import decode_image_bytes
+from benchmarks.bench_api_load import build_random_model, start_server
+from benchmarks.common import PHONE_SIZES, make_image_bytes, percentiles
+
+MODES = ("multipart", "raw", "jpeg")
+
+
+def make_scans(num_scans, images_per_scan):
+    """Per scan: full-resolution JPEG uploads cycling through PHONE_SIZES."""
+    scans = []
+    for s in range(num_scans):
+        scans.append([make_image_bytes(*PHONE_SIZES[(s + i) % len(PHONE_SIZES)], seed=s * images_per_scan + i)
+                      for i in range(images_per_scan)])
+    return scans
+
+
+def prepare(base_url, scan, mode, size, quality):
+    """Build the request for one scan; tensor modes do the downscale on the client."""
+    if mode == "multipart":
+        files = [("files", (f"scan_{i}.jpg", data, "image/jpeg")) for i, data in enumerate(scan)]
+        return requests.Request("POST", f"{base_url}/analyze_files", files=files).prepare()
+    arrays = [decode_image_bytes(data, target_size=(size, size), max_pixels=None)[0] for data in scan]
+    body = encode_payload(arrays, quality=quality if mode == "jpeg" else None)
+    return requests.Request("POST", f"{base_url}/analyze_tensors", data=body,
+                            headers={"Content-Type": CONTENT_TYPE}).prepare()
+
+
+def decode_metrics(base_url):
+    """(count, sum) of pawscan_image_decode_seconds."""
+    values = {}
+    for line in requests.get(f"{base_url}/metrics", timeout=10).text.splitlines():
+        if line.startswith(("pawscan_image_decode_seconds_count", "pawscan_image_decode_seconds_sum")):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    return values.get("pawscan_image_decode_seconds_count", 0.0), values.get("pawscan_image_decode_seconds_sum", 0.0)
+
+
+def run_mode(base_url, scans, mode, size, quality):
+    session = requests.Session()
+    client_start = time.thread_time()
+    prepared = [prepare(base_url, scan, mode, size, quality) for scan in scans]
+    client_cpu = time.thread_time() - client_start
+
+    decode_count, decode_sum = decode_metrics(base_url)
+    results, latencies = [], []
+    process_start, thread_start = time.process_time(), time.thread_time()
+    for request in prepared:
+        start = time.perf_counter()
+        response = session.send(request, timeout=120)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        results.append(response.json())
+    server_cpu = (time.process_time() - process_start) - (time.thread_time() - thread_start)
+    decode_count2, decode_sum2 = decode_metrics(base_url)
+
+    images = sum(len(scan) for scan in scans)
+    stats = {
+        "wire_bytes_per_scan": float(np.mean([len(r.body) for r in prepared])),
+        "server_cpu_ms_per_scan": server_cpu * 1000 / len(scans),
+        "decode_ms_per_image": (decode_sum2 - decode_sum) * 1000 / max(decode_count2 - decode_count, 1),
+        "client_prep_ms_per_scan": client_cpu * 1000 / len(scans),
+        "latency_ms": dict(percentiles(latencies), mean=float(np.mean(latencies))),
+        "images": images,
+    }
+    return stats, results
+
+
+def drift(reference, results):
+    """Images whose top class differs, and the largest probability difference, against `reference`."""
+    flipped, max_diff = 0, 0.0
+    for ref, res in zip(reference, results):
+        for a, b in zip(ref["per_image_predictions"], res["per_image_predictions"]):
+            flipped += a["disease"] != b["disease"]
+            max_diff = max(max_diff, float(np.max(np.abs(np.subtract(a["all"], b["all"])))))
+    return {"top_class_changed": flipped, "max_prob_diff": max_diff}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=None, help="Model to serve (default: randomly initialised MobileNetV2)")
+    parser.add_argument("--scans", type=int, default=20)
+    parser.add_argument("--images", type=int, default=3, help="Images per scan")
+    parser.add_argument("--size", type=int, default=224, help="Model input size the client resizes to")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG quality of the thumbnails in 'jpeg' mode")
+    parser.add_argument("--output", default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    model_path = args.model or build_random_model(os.path.join(tmp.name, "random_model.h5"))
+    server, base_url = start_server(model_path)
+
+    scans = make_scans(args.scans, args.images)
+    report, responses = {}, {}
+    for mode in MODES:
+        run_mode(base_url, scans[:2], mode, args.size, args.quality)  # warmup
+        report[mode], responses[mode] = run_mode(base_url, scans, mode, args.size, args.quality)
+    for mode in MODES[1:]:
+        report[mode]["drift"] = drift(responses["multipart"], responses[mode])
+
+    print("=" * 96)
+    print(f"📦 TENSOR UPLOADS ({args.scans} scans x {args.images} images, {args.size}px, thumbnail quality {args.quality})")
+    print("=" * 96)
+    print(f"{'mode':<10} {'KB/scan':>9} {'server CPU ms':>14} {'decode ms/img':>14} {'client ms':>10} "
+          f"{'mean ms':>9} {'p95 ms':>9} {'flipped':>8} {'max diff':>9}")
+    for mode in MODES:
+        r = report[mode]
+        d = r.get("drift", {"top_class_changed": 0, "max_prob_diff": 0.0})
+        print(f"{mode:<10} {r['wire_bytes_per_scan'] / 1024:>9.1f} {r['server_cpu_ms_per_scan']:>14.1f} "
+              f"{r['decode_ms_per_image']:>14.2f} {r['client_prep_ms_per_scan']:>10.1f} "
+              f"{r['latency_ms']['mean']:>9.1f} {r['latency_ms']['p95']:>9.1f} "
+              f"{d['top_class_changed']:>8} {d['max_prob_diff']:>9.4f}")
+    base = report["multipart"]
+    print()
+    for mode in MODES[1:]:
+        r = report[mode]
+        print(f"{mode}: {base['wire_bytes_per_scan'] / r['wire_bytes_per_scan']:.1f}x fewer bytes, "
+              f"{(1 - r['server_cpu_ms_per_scan'] / base['server_cpu_ms_per_scan']) * 100:.0f}% less server CPU per scan")
+
+    server.should_exit = True
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Accuracy, calibration and latency effect of test-time augmentation on the test split.
+
+Images go through the API's decode path and are scored three ways: without
+TTA, with TTA only inside the uncertainty band (as TTA_ENABLED=1 serves), and
+with TTA on every image. Calibration is reported as expected calibration error
+(ECE, 15 bins), negative log-likelihood and Brier score. Latency is the
+per-image time for decode + views + inference with one image per call.
+
+Usage:
+    python -m benchmarks.bench_tta --band 0.5 0.9
+    python -m benchmarks.bench_tta --model models/pawscan_a050_160.h5 --output results/tta.json
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from api.backends import load_backend
+from api.utils import decode_image_bytes, tta_views, tta_candidates, average_tta
+from benchmarks.common import percentiles
+from src.data_preprocessing import find_class_indices, list_image_files
+from src.config import MODEL_SAVE_PATH, DATASET_PATH
+
+
+def expected_calibration_error(probs, labels, bins=15):
+    confidence = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == labels
+    edges = np.linspace(0, 1, bins + 1)
+    ece = 0.0
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > low) & (confidence <= high)
+        if in_bin.any():
+            ece += in_bin.mean() * abs(correct[in_bin].mean() - confidence[in_bin].mean())
+    return float(ece)
+
+
+def score(probs, labels):
+    one_hot = np.eye(probs.shape[1])[labels]
+    return {
+        "accuracy": float(np.mean(probs.argmax(axis=1) == labels)),
+        "ece": expected_calibration_error(probs, labels),
+        "nll": float(-np.mean(np.log(np.clip(probs[np.arange(len(labels)), labels], 1e-7, 1.0)))),
+        "brier": float(np.mean(np.sum((probs - one_hot) ** 2, axis=1))),
+    }
+
+
+def classify(model, x, band):
+    """Score a decoded batch; band=None applies TTA to every image."""
+    preds = np.array(model.predict(x), dtype=np.float32)
+    candidates = list(range(len(x))) if band is None else tta_candidates(preds, *band)
+    if candidates:
+        views = np.concatenate([tta_views(x[i:i + 1]) for i in candidates])
+        average_tta(preds, candidates, model.predict(views))
+    return preds, len(candidates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.path.join(MODEL_SAVE_PATH, "pawscan_final.h5"))
+    parser.add_argument("--dataset", default=str(DATASET_PATH / "test"))
+    parser.add_argument("--band", type=float, nargs=2, default=[0.5, 0.9], metavar=("LOW", "HIGH"))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency-images", type=int, default=100, help="Images timed one per call")
+    parser.add_argument("--output", default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+
+    model = load_backend("tflite" if args.model.endswith(".tflite") else "keras", args.model)
+    size = model.input_size
+    filepaths, labels, _ = list_image_files(args.dataset, find_class_indices(args.dataset))
+    images = np.concatenate([decode_image_bytes(open(p, "rb").read(), target_size=(size, size)) for p in filepaths])
+
+    modes = {"off": "off", "band": tuple(args.band), "always": None}
+    report = {}
+    for mode, band in modes.items():
+        probs, triggered = [], 0
+        for start in range(0, len(images), args.batch_size):
+            if band == "off":
+                probs.append(np.asarray(model.predict(images[start:start + args.batch_size])))
+                continue
+            batch_probs, n = classify(model, images[start:start + args.batch_size], band)
+            probs.append(batch_probs)
+            triggered += n
+        report[mode] = dict(score(np.concatenate(probs), labels), tta_fraction=triggered / len(images))
+
+        latencies = []
+        for path in filepaths[:args.latency_images]:
+            data = open(path, "rb").read()
+            start = time.perf_counter()
+            x = decode_image_bytes(data, target_size=(size, size))
+            if band == "off":
+                model.predict(x)
+            else:
+                classify(model, x, band)
+            latencies.append((time.perf_counter() - start) * 1000)
+        report[mode]["latency_ms"] = percentiles(latencies)
+        report[mode]["latency_ms"]["mean"] = float(np.mean(latencies))
+
+    base_mean = report["off"]["latency_ms"]["mean"]
+    for entry in report.values():
+        entry["latency_overhead"] = entry["latency_ms"]["mean"] / base_mean - 1
+
+    print("=" * 84)
+    print(f"🔁 TEST-TIME AUGMENTATION ({len(images)} test images, band {args.band[0]:g}-{args.band[1]:g})")
+    print("=" * 84)
+    print(f"{'mode':<8} {'acc':>6} {'ECE':>6} {'NLL':>6} {'Brier':>6} {'TTA %':>6} "
+          f"{'mean ms':>8} {'p95 ms':>8} {'overhead':>9}")
+    for mode, r in report.items():
+        print(f"{mode:<8} {r['accuracy']:>6.3f} {r['ece']:>6.3f} {r['nll']:>6.3f} {r['brier']:>6.3f} "
+              f"{r['tta_fraction'] * 100:>6.1f} {r['latency_ms']['mean']:>8.2f} {r['latency_ms']['p95']:>8.2f} "
+              f"{r['latency_overhead'] * 100:>+8.1f}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
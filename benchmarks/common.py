@@ -0,0 +1,41 @@
+import io
+import time
+import numpy as np
+from PIL import Image
+
+from src.memory import current_rss_mb, peak_rss_mb, pss_mb  # noqa: F401  (re-exported for the benchmarks)
+
+# Typical phone camera resolutions (width, height)
+PHONE_SIZES = [(4032, 3024), (3264, 2448), (1920, 1080)]
+
+
+def make_image_bytes(width=1024, height=768, fmt="JPEG", seed=0, quality=90):
+    """Encode a synthetic photo-like image (smooth gradient + noise) in memory."""
+    rng = np.random.default_rng(seed)
+    gx = np.linspace(0, 255, width, dtype="float32")[None, :, None]
+    gy = np.linspace(0, 255, height, dtype="float32")[:, None, None]
+    tint = rng.uniform(0.3, 1.0, size=(1, 1, 3)).astype("float32")
+    arr = (gx * 0.5 + gy * 0.5) * tint + rng.normal(0, 12, size=(height, width, 3))
+    img = Image.fromarray(np.clip(arr, 0, 255).astype("uint8"), "RGB")
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img.save(buf, format=fmt, quality=quality)
+    else:
+        img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def time_call(fn, repeats=5, warmup=1):
+    """Return per-call wall times (seconds) for `repeats` runs of fn()."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def percentiles(values, qs=(50, 95, 99)):
+    return {f"p{q}": float(np.percentile(values, q)) for q in qs}
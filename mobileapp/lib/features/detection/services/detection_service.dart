@@ -48,6 +48,12 @@ class DetectionService {
 
       print('📥 Response status: ${response.statusCode}');
 
+      // Present when the API runs with SERVER_TIMING=1
+      final serverTiming = response.headers['server-timing'];
+      if (serverTiming != null) {
+        print('⏱️ Server timing: $serverTiming');
+      }
+
       if (response.statusCode == 200) {
         final jsonData = json.decode(response.body);
         print('✅ Analysis successful: ${jsonData['disease']}');
@@ -0,0 +1,250 @@
+"""Resumable training runs: periodic checkpoints of model, optimizer, epoch and callback state.
+
+A run lives in runs/<name>/. run.json is both the resume state and the run
+manifest. It holds the effective config, the per-epoch metrics, learning rate
+and wall time of each phase, and every attempt (fresh start or resume).
+checkpoint-<phase>-<epoch>.keras holds the model with its compiled optimizer,
+so the current learning rate and Adam moments come back with it. EarlyStopping
+and ReduceLROnPlateau progress (wait counters, best value, best weights) is
+stored next to it. run.json is written last, through a temporary file and
+os.replace, so a run killed at any point resumes from the last complete checkpoint.
+"""
+import datetime
+import json
+import os
+import signal
+import time
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+RUN_VERSION = 1
+# Exit status of a run stopped by SIGTERM (128 + 15), e.g. a reclaimed spot instance
+EXIT_PREEMPTED = 143
+# Attributes that carry EarlyStopping / ReduceLROnPlateau progress across restarts
+CALLBACK_STATE = ("wait", "best", "best_epoch", "cooldown_counter", "stopped_epoch")
+
+
+class TrainingPreempted(Exception):
+    """Raised inside fit() after SIGTERM; the run resumes from its last checkpoint."""
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def _scalar(value):
+    return value.item() if isinstance(value, np.generic) else str(value)
+
+
+def _write_json(path, data):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, default=_scalar)
+    os.replace(tmp_path, path)
+
+
+def current_lr(model):
+    return float(np.asarray(model.optimizer.learning_rate))
+
+
+class TrainingRun:
+    """State and manifest of one training run directory."""
+
+    def __init__(self, run_dir, manifest):
+        self.dir = Path(run_dir)
+        self.manifest = manifest
+        self.preempted = False
+        self._attempt_start = None
+
+    @classmethod
+    def create(cls, run_dir, config, overrides, phase2_policy):
+        run_dir = Path(run_dir)
+        if (run_dir / "run.json").exists():
+            raise FileExistsError(f"{run_dir} already holds a run; pass --resume to continue it")
+        run_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "version": RUN_VERSION,
+            "name": run_dir.name,
+            "created": _now(),
+            "status": "running",
+            "config": config,
+            "overrides": overrides,
+            "phase2_policy": phase2_policy,
+            "state": {"phase": "phase1", "epoch": 0, "checkpoint": None, "stopped": False,
+                      "phase2": None, "callbacks": {}},
+            "phases": {},
+            "attempts": [],
+            "final": None,
+        }
+        run = cls(run_dir, manifest)
+        run.save()
+        return run
+
+    @classmethod
+    def open(cls, run_dir):
+        with open(Path(run_dir) / "run.json") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != RUN_VERSION:
+            raise ValueError(f"{run_dir}/run.json has unsupported version {manifest.get('version')}")
+        return cls(run_dir, manifest)
+
+    @staticmethod
+    def latest(runs_dir):
+        """Most recently created run under `runs_dir` that has not finished, or None."""
+        candidates = []
+        for path in Path(runs_dir).glob("*/run.json"):
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get("status") != "done":
+                candidates.append((manifest["created"], path.parent))
+        return max(candidates)[1] if candidates else None
+
+    @property
+    def state(self):
+        return self.manifest["state"]
+
+    def save(self):
+        _write_json(self.dir / "run.json", self.manifest)
+
+    def phase(self, name):
+        return self.manifest["phases"].setdefault(name, {"started": _now(), "finished": None,
+                                                         "seconds": 0.0, "epochs": []})
+
+    def history(self, name):
+        """Keras-style {metric: [per epoch]} of a phase, across every attempt."""
+        history = {}
+        for entry in self.manifest["phases"].get(name, {}).get("epochs", []):
+            for key, value in entry.items():
+                if key not in ("epoch", "seconds"):
+                    history.setdefault(key, []).append(value)
+        return history
+
+    def best(self, name, metric="val_accuracy"):
+        values = self.history(name).get(metric)
+        return max(values) if values else None
+
+    def start_attempt(self):
+        self._attempt_start = time.perf_counter()
+        self.manifest["attempts"].append({"started": _now(), "phase": self.state["phase"],
+                                          "epoch": self.state["epoch"], "setup_seconds": None,
+                                          "ended": None, "outcome": "running"})
+        self.manifest["status"] = "running"
+        self.save()
+
+    def setup_done(self):
+        attempt = self.manifest["attempts"][-1]
+        attempt["setup_seconds"] = round(time.perf_counter() - self._attempt_start, 3)
+
+    def end_attempt(self, outcome):
+        attempt = self.manifest["attempts"][-1]
+        attempt.update(ended=_now(), outcome=outcome,
+                       seconds=round(time.perf_counter() - self._attempt_start, 3))
+        self.manifest["status"] = outcome
+        self.save()
+
+    def install_signal_handler(self):
+        """Turn SIGTERM into TrainingPreempted at the next batch boundary."""
+        def handler(signum, frame):
+            print("\n⚠️  SIGTERM received: stopping at the next batch, resuming later from the last checkpoint")
+            self.preempted = True
+        signal.signal(signal.SIGTERM, handler)
+
+    def checkpoint(self, model, phase, epoch, callbacks=(), stopped=False):
+        """Save model + optimizer and callback state, then commit them in run.json."""
+        path = self.dir / f"checkpoint-{phase}-{epoch:03d}.keras"
+        tmp_path = self.dir / f"checkpoint-{phase}-{epoch:03d}.tmp.keras"
+        model.save(tmp_path)
+        os.replace(tmp_path, path)
+
+        states = []
+        for i, callback in enumerate(callbacks):
+            cb_state = {attr: getattr(callback, attr) for attr in CALLBACK_STATE if hasattr(callback, attr)}
+            best_weights = getattr(callback, "best_weights", None)
+            if best_weights is not None:
+                weights_path = self.dir / f"{phase}-{epoch:03d}-callback{i}-best-weights.npz"
+                with open(weights_path.with_suffix(".tmp"), "wb") as f:
+                    np.savez(f, *best_weights)
+                os.replace(weights_path.with_suffix(".tmp"), weights_path)
+                cb_state["best_weights"] = weights_path.name
+            states.append(cb_state)
+
+        previous = self._files()
+        self.state.update(phase=phase, epoch=epoch, checkpoint=path.name, stopped=stopped)
+        self.state["callbacks"] = {phase: states}
+        self.save()
+        for name in previous - self._files():
+            (self.dir / name).unlink(missing_ok=True)
+        print(f"💾 Checkpoint: {phase} epoch {epoch} -> {path}")
+
+    def _files(self):
+        """Checkpoint files referenced by the committed state."""
+        files = {self.state["checkpoint"]} if self.state["checkpoint"] else set()
+        for states in self.state["callbacks"].values():
+            files.update(cb_state["best_weights"] for cb_state in states if "best_weights" in cb_state)
+        return files
+
+    def load_model(self):
+        path = self.dir / self.state["checkpoint"]
+        model = tf.keras.models.load_model(path)
+        print(f"♻️  Resumed {self.state['phase']} at epoch {self.state['epoch']} from {path}")
+        return model
+
+    def restore_callbacks(self, phase, callbacks):
+        for callback, cb_state in zip(callbacks, self.state["callbacks"].get(phase, [])):
+            for attr, value in cb_state.items():
+                if attr == "best_weights":
+                    with np.load(self.dir / value) as data:
+                        callback.best_weights = [data[f"arr_{i}"] for i in range(len(data.files))]
+                else:
+                    setattr(callback, attr, value)
+
+
+class RunCheckpoint(tf.keras.callbacks.Callback):
+    """Record each epoch in the run manifest and checkpoint every `every` epochs.
+
+    List it after the callbacks in `stateful`: their on_train_begin resets the
+    state this callback restores when a phase is resumed, and EarlyStopping's
+    on_train_end restores the best weights before the end-of-phase checkpoint.
+    """
+
+    def __init__(self, run, phase, every=1, stateful=()):
+        super().__init__()
+        self.run = run
+        self.phase = phase
+        self.every = max(1, int(every))
+        self.stateful = list(stateful)
+        self._pending = []
+
+    def on_train_begin(self, logs=None):
+        if self.run.state["phase"] == self.phase:
+            self.run.restore_callbacks(self.phase, self.stateful)
+        self.run.phase(self.phase)
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self.run.preempted:
+            raise TrainingPreempted(f"{self.phase} stopped by SIGTERM; resume from epoch {self.run.state['epoch']}")
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self._epoch_start
+        entry = {"epoch": epoch + 1, "seconds": round(seconds, 3), "learning_rate": current_lr(self.model)}
+        entry.update({k: float(v) for k, v in (logs or {}).items() if k != "learning_rate"})
+        self._pending.append(entry)
+        # An early stop is checkpointed in on_train_end, once restore_best_weights has run
+        if len(self._pending) >= self.every and not self.model.stop_training:
+            self.flush(epoch + 1)
+
+    def on_train_end(self, logs=None):
+        if self._pending:
+            self.flush(self._pending[-1]["epoch"], stopped=bool(self.model.stop_training))
+
+    def flush(self, epoch, stopped=False):
+        """Commit the epochs finished since the last checkpoint together with a new checkpoint."""
+        phase = self.run.phase(self.phase)
+        phase["epochs"].extend(self._pending)
+        phase["seconds"] = round(phase["seconds"] + sum(e["seconds"] for e in self._pending), 3)
+        self._pending = []
+        self.run.checkpoint(self.model, self.phase, epoch, self.stateful, stopped)
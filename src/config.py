@@ -17,11 +17,58 @@ BATCH_SIZE = 16
 NUM_CLASSES = 6  
 SEED = 42
 
+# Input pipeline backend for create_data_generators: "generator" (ImageDataGenerator), "tfdata" or "shards"
+DATA_BACKEND = "generator"
+
+# Validated dataset manifest written by `python -m src.dataset_index` (also built on first use);
+# list_image_files and the generator backend read it instead of walking the tree
+USE_DATASET_MANIFEST = True
+MANIFEST_DIR = PROJECT_ROOT / "cache" / "manifests"
+PHASH_MAX_DISTANCE = 4  # dHash Hamming distance at or below which two images count as near-duplicates
+
+# Packed uint8 dataset shards written by `python -m src.dataset_shards`
+SHARDS_PATH = PROJECT_ROOT / "data" / "shards"
+SHARD_SIZE = 1024  # records per shard file
+
+# Phase 1 feature cache: train the head on pooled backbone features computed once per image
+PHASE1_FEATURE_CACHE = False
+FEATURE_CACHE_VIEWS = 1  # 1 = original image only; K > 1 adds K-1 augmented views per image
+FEATURE_CACHE_DIR = PROJECT_ROOT / "cache" / "features"
+
+# Distilled student variants trained by `python -m src.distill`: (width multiplier, input resolution)
+STUDENT_VARIANTS = [(0.35, 128), (0.5, 160), (0.75, 192)]
+DISTILL_TEMPERATURE = 4.0
+DISTILL_SOFT_WEIGHT = 0.7  # weight of the teacher's softened outputs vs the hard labels
+VARIANTS_MANIFEST = MODEL_SAVE_PATH / "variants.json"  # Pareto table read by the API's latency budget
+
+# Training profiler (src/profiling.py): per-step timings and per-epoch summaries next to the
+# TensorBoard logs, plus a TF profiler trace of these global steps in each phase (None disables it).
+# Off by default so a normal run pays no profiling cost; enable with --set PROFILE_TRAINING=True
+PROFILE_TRAINING = False
+PROFILE_TRACE_STEPS = (10, 15)
+
+# Classification head: hidden Dense widths and its three dropout rates (tuned by `python -m src.sweep`)
+HEAD_UNITS = (128, 64)
+HEAD_DROPOUTS = (0.2, 0.15, 0.1)
+
 # Training Hyperparameters
 INITIAL_LR = 0.001
 PATIENCE_EARLY_STOP = 12
 PATIENCE_REDUCE_LR = 4
+REDUCE_LR_FACTOR = 0.4  # Phase 1 ReduceLROnPlateau factor
 MIN_LR = 1e-7
+EPOCHS_PHASE1 = 20
+EPOCHS_PHASE2 = 20
+
+# Phase 2 fine-tuning: top fraction of backbone layers unfrozen, and its learning rate
+FINE_TUNE_FRACTION = 0.05
+FINE_TUNE_LR = 1e-6
+# `--phase2 auto` skips fine-tuning when Phase 1 already reached this validation accuracy
+PHASE2_SKIP_ABOVE = 0.98
+
+# Resumable runs of `python -m src.train_model`: run manifest and checkpoints per run
+TRAINING_RUNS_DIR = PROJECT_ROOT / "runs"
+CHECKPOINT_EVERY = 1  # epochs between checkpoints
 
 print(f"✅ Config loaded successfully from: {__file__}")
 print(f"  PROJECT_ROOT: {PROJECT_ROOT}")
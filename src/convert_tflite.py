@@ -0,0 +1,88 @@
+"""Convert the trained Keras model into float16 and full-INT8 TFLite models.
+
+Usage:
+    python -m src.convert_tflite --model models/pawscan_final.h5 --calibration-samples 200
+"""
+import argparse
+import os
+import numpy as np
+import tensorflow as tf
+
+from src.data_preprocessing import create_data_generators, iterate_batches
+from src.config import MODEL_SAVE_PATH, IMG_SIZE
+
+
+def _converter_for(model, img_size=IMG_SIZE):
+    # Convert through a concrete function with a dynamic batch dimension so the
+    # interpreter can be resized to whatever batch the API sends.
+    @tf.function(input_signature=[tf.TensorSpec([None, img_size, img_size, 3], tf.float32)])
+    def serve(x):
+        return model(x, training=False)
+
+    return tf.lite.TFLiteConverter.from_concrete_functions([serve.get_concrete_function()], model)
+
+
+def representative_dataset(num_samples=200):
+    """Yield single rescaled validation images for INT8 calibration.
+
+    The validation split is not augmented, so the quantisation ranges are fitted
+    to the inputs the model sees when serving. It is ordered by class, so the
+    samples are spread evenly across the whole split rather than taken from the front.
+    """
+    _, val_gen, _ = create_data_generators()
+    stride = max(1, val_gen.samples // num_samples)
+    index, seen = 0, 0
+    for batch_x, _ in iterate_batches(val_gen):
+        for img in batch_x:
+            if index % stride == 0:
+                yield [img[np.newaxis].astype(np.float32)]
+                seen += 1
+                if seen >= num_samples:
+                    return
+            index += 1
+
+
+def convert_float16(model):
+    converter = _converter_for(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+def convert_int8(model, num_samples=200):
+    converter = _converter_for(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: representative_dataset(num_samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    # Inputs are [0, 1] floats, so a uint8 input tensor maps one-to-one onto raw pixel values
+    converter.inference_input_type = tf.uint8
+    converter.inference_output_type = tf.uint8
+    return converter.convert()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pawscan_final.h5 to TFLite")
+    parser.add_argument("--model", default=os.path.join(MODEL_SAVE_PATH, "pawscan_final.h5"))
+    parser.add_argument("--output-dir", default=str(MODEL_SAVE_PATH))
+    parser.add_argument("--calibration-samples", type=int, default=200)
+    parser.add_argument("--skip-int8", action="store_true", help="Only write the float16 model")
+    args = parser.parse_args()
+
+    model = tf.keras.models.load_model(args.model)
+    print(f"✅ Loaded model from: {args.model}")
+    stem = os.path.splitext(os.path.basename(args.model))[0]
+
+    outputs = {"fp16": lambda: convert_float16(model)}
+    if not args.skip_int8:
+        outputs["int8"] = lambda: convert_int8(model, args.calibration_samples)
+
+    for suffix, convert in outputs.items():
+        tflite_model = convert()
+        out_path = os.path.join(args.output_dir, f"{stem}_{suffix}.tflite")
+        with open(out_path, "wb") as f:
+            f.write(tflite_model)
+        print(f"💾 Saved {suffix} model: {out_path} ({len(tflite_model) / 1e6:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,27 @@
+import os
+import math
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
 from tensorflow.keras.preprocessing.image import ImageDataGenerator # type: ignore
 from collections import Counter
-from .config import DATASET_PATH, IMG_SIZE, BATCH_SIZE, SEED
+from .config import DATASET_PATH, IMG_SIZE, BATCH_SIZE, SEED, DATA_BACKEND, SHARDS_PATH, USE_DATASET_MANIFEST
+
+def create_data_generators(dataset_path=DATASET_PATH, img_size=IMG_SIZE, batch_size=BATCH_SIZE, backend=DATA_BACKEND):
+    if backend == "tfdata":
+        train_generator, val_generator, test_generator = create_tf_datasets(dataset_path, img_size, batch_size)
+        _print_split_summary(train_generator, val_generator, test_generator)
+        return train_generator, val_generator, test_generator
+    if backend == "shards":
+        # Packed uint8 shards from `python -m src.dataset_shards`; dataset_path is the shards directory
+        from .dataset_shards import create_shard_datasets
+        shards_path = SHARDS_PATH if dataset_path == DATASET_PATH else dataset_path
+        train_generator, val_generator, test_generator = create_shard_datasets(shards_path, batch_size, img_size)
+        _print_split_summary(train_generator, val_generator, test_generator)
+        return train_generator, val_generator, test_generator
+    if backend != "generator":
+        raise ValueError(f"Unknown data backend '{backend}', expected 'generator', 'tfdata' or 'shards'")
 
-def create_data_generators(dataset_path=DATASET_PATH, img_size=IMG_SIZE, batch_size=BATCH_SIZE):
     train_datagen = ImageDataGenerator(
         rescale=1./255,
         rotation_range=25,
@@ -19,6 +38,18 @@ def create_data_generators(dataset_path=DATASET_PATH, img_size=IMG_SIZE, batch_s
 
     val_test_datagen = ImageDataGenerator(rescale=1./255)
 
+    if USE_DATASET_MANIFEST:
+        # File lists come from the cached manifest: no directory walk, corrupt files skipped
+        class_indices = find_class_indices(dataset_path / "train")
+        train_generator = _flow_from_manifest(train_datagen, dataset_path / "train", class_indices, img_size,
+                                              batch_size, shuffle=True)
+        val_generator = _flow_from_manifest(val_test_datagen, dataset_path / "valid", class_indices, img_size,
+                                            batch_size, shuffle=False)
+        test_generator = _flow_from_manifest(val_test_datagen, dataset_path / "test", class_indices, img_size,
+                                             batch_size, shuffle=False)
+        _print_split_summary(train_generator, val_generator, test_generator)
+        return train_generator, val_generator, test_generator
+
     train_generator = train_datagen.flow_from_directory(
         dataset_path / "train",
         target_size=(img_size, img_size),
@@ -44,16 +75,218 @@ def create_data_generators(dataset_path=DATASET_PATH, img_size=IMG_SIZE, batch_s
         shuffle=False
     )
 
+    _print_split_summary(train_generator, val_generator, test_generator)
+    return train_generator, val_generator, test_generator
+
+
+def _flow_from_manifest(datagen, directory, class_indices, img_size, batch_size, shuffle):
+    """flow_from_dataframe over the manifest's file list, with flow_from_directory's order and class mapping."""
+    import pandas as pd
+    filepaths, labels, _ = list_image_files(directory, class_indices)
+    class_names = list(class_indices)
+    frame = pd.DataFrame({"filename": filepaths, "class": [class_names[label] for label in labels]})
+    return datagen.flow_from_dataframe(
+        frame,
+        x_col="filename",
+        y_col="class",
+        classes=class_names,
+        target_size=(img_size, img_size),
+        batch_size=batch_size,
+        class_mode='categorical',
+        shuffle=shuffle,
+        seed=SEED if shuffle else None,
+        validate_filenames=False  # the manifest already decoded every file
+    )
+
+
+def _print_split_summary(train_generator, val_generator, test_generator):
     print("\n✅ Data generators created successfully!")
     print(f"  Training samples: {train_generator.samples}")
     print(f"  Validation samples: {val_generator.samples}")
     print(f"  Test samples: {test_generator.samples}")
     print(f"  Class indices: {train_generator.class_indices}\n")
 
-    return train_generator, val_generator, test_generator
+
+# tf.data backend
+#
+# Same splits, ordering, class mapping and augmentation as the ImageDataGenerator
+# path, but file reading, decoding and augmentation run in-graph in parallel.
+# Returned datasets carry the DirectoryIterator attributes the rest of the code
+# relies on (samples, classes, class_indices, filenames, batch_size, reset()).
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# Mirrors the ImageDataGenerator arguments above
+AUGMENTATION = {
+    "rotation_range": 25,
+    "width_shift_range": 0.15,
+    "height_shift_range": 0.15,
+    "shear_range": 0.15,
+    "zoom_range": 0.15,
+    "horizontal_flip": True,
+    "brightness_range": (0.85, 1.15),
+    "channel_shift_range": 0.08,
+}
+
+
+def find_class_indices(directory):
+    """Class name -> index mapping, sorted by sub-directory name like flow_from_directory."""
+    classes = sorted(d.name for d in Path(directory).iterdir() if d.is_dir())
+    return {name: idx for idx, name in enumerate(classes)}
+
+
+def list_image_files(directory, class_indices=None):
+    """Return (filepaths, labels, class_indices) in flow_from_directory order.
+
+    A train/valid/test split is read from the cached dataset manifest (see
+    src/dataset_index.py), which skips undecodable files; other directories are walked.
+    """
+    directory = Path(directory)
+    if class_indices is None:
+        class_indices = find_class_indices(directory)
+    if USE_DATASET_MANIFEST and directory.name in ("train", "valid", "test"):
+        from .dataset_index import load_manifest, split_files
+        filepaths, labels = split_files(load_manifest(directory.parent), directory.name, class_indices)
+        return filepaths, labels, class_indices
+
+    filepaths, labels = [], []
+    for class_name, class_idx in class_indices.items():
+        for root, _, files in sorted(os.walk(directory / class_name)):
+            for fname in sorted(files):
+                if fname.lower().endswith(IMAGE_EXTENSIONS):
+                    filepaths.append(os.path.join(root, fname))
+                    labels.append(class_idx)
+    return filepaths, np.array(labels, dtype="int32"), class_indices
+
+
+def _decode_and_resize(path, img_size):
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image.set_shape([None, None, 3])
+    # flow_from_directory loads with nearest-neighbour interpolation; keep uint8 until batching
+    return tf.image.resize(image, (img_size, img_size), method="nearest")
+
+
+def _random_affine(batch_size, img_size, aug):
+    """Per-image projective transforms (output -> input coords) matching apply_affine_transform."""
+    def uniform(limit):
+        return tf.random.uniform([batch_size], -limit, limit)
+
+    theta = uniform(aug["rotation_range"] * math.pi / 180)
+    tx = uniform(aug["height_shift_range"]) * img_size
+    ty = uniform(aug["width_shift_range"]) * img_size
+    shear = uniform(aug["shear_range"] * math.pi / 180)
+    zx = tf.random.uniform([batch_size], 1 - aug["zoom_range"], 1 + aug["zoom_range"])
+    zy = tf.random.uniform([batch_size], 1 - aug["zoom_range"], 1 + aug["zoom_range"])
+
+    ones, zeros = tf.ones([batch_size]), tf.zeros([batch_size])
+
+    def mat(rows):
+        return tf.stack([tf.stack(r, axis=-1) for r in rows], axis=-2)
+
+    rotation = mat([[tf.cos(theta), -tf.sin(theta), zeros], [tf.sin(theta), tf.cos(theta), zeros], [zeros, zeros, ones]])
+    shift = mat([[ones, zeros, tx], [zeros, ones, ty], [zeros, zeros, ones]])
+    shear_m = mat([[ones, -tf.sin(shear), zeros], [zeros, tf.cos(shear), zeros], [zeros, zeros, ones]])
+    zoom = mat([[zx, zeros, zeros], [zeros, zy, zeros], [zeros, zeros, ones]])
+    transform = rotation @ shift @ shear_m @ zoom
+
+    # Transform about the image centre, as ImageDataGenerator does
+    c = (img_size - 1) / 2.0
+    to_center = tf.constant([[1, 0, c], [0, 1, c], [0, 0, 1]], tf.float32)
+    from_center = tf.constant([[1, 0, -c], [0, 1, -c], [0, 0, 1]], tf.float32)
+    transform = to_center @ transform @ from_center
+    # Keras matrices are in (row, col) order; the projective op expects (x=col, y=row)
+    swap = tf.constant([[0, 1, 0], [1, 0, 0], [0, 0, 1]], tf.float32)
+    transform = swap @ transform @ swap
+    return tf.reshape(transform, [batch_size, 9])[:, :8]
+
+
+def augment_batch(images, img_size=IMG_SIZE, aug=AUGMENTATION):
+    """In-graph equivalent of ImageDataGenerator.random_transform on a float [0, 1] batch."""
+    batch_size = tf.shape(images)[0]
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=_random_affine(batch_size, img_size, aug),
+        output_shape=[img_size, img_size],
+        fill_value=0.0,
+        interpolation="BILINEAR",
+        fill_mode="NEAREST",
+    )
+    # channel_shift_range is in raw 0-255 units because ImageDataGenerator rescales last
+    shift = tf.random.uniform([batch_size, 1, 1, 1], -aug["channel_shift_range"], aug["channel_shift_range"]) / 255.0
+    images = tf.clip_by_value(
+        images + shift,
+        tf.reduce_min(images, axis=[1, 2, 3], keepdims=True),
+        tf.reduce_max(images, axis=[1, 2, 3], keepdims=True),
+    )
+    if aug["horizontal_flip"]:
+        flip = tf.random.uniform([batch_size, 1, 1, 1]) < 0.5
+        images = tf.where(flip, tf.reverse(images, axis=[2]), images)
+    low, high = aug["brightness_range"]
+    brightness = tf.random.uniform([batch_size, 1, 1, 1], low, high)
+    return tf.clip_by_value(images * brightness, 0.0, 1.0)
+
+
+def attach_iterator_metadata(dataset, filepaths, labels, class_indices, batch_size):
+    dataset.samples = len(filepaths)
+    dataset.filenames = filepaths
+    dataset.filepaths = filepaths
+    dataset.classes = labels
+    dataset.class_indices = class_indices
+    dataset.batch_size = batch_size
+    dataset.reset = lambda: None  # a tf.data iteration always starts from the beginning
+    return dataset
+
+
+def make_split_dataset(directory, class_indices, img_size=IMG_SIZE, batch_size=BATCH_SIZE,
+                       training=False, cache=True):
+    """Build one split as a batched, prefetched tf.data.Dataset yielding (x, one_hot_y)."""
+    filepaths, labels, class_indices = list_image_files(directory, class_indices)
+    num_classes = len(class_indices)
+    autotune = tf.data.AUTOTUNE
+
+    ds = tf.data.Dataset.from_tensor_slices((filepaths, labels))
+    if training:
+        ds = ds.shuffle(len(filepaths), seed=SEED, reshuffle_each_iteration=True)
+    ds = ds.map(
+        lambda path, label: (_decode_and_resize(path, img_size), tf.one_hot(label, num_classes)),
+        num_parallel_calls=autotune,
+        deterministic=not training,
+    )
+    if cache and not training:
+        ds = ds.cache()
+    ds = ds.batch(batch_size, num_parallel_calls=autotune)
+    ds = ds.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, y), num_parallel_calls=autotune)
+    if training:
+        ds = ds.map(lambda x, y: (augment_batch(x, img_size), y), num_parallel_calls=autotune)
+    ds = ds.prefetch(autotune)
+    return attach_iterator_metadata(ds, filepaths, labels, class_indices, batch_size)
+
+
+def create_tf_datasets(dataset_path=DATASET_PATH, img_size=IMG_SIZE, batch_size=BATCH_SIZE):
+    """tf.data counterpart of create_data_generators (train, valid, test)."""
+    dataset_path = Path(dataset_path)
+    class_indices = find_class_indices(dataset_path / "train")
+    train_ds = make_split_dataset(dataset_path / "train", class_indices, img_size, batch_size, training=True)
+    val_ds = make_split_dataset(dataset_path / "valid", class_indices, img_size, batch_size)
+    test_ds = make_split_dataset(dataset_path / "test", class_indices, img_size, batch_size)
+    return train_ds, val_ds, test_ds
+
+
+def iterate_batches(split):
+    """Yield one epoch of (x, y) NumPy batches from either backend."""
+    if isinstance(split, tf.data.Dataset):
+        yield from split.as_numpy_iterator()
+        return
+    split.reset()
+    for _ in range(len(split)):
+        yield next(split)
 
 
 def calculate_class_weights(train_generator):
+    """Balanced class weights from the labels of the training split.
+
+    With USE_DATASET_MANIFEST the generator's labels come from the manifest, so no file is touched.
+    """
     class_counts = Counter(train_generator.classes)
     total_samples = len(train_generator.classes)
     num_classes = len(train_generator.class_indices)
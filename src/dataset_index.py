@@ -0,0 +1,281 @@
+"""Validated, cached index of data/dataset.
+
+Every image under {train,valid,test}/<class>/ is decoded once in a process
+pool. Its dimensions, SHA-256 and a 64-bit difference hash (dHash) are stored
+in a JSON manifest with the file's size and mtime. The manifest also records
+the mtime of every directory it walked. While those all match it is reused as
+is; otherwise only new or modified files are decoded again.
+
+The manifest flags undecodable files, exact duplicates (same SHA-256),
+perceptual near-duplicates (dHash Hamming distance <= PHASH_MAX_DISTANCE),
+duplicate groups that leak across splits, and identical files filed under
+different classes. list_image_files and the generator backend of
+create_data_generators read it instead of walking the tree, and skip corrupt
+files.
+
+Usage:
+    python -m src.dataset_index                       # index data/dataset and print the report
+    python -m src.dataset_index --dataset /mnt/big/dataset --workers 16 --max-distance 6
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from PIL import Image
+
+from .config import DATASET_PATH, MANIFEST_DIR, PHASH_MAX_DISTANCE
+
+SPLITS = ("train", "valid", "test")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+MANIFEST_VERSION = 1
+
+
+def dhash(img, size=8):
+    """64-bit difference hash: sign of horizontal gradients on a (size+1) x size grayscale thumbnail."""
+    small = np.asarray(img.convert("L").resize((size + 1, size), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def inspect_image(path):
+    """Decode one file; returns its dimensions, SHA-256 and dHash, or the decode error."""
+    with open(path, "rb") as f:
+        data = f.read()
+    record = {"sha256": hashlib.sha256(data).hexdigest()}
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            record.update(width=img.width, height=img.height, format=img.format)
+            # JPEGs decode at reduced scale; a truncated or corrupt stream still fails
+            img.draft("RGB", (64, 64))
+            img.load()
+            record["dhash"] = f"{dhash(img):016x}"
+    except Exception as exc:
+        record["error"] = f"{type(exc).__name__}: {exc}"
+    return record
+
+
+def walk_split(split_dir):
+    """(path, class name) pairs and {directory: mtime_ns} for one split, in flow_from_directory order."""
+    split_dir = Path(split_dir)
+    dirs = {str(split_dir): os.stat(split_dir).st_mtime_ns}
+    files = []
+    for class_name in sorted(d.name for d in split_dir.iterdir() if d.is_dir()):
+        for root, _, names in sorted(os.walk(split_dir / class_name)):
+            dirs[root] = os.stat(root).st_mtime_ns
+            for fname in sorted(names):
+                if fname.lower().endswith(IMAGE_EXTENSIONS):
+                    files.append((os.path.join(root, fname), class_name))
+    return files, dirs
+
+
+def _popcount(x):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1)
+
+
+def _groups(pairs, n):
+    """Connected components (size > 1) of an undirected graph given as index pairs."""
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        parent[find(i)] = find(j)
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def find_duplicates(records, max_distance=PHASH_MAX_DISTANCE, chunk=512):
+    """Exact and perceptual duplicate groups, cross-split leakage and label conflicts (as record paths)."""
+    by_sha = {}
+    for i, r in enumerate(records):
+        by_sha.setdefault(r["sha256"], []).append(i)
+    exact = [g for g in by_sha.values() if len(g) > 1]
+
+    hashed = [i for i, r in enumerate(records) if "dhash" in r]
+    hashes = np.array([int(records[i]["dhash"], 16) for i in hashed], dtype=np.uint64)
+    pairs = []
+    for start in range(0, len(hashes), chunk):
+        distance = _popcount(hashes[start:start + chunk, None] ^ hashes[None, :])
+        for a, b in zip(*np.nonzero(distance <= max_distance)):
+            if start + a < b:
+                pairs.append((start + a, b))
+    perceptual = [[hashed[i] for i in g] for g in _groups(pairs, len(hashed))]
+    # Groups that are only byte-identical copies are already reported as exact duplicates
+    perceptual = [g for g in perceptual if len({records[i]["sha256"] for i in g}) > 1]
+
+    def paths(group):
+        return [records[i]["path"] for i in group]
+
+    leakage = [
+        {"kind": kind, "splits": sorted({records[i]["split"] for i in g}), "paths": paths(g)}
+        for kind, groups in (("exact", exact), ("perceptual", perceptual))
+        for g in groups if len({records[i]["split"] for i in g}) > 1
+    ]
+    conflicts = [paths(g) for g in exact if len({records[i]["class"] for i in g}) > 1]
+    return {
+        "exact": [paths(g) for g in exact],
+        "perceptual": [paths(g) for g in perceptual],
+        "leakage": leakage,
+        "label_conflicts": conflicts,
+    }
+
+
+def manifest_path_for(dataset_path, manifest_dir=MANIFEST_DIR):
+    key = hashlib.sha256(str(Path(dataset_path).resolve()).encode()).hexdigest()[:16]
+    return Path(manifest_dir) / f"{key}.json"
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def is_fresh(manifest, dataset_path):
+    """True when no walked directory and no indexed file changed size or mtime since indexing."""
+    dataset_path = Path(dataset_path)
+    try:
+        if any(os.stat(d).st_mtime_ns != mtime for d, mtime in manifest["dirs"].items()):
+            return False
+        present = {split for split in SPLITS if (dataset_path / split).is_dir()}
+        if present != set(manifest["splits"]):
+            return False
+        for r in manifest["records"]:
+            st = os.stat(dataset_path / r["path"])
+            if st.st_size != r["size"] or st.st_mtime_ns != r["mtime_ns"]:
+                return False
+    except OSError:
+        return False
+    return True
+
+
+def build_manifest(dataset_path=DATASET_PATH, manifest_dir=MANIFEST_DIR, workers=None, max_distance=PHASH_MAX_DISTANCE):
+    """Index the dataset, decoding only files that are new or changed since the last manifest."""
+    dataset_path = Path(dataset_path)
+    out_path = manifest_path_for(dataset_path, manifest_dir)
+    previous = _read(out_path) or {"records": []}
+    known = {(r["path"], r["size"], r["mtime_ns"]): r for r in previous["records"]}
+
+    splits = [split for split in SPLITS if (dataset_path / split).is_dir()]
+    records, dirs, todo = [], {}, []
+    for split in splits:
+        files, split_dirs = walk_split(dataset_path / split)
+        dirs.update(split_dirs)
+        for path, class_name in files:
+            st = os.stat(path)
+            rel = os.path.relpath(path, dataset_path)
+            record = {"split": split, "class": class_name, "path": rel, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            cached = known.get((rel, st.st_size, st.st_mtime_ns))
+            if cached is not None:
+                record.update({k: v for k, v in cached.items() if k not in record})
+            else:
+                todo.append(len(records))
+            records.append(record)
+
+    if todo:
+        print(f"🔎 Indexing {len(todo)} new or modified images ({len(records) - len(todo)} unchanged)...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            paths = [str(dataset_path / records[i]["path"]) for i in todo]
+            for i, result in zip(todo, pool.map(inspect_image, paths, chunksize=32)):
+                records[i].update(result)
+
+    train_dir = dataset_path / "train"
+    classes = sorted(d.name for d in train_dir.iterdir() if d.is_dir()) if train_dir.is_dir() else []
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "dataset": str(dataset_path.resolve()),
+        "max_distance": max_distance,
+        "class_indices": {name: idx for idx, name in enumerate(classes)},
+        "splits": splits,
+        "dirs": dirs,
+        "records": records,
+        "corrupt": [{"path": r["path"], "error": r["error"]} for r in records if "error" in r],
+        "duplicates": find_duplicates(records, max_distance),
+    }
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, out_path)
+    return manifest
+
+
+def load_manifest(dataset_path=DATASET_PATH, manifest_dir=MANIFEST_DIR, workers=None):
+    """Cached manifest for `dataset_path`, re-indexed incrementally if anything changed."""
+    manifest = _read(manifest_path_for(dataset_path, manifest_dir))
+    if manifest is not None and is_fresh(manifest, dataset_path):
+        return manifest
+    manifest = build_manifest(dataset_path, manifest_dir, workers)
+    print_summary(manifest)
+    return manifest
+
+
+def split_files(manifest, split, class_indices=None):
+    """(filepaths, labels) of the decodable images of one split, in flow_from_directory order."""
+    class_indices = class_indices or manifest["class_indices"]
+    filepaths, labels = [], []
+    for r in manifest["records"]:
+        if r["split"] == split and "error" not in r and r["class"] in class_indices:
+            filepaths.append(os.path.join(manifest["dataset"], r["path"]))
+            labels.append(class_indices[r["class"]])
+    return filepaths, np.array(labels, dtype="int32")
+
+
+def print_summary(manifest):
+    counts = {split: sum(r["split"] == split for r in manifest["records"]) for split in manifest["splits"]}
+    dup = manifest["duplicates"]
+    print(f"📇 Dataset manifest: {', '.join(f'{s} {n}' for s, n in counts.items())}")
+    if manifest["corrupt"]:
+        print(f"⚠️  {len(manifest['corrupt'])} undecodable files are excluded")
+    if dup["exact"] or dup["perceptual"]:
+        print(f"⚠️  {len(dup['exact'])} exact and {len(dup['perceptual'])} near-duplicate groups")
+    if dup["leakage"]:
+        print(f"❗ {len(dup['leakage'])} duplicate groups span more than one split (train/valid/test leakage)")
+    if dup["label_conflicts"]:
+        print(f"❗ {len(dup['label_conflicts'])} identical files are filed under different classes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and index a dataset, flagging duplicates and leakage")
+    parser.add_argument("--dataset", default=str(DATASET_PATH))
+    parser.add_argument("--manifest-dir", default=str(MANIFEST_DIR))
+    parser.add_argument("--workers", type=int, default=None, help="Decode processes (default: CPU count)")
+    parser.add_argument("--max-distance", type=int, default=PHASH_MAX_DISTANCE,
+                        help="dHash Hamming distance counted as a near-duplicate")
+    parser.add_argument("--rebuild", action="store_true", help="Re-check every file, ignoring the cached manifest")
+    args = parser.parse_args()
+
+    manifest = _read(manifest_path_for(args.dataset, args.manifest_dir))
+    if args.rebuild or manifest is None or not is_fresh(manifest, args.dataset) or manifest["max_distance"] != args.max_distance:
+        if args.rebuild:
+            manifest_path_for(args.dataset, args.manifest_dir).unlink(missing_ok=True)
+        manifest = build_manifest(args.dataset, args.manifest_dir, args.workers, args.max_distance)
+    print_summary(manifest)
+
+    for item in manifest["corrupt"]:
+        print(f"  corrupt: {item['path']} ({item['error']})")
+    for item in manifest["duplicates"]["leakage"]:
+        print(f"  leakage ({item['kind']}, {'/'.join(item['splits'])}): {', '.join(item['paths'])}")
+    for paths in manifest["duplicates"]["label_conflicts"]:
+        print(f"  label conflict: {', '.join(paths)}")
+    print(f"💾 Manifest: {manifest_path_for(args.dataset, args.manifest_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Packed, memory-mappable dataset shards for training and evaluation.
+
+`pack` decodes every image of data/dataset/{train,valid,test} once into
+fixed-size uint8 (IMG_SIZE, IMG_SIZE, 3) records. They are stored as .npy
+shards plus a JSON index per split holding each record's label, source path,
+size and mtime. Re-packing is incremental: unchanged files are kept, new or
+modified files are appended to fresh shards, and removed files drop out of
+the index. Use --compact to rewrite the shards without dead records.
+
+Usage:
+    python -m src.dataset_shards --dataset data/dataset --output data/shards
+"""
+import argparse
+import json
+import os
+import numpy as np
+import tensorflow as tf
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+
+from .config import DATASET_PATH, SHARDS_PATH, SHARD_SIZE, IMG_SIZE, BATCH_SIZE, SEED
+from .data_preprocessing import find_class_indices, list_image_files, augment_batch, attach_iterator_metadata
+
+SPLITS = ("train", "valid", "test")
+INDEX_VERSION = 1
+
+
+def _encode(path, img_size):
+    # Nearest-neighbour resize matches flow_from_directory's default interpolation
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGB").resize((img_size, img_size), Image.NEAREST), dtype=np.uint8)
+
+
+def _read_index(split_dir):
+    index_path = Path(split_dir) / "index.json"
+    if not index_path.exists():
+        return None
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def _write_index(split_dir, index):
+    tmp_path = Path(split_dir) / "index.json.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, Path(split_dir) / "index.json")
+
+
+def pack_split(directory, split_dir, class_indices, img_size=IMG_SIZE, shard_size=SHARD_SIZE, compact=False, workers=8):
+    """Pack one split incrementally; returns (encoded, reused) record counts."""
+    directory, split_dir = Path(directory), Path(split_dir)
+    split_dir.mkdir(parents=True, exist_ok=True)
+    index = _read_index(split_dir)
+    if compact or index is None or index["img_size"] != img_size or index["class_indices"] != class_indices:
+        index = {"version": INDEX_VERSION, "img_size": img_size, "class_indices": class_indices,
+                 "shards": [], "records": [], "order": []}
+
+    by_path = {index["records"][i]["path"]: i for i in index["order"]}
+    filepaths, labels, _ = list_image_files(directory, class_indices)
+
+    order, to_encode = [], []
+    for path, label in zip(filepaths, labels):
+        rel = os.path.relpath(path, directory)
+        st = os.stat(path)
+        rec_id = by_path.get(rel)
+        if rec_id is not None:
+            rec = index["records"][rec_id]
+            if rec["size"] == st.st_size and rec["mtime_ns"] == st.st_mtime_ns and rec["label"] == int(label):
+                order.append(rec_id)
+                continue
+        to_encode.append((len(order), rel, path, int(label), st.st_size, st.st_mtime_ns))
+        order.append(None)
+
+    # New and modified files go into new shards; existing shards are never rewritten
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(to_encode), shard_size):
+            chunk = to_encode[start:start + shard_size]
+            images = np.stack(list(pool.map(lambda item: _encode(item[2], img_size), chunk)))
+            shard_name = f"shard_{len(index['shards']):05d}.npy"
+            tmp_path = split_dir / (shard_name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, images)
+            os.replace(tmp_path, split_dir / shard_name)
+            shard_id = len(index["shards"])
+            index["shards"].append(shard_name)
+            for row, (pos, rel, _, label, size, mtime_ns) in enumerate(chunk):
+                order[pos] = len(index["records"])
+                index["records"].append({"path": rel, "label": label, "shard": shard_id, "row": row,
+                                         "size": size, "mtime_ns": mtime_ns})
+
+    index["order"] = order
+    index["source"] = str(directory)
+    _write_index(split_dir, index)
+    return len(to_encode), len(order) - len(to_encode)
+
+
+def pack_dataset(dataset_path=DATASET_PATH, output=SHARDS_PATH, img_size=IMG_SIZE, shard_size=SHARD_SIZE, compact=False):
+    dataset_path, output = Path(dataset_path), Path(output)
+    class_indices = find_class_indices(dataset_path / "train")
+    for split in SPLITS:
+        if compact and (output / split).exists():
+            for old in (output / split).glob("shard_*.npy"):
+                old.unlink()
+        encoded, reused = pack_split(dataset_path / split, output / split, class_indices, img_size, shard_size, compact)
+        print(f"📦 {split}: {encoded} encoded, {reused} reused -> {output / split}")
+
+
+class ShardedSplit:
+    """Read-only view of one packed split backed by memory-mapped shards.
+
+    Exposes the DirectoryIterator attributes (samples, classes, class_indices,
+    filenames, filepaths) in record order, so predictions can be traced back to
+    their source files.
+    """
+
+    def __init__(self, split_dir):
+        self.split_dir = Path(split_dir)
+        index = _read_index(self.split_dir)
+        if index is None:
+            raise FileNotFoundError(f"No packed shards in {self.split_dir}; run `python -m src.dataset_shards` first")
+        self.img_size = index["img_size"]
+        self.class_indices = index["class_indices"]
+        records = [index["records"][i] for i in index["order"]]
+        self._shard_ids = np.array([r["shard"] for r in records], dtype=np.int32)
+        self._rows = np.array([r["row"] for r in records], dtype=np.int64)
+        self.classes = np.array([r["label"] for r in records], dtype=np.int32)
+        self.filenames = [r["path"] for r in records]
+        source = index.get("source", "")
+        self.filepaths = [os.path.join(source, p) for p in self.filenames]
+        self.samples = len(records)
+        self._shard_files = index["shards"]
+        self._shards = {}
+
+    def _shard(self, shard_id):
+        if shard_id not in self._shards:
+            self._shards[shard_id] = np.load(self.split_dir / self._shard_files[shard_id], mmap_mode="r")
+        return self._shards[shard_id]
+
+    def get_images(self, positions):
+        """uint8 images for record positions; a contiguous run within one shard is a zero-copy view."""
+        positions = np.asarray(positions)
+        shard_ids = self._shard_ids[positions]
+        rows = self._rows[positions]
+        if len(positions) and (shard_ids == shard_ids[0]).all() and (np.diff(rows) == 1).all():
+            return self._shard(int(shard_ids[0]))[rows[0]:rows[-1] + 1]
+        out = np.empty((len(positions), self.img_size, self.img_size, 3), dtype=np.uint8)
+        for shard_id in np.unique(shard_ids):
+            mask = shard_ids == shard_id
+            out[mask] = self._shard(int(shard_id))[rows[mask]]
+        return out
+
+    def iter_batches(self, batch_size=BATCH_SIZE, shuffle=False, seed=SEED):
+        """Yield (uint8 images, labels, positions) batches in record order (or shuffled)."""
+        order = np.random.default_rng(seed).permutation(self.samples) if shuffle else np.arange(self.samples)
+        for start in range(0, self.samples, batch_size):
+            positions = order[start:start + batch_size]
+            yield self.get_images(positions), self.classes[positions], positions
+
+    def to_dataset(self, batch_size=BATCH_SIZE, training=False):
+        """Batched tf.data.Dataset of (float [0, 1] images, one-hot labels), like the tfdata backend."""
+        num_classes = len(self.class_indices)
+        epoch = {"n": 0}
+
+        def generator():
+            # A new permutation every epoch for training
+            epoch["n"] += 1
+            for images, labels, _ in self.iter_batches(batch_size, shuffle=training, seed=SEED + epoch["n"]):
+                yield images, labels
+
+        ds = tf.data.Dataset.from_generator(
+            generator,
+            output_signature=(
+                tf.TensorSpec([None, self.img_size, self.img_size, 3], tf.uint8),
+                tf.TensorSpec([None], tf.int32),
+            ),
+        )
+        ds = ds.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, tf.one_hot(y, num_classes)),
+                    num_parallel_calls=tf.data.AUTOTUNE)
+        if training:
+            ds = ds.map(lambda x, y: (augment_batch(x, self.img_size), y), num_parallel_calls=tf.data.AUTOTUNE)
+        steps = -(-self.samples // batch_size)
+        ds = ds.apply(tf.data.experimental.assert_cardinality(steps)).prefetch(tf.data.AUTOTUNE)
+        return attach_iterator_metadata(ds, self.filepaths, self.classes, self.class_indices, batch_size)
+
+
+def create_shard_datasets(shards_path=SHARDS_PATH, batch_size=BATCH_SIZE, img_size=IMG_SIZE):
+    """Shard-backed counterpart of create_data_generators (train, valid, test).
+
+    Shards hold images at the size they were packed with, so img_size must match it.
+    """
+    shards_path = Path(shards_path)
+    splits = [ShardedSplit(shards_path / split) for split in SPLITS]
+    for split in splits:
+        if split.img_size != img_size:
+            raise ValueError(f"Shards in {split.split_dir} were packed at {split.img_size}px but {img_size}px was "
+                             f"requested; repack with `python -m src.dataset_shards --img-size {img_size}`")
+    return tuple(split.to_dataset(batch_size, training=(name == "train")) for name, split in zip(SPLITS, splits))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack data/dataset into memory-mappable uint8 shards")
+    parser.add_argument("--dataset", default=str(DATASET_PATH))
+    parser.add_argument("--output", default=str(SHARDS_PATH))
+    parser.add_argument("--img-size", type=int, default=IMG_SIZE)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--compact", action="store_true", help="Rewrite all shards without dead records")
+    args = parser.parse_args()
+    pack_dataset(args.dataset, args.output, args.img_size, args.shard_size, args.compact)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Knowledge distillation of smaller MobileNetV2 students from pawscan_final.h5.
+
+Each student (width multiplier alpha, input resolution) is trained with the same
+two-phase flow as train_model.py: the head on a frozen backbone, then gentle
+fine-tuning of the top backbone layers. The loss mixes the hard labels with the
+teacher's temperature-softened outputs. Afterwards every model is evaluated on
+the test split and timed on the CPU. The resulting accuracy-vs-latency table,
+with its Pareto front marked, is written to models/variants.json, which the API
+reads to pick a model for MODEL_LATENCY_BUDGET_MS.
+
+Usage:
+    python -m src.distill                                  # every STUDENT_VARIANTS entry, then the table
+    python -m src.distill --variants 0.5x160 0.75x192 --epochs-phase1 10
+    python -m src.distill --table-only                     # re-time existing variants on this machine
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+from tensorflow.keras.optimizers import Adam # type: ignore
+from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau # type: ignore
+
+from src.data_preprocessing import create_data_generators, calculate_class_weights
+from src.model_architecture import create_mobilenet_model
+from src.evaluate_model import evaluate
+from src.config import (MODEL_SAVE_PATH, DATASET_PATH, STUDENT_VARIANTS, DISTILL_TEMPERATURE, DISTILL_SOFT_WEIGHT,
+                        VARIANTS_MANIFEST, INITIAL_LR, PATIENCE_EARLY_STOP, PATIENCE_REDUCE_LR, MIN_LR,
+                        FINE_TUNE_FRACTION, FINE_TUNE_LR)
+
+
+def variant_name(alpha, img_size):
+    return f"pawscan_a{int(round(alpha * 100)):03d}_{img_size}"
+
+
+def soften(probs, temperature):
+    """Temperature-scaled distribution from softmax outputs (log-probabilities are logits up to a constant)."""
+    return tf.nn.softmax(tf.math.log(tf.clip_by_value(probs, 1e-7, 1.0)) / temperature)
+
+
+def distillation_loss(teacher_probs, student_probs, temperature=DISTILL_TEMPERATURE):
+    """Per-sample KL divergence between softened outputs, scaled by T^2 to keep gradients comparable."""
+    return tf.keras.losses.kl_divergence(soften(teacher_probs, temperature),
+                                         soften(student_probs, temperature)) * temperature ** 2
+
+
+class Distiller(tf.keras.Model):
+    """Train `student` against the labels and a frozen `teacher`.
+
+    Batches arrive at the teacher's resolution and are resized in-graph for the
+    student. Logged metrics (loss, accuracy, top_2_accuracy) use the same names
+    as train_model.py, so the usual callbacks monitor the student.
+    """
+
+    def __init__(self, student, teacher, temperature=DISTILL_TEMPERATURE, soft_weight=DISTILL_SOFT_WEIGHT):
+        super().__init__(name="distiller")
+        self.student = student
+        self.teacher = teacher
+        self.teacher.trainable = False
+        self.temperature = temperature
+        self.soft_weight = soft_weight
+        self.student_size = tuple(student.input_shape[1:3])
+        self.loss_tracker = tf.keras.metrics.Mean(name="loss")
+        self.accuracy = tf.keras.metrics.CategoricalAccuracy(name="accuracy")
+        self.top_2_accuracy = tf.keras.metrics.TopKCategoricalAccuracy(k=2, name="top_2_accuracy")
+
+    @property
+    def metrics(self):
+        return [self.loss_tracker, self.accuracy, self.top_2_accuracy]
+
+    def _student_input(self, x):
+        if tuple(x.shape[1:3]) == self.student_size:
+            return x
+        return tf.image.resize(x, self.student_size, antialias=True)
+
+    def call(self, x, training=False):
+        return self.student(self._student_input(x), training=training)
+
+    def _loss(self, x, y, sample_weight, training):
+        teacher_probs = self.teacher(x, training=False)
+        student_probs = self(x, training=training)
+        hard = tf.keras.losses.categorical_crossentropy(y, student_probs)
+        soft = distillation_loss(teacher_probs, student_probs, self.temperature)
+        per_sample = (1.0 - self.soft_weight) * hard + self.soft_weight * soft
+        if sample_weight is not None:
+            per_sample *= tf.cast(tf.reshape(sample_weight, [-1]), per_sample.dtype)
+        return tf.reduce_mean(per_sample), student_probs
+
+    def _update_metrics(self, loss, y, student_probs):
+        self.loss_tracker.update_state(loss)
+        self.accuracy.update_state(y, student_probs)
+        self.top_2_accuracy.update_state(y, student_probs)
+        return {m.name: m.result() for m in self.metrics}
+
+    def train_step(self, data):
+        x, y, sample_weight = tf.keras.utils.unpack_x_y_sample_weight(data)
+        with tf.GradientTape() as tape:
+            loss, student_probs = self._loss(x, y, sample_weight, training=True)
+        variables = self.student.trainable_variables
+        self.optimizer.apply_gradients(zip(tape.gradient(loss, variables), variables))
+        return self._update_metrics(loss, y, student_probs)
+
+    def test_step(self, data):
+        x, y, _ = tf.keras.utils.unpack_x_y_sample_weight(data)
+        loss, student_probs = self._loss(x, y, None, training=False)
+        return self._update_metrics(loss, y, student_probs)
+
+
+def train_student(teacher, alpha, img_size, train_gen, val_gen, class_weights=None,
+                  epochs_phase1=20, epochs_phase2=20, output_dir=MODEL_SAVE_PATH):
+    """Distill one student with the Phase 1 / Phase 2 flow of train_model.py; returns its saved path."""
+    name = variant_name(alpha, img_size)
+    print("=" * 60)
+    print(f"🎓 Distilling {name} (alpha {alpha}, {img_size} px)")
+    print("=" * 60)
+
+    num_classes = int(teacher.output_shape[-1])
+    student, base_model = create_mobilenet_model(num_classes, img_size, alpha=alpha)
+    distiller = Distiller(student, teacher)
+
+    # Phase 1: head only, frozen backbone
+    distiller.compile(optimizer=Adam(learning_rate=INITIAL_LR))
+    history_phase1 = distiller.fit(
+        train_gen,
+        epochs=epochs_phase1,
+        validation_data=val_gen,
+        class_weight=class_weights,
+        callbacks=[
+            EarlyStopping(monitor='val_accuracy', patience=PATIENCE_EARLY_STOP, restore_best_weights=True, verbose=1),
+            ReduceLROnPlateau(monitor='val_loss', factor=0.4, patience=PATIENCE_REDUCE_LR, min_lr=MIN_LR, verbose=1),
+        ],
+        verbose=1
+    )
+    phase1_best = max(history_phase1.history['val_accuracy'])
+    phase1_weights = student.get_weights()
+    print(f"✅ Phase 1 best val acc: {phase1_best:.4f}")
+
+    # Phase 2: unfreeze the top 5% of the backbone at an ultra-low learning rate
+    if epochs_phase2 > 0:
+        base_model.trainable = True
+        fine_tune_at = int(len(base_model.layers) * (1 - FINE_TUNE_FRACTION))
+        for layer in base_model.layers[:fine_tune_at]:
+            layer.trainable = False
+        distiller.compile(optimizer=Adam(learning_rate=FINE_TUNE_LR))
+        history_phase2 = distiller.fit(
+            train_gen,
+            epochs=epochs_phase1 + epochs_phase2,
+            initial_epoch=history_phase1.epoch[-1] + 1,
+            validation_data=val_gen,
+            class_weight=class_weights,
+            callbacks=[
+                EarlyStopping(monitor='val_accuracy', patience=PATIENCE_EARLY_STOP, restore_best_weights=True,
+                              mode='max', baseline=phase1_best, verbose=1),
+                ReduceLROnPlateau(monitor='val_loss', factor=0.7, patience=5, min_lr=1e-9, verbose=1),
+            ],
+            verbose=1
+        )
+        phase2_best = max(history_phase2.history['val_accuracy'])
+        print(f"Phase 2 best val acc: {phase2_best:.4f} ({(phase2_best - phase1_best) * 100:+.2f}%)")
+        if phase2_best - phase1_best < -0.005:
+            print("❌ Phase 2 decreased performance. Reverting to Phase 1 weights.")
+            student.set_weights(phase1_weights)
+
+    path = os.path.join(output_dir, f"{name}.h5")
+    student.save(path)
+    print(f"💾 Saved student: {path}")
+    return path
+
+
+def measure_latency(model, img_size, runs=100, warmup=10):
+    """Single-image CPU latency percentiles in ms, as one /analyze_files image would see it."""
+    x = np.random.default_rng(0).random((1, img_size, img_size, 3), dtype=np.float32)
+    with tf.device("/CPU:0"):
+        for _ in range(warmup):
+            model(x, training=False)
+        latencies = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(x, training=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def mark_pareto(entries):
+    """Flag entries no other entry beats on both accuracy and p95 latency."""
+    best_accuracy = -1.0
+    for entry in sorted(entries, key=lambda e: (e["latency_p95_ms"], -e["accuracy"])):
+        entry["pareto"] = entry["accuracy"] > best_accuracy
+        best_accuracy = max(best_accuracy, entry["accuracy"])
+    return entries
+
+
+def build_variant_table(model_paths, test_dir=DATASET_PATH / "test", manifest_path=VARIANTS_MANIFEST,
+                        batch_size=64, runs=100):
+    """Evaluate and time each model, print the Pareto table and write the manifest the API reads."""
+    manifest_path = Path(manifest_path)
+    entries = []
+    for name, path in model_paths.items():
+        model = tf.keras.models.load_model(path)
+        img_size = int(model.input_shape[1])
+        with tf.device("/CPU:0"):
+            summary = evaluate(model, test_dir, batch_size, img_size=img_size)
+        p50, p95 = measure_latency(model, img_size, runs)
+        entries.append({
+            "name": name,
+            "path": os.path.relpath(path, manifest_path.parent),
+            "img_size": img_size,
+            "params": int(model.count_params()),
+            "size_mb": os.path.getsize(path) / 1e6,
+            "accuracy": summary["accuracy"],
+            "latency_p50_ms": p50,
+            "latency_p95_ms": p95,
+        })
+    mark_pareto(entries)
+    entries.sort(key=lambda e: e["latency_p95_ms"])
+
+    print("=" * 84)
+    print(f"📈 ACCURACY vs CPU LATENCY ({test_dir}, {os.cpu_count()} CPUs, batch of 1)")
+    print("=" * 84)
+    print(f"{'model':<22} {'px':>4} {'params':>9} {'MB':>6} {'acc':>6} {'p50 ms':>8} {'p95 ms':>8} {'pareto':>7}")
+    for e in entries:
+        print(f"{e['name']:<22} {e['img_size']:>4} {e['params']:>9,} {e['size_mb']:>6.1f} {e['accuracy']:>6.3f} "
+              f"{e['latency_p50_ms']:>8.2f} {e['latency_p95_ms']:>8.2f} {'*' if e['pareto'] else '':>7}")
+
+    with open(manifest_path, "w") as f:
+        json.dump({"created": time.time(), "test_dir": str(test_dir), "cpus": os.cpu_count(), "variants": entries},
+                  f, indent=2)
+    print(f"\n💾 Variant table saved to: {manifest_path}")
+    return entries
+
+
+def parse_variant(text):
+    alpha, img_size = text.lower().split("x")
+    return float(alpha), int(img_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill smaller PawScan variants and build the latency table")
+    parser.add_argument("--teacher", default=os.path.join(MODEL_SAVE_PATH, "pawscan_final.h5"))
+    parser.add_argument("--variants", nargs="+", type=parse_variant, default=STUDENT_VARIANTS,
+                        help="alphaxresolution, e.g. 0.5x160 (default: config.STUDENT_VARIANTS)")
+    parser.add_argument("--epochs-phase1", type=int, default=20)
+    parser.add_argument("--epochs-phase2", type=int, default=20, help="0 skips fine-tuning")
+    parser.add_argument("--table-only", action="store_true", help="Only evaluate and time existing models")
+    parser.add_argument("--latency-runs", type=int, default=100)
+    parser.add_argument("--output", default=str(VARIANTS_MANIFEST))
+    args = parser.parse_args()
+
+    teacher = tf.keras.models.load_model(args.teacher)
+    print(f"✅ Loaded teacher from: {args.teacher}")
+    model_paths = {"teacher": args.teacher}
+
+    if not args.table_only:
+        # Batches come at the teacher's resolution; the distiller downsizes them for each student
+        train_gen, val_gen, _ = create_data_generators(img_size=int(teacher.input_shape[1]))
+        class_weights = calculate_class_weights(train_gen)
+    for alpha, img_size in args.variants:
+        path = os.path.join(MODEL_SAVE_PATH, f"{variant_name(alpha, img_size)}.h5")
+        if not args.table_only:
+            path = train_student(teacher, alpha, img_size, train_gen, val_gen, class_weights,
+                                 args.epochs_phase1, args.epochs_phase2)
+        if os.path.exists(path):
+            model_paths[variant_name(alpha, img_size)] = path
+        else:
+            print(f"⚠️  {path} not found, skipping")
+
+    build_variant_table(model_paths, manifest_path=args.output, runs=args.latency_runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,170 @@
+"""Batch evaluation engine for a trained PawScan model.
+
+Streams predictions over a dataset split in fixed-size batches, writes them to a
+columnar results file and updates the confusion matrix incrementally, so memory
+stays flat no matter how large the split is. Runs headless (no plt.show()).
+
+Usage:
+    python -m src.evaluate_model                                    # pawscan_final.h5 on data/dataset/test
+    python -m src.evaluate_model --model models/pawscan_final.h5 --dataset /mnt/big/test \\
+        --batch-size 64 --output results/test_predictions --plot results/confusion_matrix.png
+    python -m src.evaluate_model --dataset data/shards/test         # packed shards from src.dataset_shards
+"""
+import argparse
+import json
 import os
+import time
 import numpy as np
 import tensorflow as tf
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.metrics import classification_report, confusion_matrix
 from pathlib import Path
 
-from src.data_preprocessing import create_data_generators
-from src.config import MODEL_SAVE_PATH
-
-
-print("="*60)
-print("📊 MOBILENETV2 MODEL EVALUATION ON TEST SET")
-print("="*60)
-
-
-# 1. Load test data generator
-train_gen, val_gen, test_gen = create_data_generators()
-
-
-# 2. Load the best saved model
-best_model_path = os.path.join(MODEL_SAVE_PATH, "pawscan_final.h5")
-best_model = tf.keras.models.load_model(best_model_path)
-print(f"✅ Loaded model from: {best_model_path}")
-
-
-# 3. Make predictions
-print("\n🔍 Making predictions on test set...")
-test_gen.reset()
-test_predictions = best_model.predict(test_gen, verbose=1)
-predicted_classes = np.argmax(test_predictions, axis=1)
-
-# True labels
-true_classes = test_gen.classes
-class_names = list(test_gen.class_indices.keys())
-
-
-# 4. Classification report
-print("\n📑 Classification Report:")
-print(classification_report(true_classes, predicted_classes, target_names=class_names))
-
+from src.data_preprocessing import find_class_indices, list_image_files, make_split_dataset
+from src.config import MODEL_SAVE_PATH, DATASET_PATH, IMG_SIZE
+from src.memory import peak_rss_mb
+
+
+def iter_split(dataset_dir, batch_size, img_size=IMG_SIZE):
+    """Yield (float images, true labels, file paths) batches plus the split's metadata.
+
+    Accepts either an image directory with one sub-folder per class or a packed
+    shard directory (contains index.json).
+    """
+    dataset_dir = Path(dataset_dir)
+    if (dataset_dir / "index.json").exists():
+        from src.dataset_shards import ShardedSplit
+        split = ShardedSplit(dataset_dir)
+
+        def batches():
+            for images, labels, positions in split.iter_batches(batch_size):
+                yield images.astype(np.float32) / 255.0, labels, [split.filepaths[i] for i in positions]
+
+        return split.samples, split.class_indices, batches()
+
+    class_indices = find_class_indices(dataset_dir)
+    filepaths, labels, _ = list_image_files(dataset_dir, class_indices)
+    # cache=False keeps memory flat for splits larger than RAM
+    ds = make_split_dataset(dataset_dir, class_indices, img_size, batch_size, training=False, cache=False)
+
+    def batches():
+        offset = 0
+        for images, _ in ds.as_numpy_iterator():
+            n = len(images)
+            yield images, labels[offset:offset + n], filepaths[offset:offset + n]
+            offset += n
+
+    return len(filepaths), class_indices, batches()
+
+
+class ColumnarWriter:
+    """Stream (path, true label, predicted label, probabilities) columns to disk.
+
+    A `.parquet` output is written one row group per batch (requires pyarrow);
+    any other output is a directory of column files: paths.txt, true_label.npy,
+    pred_label.npy and probabilities.npy, preallocated as memory-mapped arrays.
+    """
+
+    def __init__(self, output, num_samples, class_names):
+        self.output = Path(output)
+        self.class_names = class_names
+        self.offset = 0
+        self._parquet = None
+        if self.output.suffix == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._pa = pa
+            fields = [pa.field("path", pa.string()), pa.field("true_label", pa.int32()), pa.field("pred_label", pa.int32())]
+            fields += [pa.field(f"prob_{name}", pa.float32()) for name in class_names]
+            self.output.parent.mkdir(parents=True, exist_ok=True)
+            self._parquet = pq.ParquetWriter(self.output, pa.schema(fields))
+            return
+
+        self.output.mkdir(parents=True, exist_ok=True)
+        open_memmap = np.lib.format.open_memmap
+        self._true = open_memmap(self.output / "true_label.npy", mode="w+", dtype=np.int32, shape=(num_samples,))
+        self._pred = open_memmap(self.output / "pred_label.npy", mode="w+", dtype=np.int32, shape=(num_samples,))
+        self._probs = open_memmap(self.output / "probabilities.npy", mode="w+", dtype=np.float32,
+                                  shape=(num_samples, len(class_names)))
+        self._paths = open(self.output / "paths.txt", "w")
+        with open(self.output / "classes.json", "w") as f:
+            json.dump(class_names, f)
+
+    def write(self, paths, true_labels, probs):
+        pred_labels = np.argmax(probs, axis=1)
+        if self._parquet is not None:
+            columns = {"path": list(paths), "true_label": true_labels.astype(np.int32), "pred_label": pred_labels.astype(np.int32)}
+            for i, name in enumerate(self.class_names):
+                columns[f"prob_{name}"] = probs[:, i].astype(np.float32)
+            self._parquet.write_table(self._pa.table(columns))
+        else:
+            end = self.offset + len(paths)
+            self._true[self.offset:end] = true_labels
+            self._pred[self.offset:end] = pred_labels
+            self._probs[self.offset:end] = probs
+            self._paths.writelines(f"{p}\n" for p in paths)
+        self.offset += len(paths)
+        return pred_labels
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            return
+        for column in (self._true, self._pred, self._probs):
+            column.flush()
+        self._paths.close()
+
+
+def per_class_metrics(cm, class_names):
+    metrics = {}
+    for i, class_name in enumerate(class_names):
+        tp = cm[i, i]
+        fp = np.sum(cm[:, i]) - tp
+        fn = np.sum(cm[i, :]) - tp
 
-# 5. Confusion Matrix
-cm = confusion_matrix(true_classes, predicted_classes)
+        precision = tp / (tp + fp) if (tp + fp) > 0 else 0
+        recall = tp / (tp + fn) if (tp + fn) > 0 else 0
+        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+        metrics[class_name] = {"precision": float(precision), "recall": float(recall), "f1": float(f1),
+                               "support": int(np.sum(cm[i, :]))}
+    return metrics
+
+
+def evaluate(model, dataset_dir, batch_size=64, output=None, img_size=IMG_SIZE):
+    """Stream predictions over a split; returns a summary dict with the confusion matrix."""
+    num_samples, class_indices, batches = iter_split(dataset_dir, batch_size, img_size)
+    class_names = list(class_indices.keys())
+    cm = np.zeros((len(class_names), len(class_names)), dtype=np.int64)
+    writer = ColumnarWriter(output, num_samples, class_names) if output else None
+
+    print(f"\n🔍 Evaluating {num_samples} images from {dataset_dir} (batch size {batch_size})...")
+    start, seen = time.perf_counter(), 0
+    for images, true_labels, paths in batches:
+        probs = np.asarray(model.predict_on_batch(images))
+        pred_labels = writer.write(paths, true_labels, probs) if writer else np.argmax(probs, axis=1)
+        np.add.at(cm, (true_labels, pred_labels), 1)
+        seen += len(images)
+    elapsed = time.perf_counter() - start
+    if writer:
+        writer.close()
+
+    return {
+        "samples": seen,
+        "class_names": class_names,
+        "confusion_matrix": cm.tolist(),
+        "accuracy": float(np.trace(cm) / max(np.sum(cm), 1)),
+        "per_class": per_class_metrics(cm, class_names),
+        "images_per_sec": seen / elapsed if elapsed > 0 else 0.0,
+        "elapsed_s": elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def plot_confusion_matrix(cm, class_names, output_path):
+    """Save the confusion matrix heatmap to output_path (headless)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
-def plot_confusion_matrix(cm, class_names):
-    """Plot confusion matrix with better styling"""
     plt.figure(figsize=(10, 8))
     sns.heatmap(
         cm, annot=True, fmt='d', cmap='Blues',
@@ -58,36 +177,60 @@ def plot_confusion_matrix(cm, class_names):
     plt.xticks(rotation=45, ha='right')
     plt.yticks(rotation=0)
     plt.tight_layout()
-    plt.show()
-
-plot_confusion_matrix(cm, class_names)
+    plt.savefig(output_path, dpi=150)
+    plt.close()
 
 
-# 6. Per-class Performance Analysis
-def analyze_per_class_performance(cm, class_names):
-    """Analyze per-class performance"""
+def analyze_per_class_performance(summary):
+    """Print per-class performance"""
     print("\n📈 Per-class Performance Analysis:")
     print("-" * 60)
-
-    overall_accuracy = np.trace(cm) / np.sum(cm)
-    print(f"Overall Accuracy: {overall_accuracy:.3f}")
+    print(f"Overall Accuracy: {summary['accuracy']:.3f}")
     print("-" * 60)
 
-    for i, class_name in enumerate(class_names):
-        tp = cm[i, i]
-        fp = np.sum(cm[:, i]) - tp
-        fn = np.sum(cm[i, :]) - tp
-        tn = np.sum(cm) - tp - fp - fn
-
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0
-        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-
+    for class_name, m in summary["per_class"].items():
         print(f"{class_name}:")
-        print(f"  Precision: {precision:.3f}")
-        print(f"  Recall: {recall:.3f}")
-        print(f"  F1-Score: {f1:.3f}")
-        print(f"  Support: {np.sum(cm[i, :])}")
+        print(f"  Precision: {m['precision']:.3f}")
+        print(f"  Recall: {m['recall']:.3f}")
+        print(f"  F1-Score: {m['f1']:.3f}")
+        print(f"  Support: {m['support']}")
         print()
 
-analyze_per_class_performance(cm, class_names)
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a PawScan model on a dataset split")
+    parser.add_argument("--model", default=os.path.join(MODEL_SAVE_PATH, "pawscan_final.h5"))
+    parser.add_argument("--dataset", default=str(DATASET_PATH / "test"),
+                        help="Split directory with one folder per class, or a packed shard directory")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--output", default=None, help="Columnar results: a directory, or a .parquet file")
+    parser.add_argument("--summary", default=None, help="Write metrics, throughput and memory as JSON")
+    parser.add_argument("--plot", default=None, help="Save the confusion matrix as an image")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📊 MOBILENETV2 MODEL EVALUATION")
+    print("=" * 60)
+
+    model = tf.keras.models.load_model(args.model)
+    print(f"✅ Loaded model from: {args.model}")
+
+    # Distilled variants from src.distill take smaller inputs than IMG_SIZE
+    summary = evaluate(model, args.dataset, args.batch_size, args.output, img_size=model.input_shape[1])
+    analyze_per_class_performance(summary)
+    print(f"⚡ Throughput: {summary['images_per_sec']:.1f} images/sec ({summary['elapsed_s']:.1f}s)")
+    print(f"🧠 Peak memory: {summary['peak_rss_mb']:.0f} MB")
+
+    if args.output:
+        print(f"💾 Predictions saved to: {args.output}")
+    if args.plot:
+        plot_confusion_matrix(np.array(summary["confusion_matrix"]), summary["class_names"], args.plot)
+        print(f"🖼️  Confusion matrix saved to: {args.plot}")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"📝 Summary saved to: {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
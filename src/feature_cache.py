@@ -0,0 +1,164 @@
+"""Frozen-backbone feature cache for Phase 1 head training.
+
+During Phase 1 the MobileNetV2 backbone is frozen, so its pooled output for a
+given image never changes. This module runs the backbone once per image (and
+optionally for K-1 extra augmented views), stores the pooled features in a
+memory-mapped .npy file next to a JSON index, and trains only the dense head
+on them. The cache directory is keyed by backbone weights, image size, number
+of views and augmentation seed, so later runs reuse it.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+from tensorflow.keras.layers import GlobalAveragePooling2D # type: ignore
+from tensorflow.keras.optimizers import Adam # type: ignore
+
+from .config import (DATASET_PATH, IMG_SIZE, BATCH_SIZE, SEED, INITIAL_LR, FEATURE_CACHE_DIR, FEATURE_CACHE_VIEWS,
+                     HEAD_UNITS, HEAD_DROPOUTS)
+from .data_preprocessing import find_class_indices, list_image_files, make_split_dataset, augment_batch
+from .model_architecture import create_head_model, graft_head_weights
+
+
+def backbone_fingerprint(base_model):
+    """Hash of the backbone's weight values and shapes."""
+    digest = hashlib.sha256()
+    for weight in base_model.weights:
+        value = weight.numpy()
+        digest.update(str(value.shape).encode())
+        digest.update(value.tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(base_model, img_size=IMG_SIZE, views=FEATURE_CACHE_VIEWS, seed=SEED):
+    params = f"{backbone_fingerprint(base_model)}|{img_size}|{views}|{seed}"
+    return hashlib.sha256(params.encode()).hexdigest()[:16]
+
+
+def _listing_hash(filepaths):
+    return hashlib.sha256("\n".join(filepaths).encode()).hexdigest()
+
+
+def _is_current(index_path, filepaths):
+    if not index_path.exists():
+        return False
+    with open(index_path) as f:
+        index = json.load(f)
+    return index.get("listing_hash") == _listing_hash(filepaths)
+
+
+def extract_split(base_model, directory, class_indices, out_dir, split, img_size=IMG_SIZE, views=1, seed=SEED):
+    """Run the backbone over one split and write <split>_features.npy + <split>_index.json.
+
+    Rows are laid out view-major: row v * N + i holds view v of image i. View 0 is
+    the plain rescaled image; later views use the in-graph training augmentation.
+    """
+    out_dir = Path(out_dir)
+    index_path = out_dir / f"{split}_index.json"
+    filepaths, labels, _ = list_image_files(directory, class_indices)
+    if _is_current(index_path, filepaths):
+        print(f"♻️  Reusing cached {split} features: {out_dir}")
+        return
+
+    inputs = tf.keras.Input(shape=(img_size, img_size, 3))
+    extractor = tf.keras.Model(inputs, GlobalAveragePooling2D()(base_model(inputs, training=False)))
+    feature_dim = int(extractor.output_shape[-1])
+
+    ds = make_split_dataset(directory, class_indices, img_size, BATCH_SIZE * 4, training=False, cache=False)
+    num_samples = len(filepaths)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_dir / f"{split}_features.tmp.npy"
+    features = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(num_samples * views, feature_dim))
+
+    print(f"🧮 Extracting {split} features: {num_samples} images x {views} view(s)")
+    for view in range(views):
+        tf.random.set_seed(seed + view)
+        row = view * num_samples
+        for batch_x, _ in ds:
+            if view > 0:
+                batch_x = augment_batch(batch_x, img_size)
+            batch_features = extractor(batch_x, training=False).numpy()
+            features[row:row + len(batch_features)] = batch_features
+            row += len(batch_features)
+    features.flush()
+    del features
+    os.replace(tmp_path, out_dir / f"{split}_features.npy")
+
+    # The index is written last, so its presence marks a complete split
+    index = {
+        "split": split,
+        "samples": num_samples,
+        "views": views,
+        "feature_dim": feature_dim,
+        "img_size": img_size,
+        "seed": seed,
+        "class_indices": class_indices,
+        "filepaths": filepaths,
+        "labels": labels.tolist(),
+        "listing_hash": _listing_hash(filepaths),
+    }
+    with open(index_path, "w") as f:
+        json.dump(index, f)
+
+
+def build_feature_cache(base_model, dataset_path=DATASET_PATH, img_size=IMG_SIZE, views=FEATURE_CACHE_VIEWS,
+                        seed=SEED, cache_root=FEATURE_CACHE_DIR):
+    """Extract (or reuse) train and valid features; returns the keyed cache directory."""
+    dataset_path = Path(dataset_path)
+    cache_dir = Path(cache_root) / cache_key(base_model, img_size, views, seed)
+    class_indices = find_class_indices(dataset_path / "train")
+    extract_split(base_model, dataset_path / "train", class_indices, cache_dir, "train", img_size, views, seed)
+    # Validation always uses the un-augmented view only
+    extract_split(base_model, dataset_path / "valid", class_indices, cache_dir, "valid", img_size, 1, seed)
+    return cache_dir
+
+
+def load_split(cache_dir, split):
+    """Return (memory-mapped features, labels per row, index) for a cached split."""
+    cache_dir = Path(cache_dir)
+    with open(cache_dir / f"{split}_index.json") as f:
+        index = json.load(f)
+    features = np.load(cache_dir / f"{split}_features.npy", mmap_mode="r")
+    labels = np.tile(np.asarray(index["labels"], dtype=np.int32), index["views"])
+    return features, labels, index
+
+
+def train_head_on_cached_features(model, base_model, epochs, class_weights=None, callbacks=None,
+                                  learning_rate=INITIAL_LR, dataset_path=DATASET_PATH, img_size=IMG_SIZE,
+                                  views=FEATURE_CACHE_VIEWS, seed=SEED, batch_size=BATCH_SIZE,
+                                  head_units=HEAD_UNITS, head_dropouts=HEAD_DROPOUTS):
+    """Phase 1 on cached features: train only the head, then graft it into `model`.
+
+    Returns the Keras History of the head fit, which has the same metric keys as
+    a full-model Phase 1 fit. head_units / head_dropouts must match the head of `model`.
+    """
+    cache_dir = build_feature_cache(base_model, dataset_path, img_size, views, seed)
+    x_train, y_train, index = load_split(cache_dir, "train")
+    x_val, y_val, _ = load_split(cache_dir, "valid")
+    num_classes = len(index["class_indices"])
+
+    head = create_head_model(index["feature_dim"], num_classes, head_units, head_dropouts)
+    head.compile(
+        optimizer=Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=[
+            'accuracy',
+            tf.keras.metrics.TopKCategoricalAccuracy(k=2, name='top_2_accuracy')
+        ]
+    )
+    history = head.fit(
+        x_train,
+        tf.keras.utils.to_categorical(y_train, num_classes),
+        validation_data=(x_val, tf.keras.utils.to_categorical(y_val, num_classes)),
+        epochs=epochs,
+        batch_size=batch_size,
+        class_weight=class_weights,
+        callbacks=callbacks,
+        shuffle=True,
+        verbose=1
+    )
+    graft_head_weights(head, model)
+    print(f"✅ Head trained on cached features and grafted into {model.name}")
+    return history
@@ -0,0 +1,41 @@
+"""Process memory readings shared by training, evaluation and the benchmarks.
+
+Kept free of TensorFlow so that importing it does not inflate the numbers it reports.
+"""
+import resource
+import sys
+
+
+def _proc_field_mb(path, field):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_mb():
+    rss = _proc_field_mb("/proc/self/status", "VmRSS")
+    return rss if rss is not None else peak_rss_mb()
+
+
+def peak_rss_mb():
+    # VmHWM is reset on exec, unlike ru_maxrss which a spawned child inherits on Linux
+    rss = _proc_field_mb("/proc/self/status", "VmHWM")
+    if rss is not None:
+        return rss
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def pss_mb(pid="self"):
+    """Proportional set size of a process: shared pages are split between the processes mapping them.
+
+    Summing PSS over a process group counts shared memory once; falls back to RSS.
+    """
+    pss = _proc_field_mb(f"/proc/{pid}/smaps_rollup", "Pss")
+    return pss if pss is not None else _proc_field_mb(f"/proc/{pid}/status", "VmRSS")
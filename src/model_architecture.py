@@ -4,15 +4,20 @@ from tensorflow.keras.applications import MobileNetV2 # type: ignore
 from tensorflow.keras.layers import GlobalAveragePooling2D, BatchNormalization, Dropout, Dense # type: ignore
 from tensorflow.keras.optimizers import Adam # type: ignore
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint # type: ignore
-from .config import NUM_CLASSES, IMG_SIZE, MODEL_SAVE_PATH
+from .config import NUM_CLASSES, IMG_SIZE, MODEL_SAVE_PATH, HEAD_UNITS, HEAD_DROPOUTS
 
-def create_mobilenet_model(num_classes=NUM_CLASSES, img_size=IMG_SIZE):
-    """Create MobileNetV2 model with custom classification head"""
+def create_mobilenet_model(num_classes=NUM_CLASSES, img_size=IMG_SIZE, weights='imagenet', alpha=1.0,
+                           head_units=HEAD_UNITS, head_dropouts=HEAD_DROPOUTS):
+    """Create MobileNetV2 model with custom classification head (weights=None for a random init)
+
+    alpha is the width multiplier; ImageNet weights exist for 0.35, 0.5, 0.75, 1.0, 1.3 and 1.4
+    at 96, 128, 160, 192 and 224 px.
+    """
     base_model = MobileNetV2(
-        weights='imagenet',
+        weights=weights,
         include_top=False,
         input_shape=(img_size, img_size, 3),
-        alpha=1.0
+        alpha=alpha
     )
     base_model.trainable = False  # freeze backbone initially
     print(f"MobileNetV2 base model layers: {len(base_model.layers)}")
@@ -20,18 +25,39 @@ def create_mobilenet_model(num_classes=NUM_CLASSES, img_size=IMG_SIZE):
     inputs = tf.keras.Input(shape=(img_size, img_size, 3))
     x = base_model(inputs, training=False)
     x = GlobalAveragePooling2D()(x)
+    outputs = add_classification_head(x, num_classes, head_units, head_dropouts)
+
+    model = tf.keras.Model(inputs, outputs, name='MobileNetV2_DogSkin')
+    return model, base_model
+
+
+def add_classification_head(x, num_classes=NUM_CLASSES, units=HEAD_UNITS, dropouts=HEAD_DROPOUTS):
+    """Dense classification head applied to pooled backbone features (two hidden layers, three dropouts)"""
     x = BatchNormalization()(x)
-    x = Dropout(0.2)(x)
-    x = Dense(128, activation='relu', name='dense_1')(x)
+    x = Dropout(dropouts[0])(x)
+    x = Dense(units[0], activation='relu', name='dense_1')(x)
     x = BatchNormalization()(x)
-    x = Dropout(0.15)(x)
-    x = Dense(64, activation='relu', name='dense_2')(x)
-    x = Dropout(0.1)(x)
+    x = Dropout(dropouts[1])(x)
+    x = Dense(units[1], activation='relu', name='dense_2')(x)
+    x = Dropout(dropouts[2])(x)
+    return Dense(num_classes, activation='softmax', name='predictions')(x)
 
-    outputs = Dense(num_classes, activation='softmax', name='predictions')(x)
 
-    model = tf.keras.Model(inputs, outputs, name='MobileNetV2_DogSkin')
-    return model, base_model
+def create_head_model(feature_dim, num_classes=NUM_CLASSES, units=HEAD_UNITS, dropouts=HEAD_DROPOUTS):
+    """Head-only model trained on cached pooled features (see src/feature_cache.py)"""
+    inputs = tf.keras.Input(shape=(feature_dim,))
+    outputs = add_classification_head(inputs, num_classes, units, dropouts)
+    return tf.keras.Model(inputs, outputs, name='MobileNetV2_DogSkin_head')
+
+
+def graft_head_weights(head_model, full_model):
+    """Copy trained head weights into the full model (every weighted layer outside the backbone, in order)"""
+    head_layers = [layer for layer in head_model.layers if layer.weights]
+    full_layers = [layer for layer in full_model.layers if layer.weights and not isinstance(layer, tf.keras.Model)]
+    if len(head_layers) != len(full_layers):
+        raise ValueError(f"Head has {len(head_layers)} weighted layers, full model has {len(full_layers)}")
+    for src, dst in zip(head_layers, full_layers):
+        dst.set_weights(src.get_weights())
 
 
 
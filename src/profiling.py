@@ -0,0 +1,151 @@
+"""Training performance profiler: step time, input stalls, throughput, memory and trace windows.
+
+TrainingProfiler is a Keras callback. For every training step it records the
+wall time and how much of it went into producing the batch. An ImageDataGenerator
+flow passed through `profiler.wrap()` has its batch loading timed. Steps and
+per-epoch summaries (images/sec, input share, RSS) are written next to the
+TensorBoard logs. A TF profiler trace is captured for a configurable window
+of steps, viewable in TensorBoard's Profile tab.
+"""
+import csv
+import json
+import threading
+import time
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+from .memory import current_rss_mb, peak_rss_mb
+
+
+class TrainingProfiler(tf.keras.callbacks.Callback):
+    """Per-step timing and per-epoch throughput for one training phase.
+
+    Writes <log_dir>/profile/<phase>_steps.csv (one row per step) and
+    <log_dir>/profile/<phase>_summary.json (per epoch). `trace_steps` is a
+    (first, last) pair of global step numbers to trace with the TF profiler;
+    None disables tracing. Input time is only measured for data wrapped with
+    `wrap()`; otherwise it is reported as 0 and the trace shows the input pipeline.
+    """
+
+    def __init__(self, log_dir, phase, trace_steps=None, samples=None):
+        super().__init__()
+        self.profile_dir = Path(log_dir) / "profile"
+        self.log_dir = Path(log_dir)
+        self.phase = phase
+        self.trace_steps = trace_steps
+        self.samples = samples
+        self.epochs = []
+        self._input_s = 0.0
+        self._input_images = 0
+        self._lock = threading.Lock()
+        self._global_step = 0
+        self._tracing = False
+        self._csv = None
+
+    def wrap(self, data):
+        """Time batch loading of a Keras iterator (e.g. an ImageDataGenerator flow) in place; returns it.
+
+        Re-wrapping an iterator (Phase 2 reusing Phase 1's) redirects its timings
+        to this profiler. tf.data datasets are returned unchanged.
+        """
+        if isinstance(data, tf.data.Dataset) or not hasattr(type(data), "__getitem__"):
+            return data
+        if self.samples is None:
+            self.samples = getattr(data, "samples", None)
+        data._profiler = self
+        if not getattr(type(data), "_profiled", False):
+            base = type(data)
+
+            def __getitem__(iterator, idx):
+                start = time.perf_counter()
+                batch = base.__getitem__(iterator, idx)
+                iterator._profiler._record_input(time.perf_counter() - start, len(batch[0]))
+                return batch
+
+            data.__class__ = type(f"Profiled{base.__name__}", (base,), {"__getitem__": __getitem__, "_profiled": True})
+        return data
+
+    def _record_input(self, seconds, images):
+        with self._lock:
+            self._input_s += seconds
+            self._input_images += images
+
+    def _drain_input(self):
+        with self._lock:
+            seconds, images = self._input_s, self._input_images
+            self._input_s, self._input_images = 0.0, 0
+        return seconds, images
+
+    def on_train_begin(self, logs=None):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self._csv_file = open(self.profile_dir / f"{self.phase}_steps.csv", "w", newline="")
+        self._csv = csv.writer(self._csv_file)
+        self._csv.writerow(["epoch", "step", "global_step", "step_ms", "input_ms", "compute_ms", "images"])
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._drain_input()
+        self._epoch = {"epoch": epoch + 1, "steps": [], "input": [], "images": 0, "start": time.perf_counter()}
+
+    def on_train_batch_begin(self, batch, logs=None):
+        if self.trace_steps and self._global_step == self.trace_steps[0] and not self._tracing:
+            tf.profiler.experimental.start(str(self.log_dir))
+            self._tracing = True
+        self._step_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        step_s = time.perf_counter() - self._step_start
+        # Batch loading also runs between steps (prefetch), so attribute it to the step it feeds
+        input_s, images = self._drain_input()
+        input_s = min(input_s, step_s)
+        self._epoch["steps"].append(step_s)
+        self._epoch["input"].append(input_s)
+        self._epoch["images"] += images
+        self._csv.writerow([self._epoch["epoch"], batch, self._global_step, round(step_s * 1000, 3),
+                            round(input_s * 1000, 3), round((step_s - input_s) * 1000, 3), images])
+        if self._tracing and self._global_step >= self.trace_steps[1]:
+            self._stop_trace()
+        self._global_step += 1
+
+    def _stop_trace(self):
+        tf.profiler.experimental.stop()
+        self._tracing = False
+        print(f"🔬 Profiler trace of steps {self.trace_steps[0]}-{self.trace_steps[1]} saved under {self.log_dir}")
+
+    def on_epoch_end(self, epoch, logs=None):
+        wall_s = time.perf_counter() - self._epoch["start"]
+        steps = np.array(self._epoch["steps"]) * 1000
+        input_ms = np.array(self._epoch["input"]) * 1000
+        # Unwrapped inputs do not report their batch sizes; a full epoch covers every sample once
+        images = self._epoch["images"] or self.samples or 0
+        summary = {
+            "epoch": self._epoch["epoch"],
+            "steps": len(steps),
+            "wall_s": round(wall_s, 3),
+            "images_per_sec": round(images / wall_s, 2) if wall_s > 0 else 0.0,
+            "step_ms": {"mean": float(steps.mean()), "p50": float(np.percentile(steps, 50)),
+                        "p95": float(np.percentile(steps, 95))} if len(steps) else None,
+            "input_ms_mean": float(input_ms.mean()) if len(input_ms) else 0.0,
+            "input_fraction": float(input_ms.sum() / steps.sum()) if steps.sum() > 0 else 0.0,
+            "rss_mb": round(current_rss_mb(), 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        self.epochs.append(summary)
+        self._csv_file.flush()
+        self._write_summary()
+        print(f"⏱️  {self.phase} epoch {summary['epoch']}: {summary['images_per_sec']:.1f} img/s, "
+              f"step {summary['step_ms']['mean'] if summary['step_ms'] else 0:.1f} ms "
+              f"({summary['input_fraction'] * 100:.0f}% waiting on input), RSS {summary['rss_mb']:.0f} MB")
+
+    def on_train_end(self, logs=None):
+        if self._tracing:
+            self._stop_trace()
+        if self._csv is not None:
+            self._csv_file.close()
+            self._csv = None
+        self._write_summary()
+
+    def _write_summary(self):
+        with open(self.profile_dir / f"{self.phase}_summary.json", "w") as f:
+            json.dump({"phase": self.phase, "samples": self.samples, "trace_steps": self.trace_steps,
+                       "epochs": self.epochs}, f, indent=2)
@@ -0,0 +1,305 @@
+"""Parallel hyperparameter sweep of the classification head with successive halving.
+
+Trials train only the dense head on the Phase 1 feature cache
+(src/feature_cache.py), so the backbone runs once for the whole sweep. Each
+trial samples head widths, dropout rates, learning rate and the
+ReduceLROnPlateau factor/patience from SEARCH_SPACE. Trial 0 is the current
+config, as a baseline. Trials run in a spawned process pool. Each worker pins
+TensorFlow to --threads intra-op threads and one inter-op thread, so workers x
+threads matches the cores instead of every trial competing for all of them.
+
+Successive halving: every trial trains for --min-epochs. Only the best 1/eta by
+validation accuracy continue, for eta times as many epochs, up to --max-epochs.
+Survivors pick up from their saved head and optimizer state. The ranked
+leaderboard is written to runs/sweep-<timestamp>/leaderboard.{json,csv} after
+every rung, together with the train_model --set overrides of the winner.
+
+Usage:
+    python -m src.sweep                                   # 27 trials over every core
+    python -m src.sweep --trials 54 --workers 4 --threads 2 --min-epochs 2 --max-epochs 18 --eta 3
+"""
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+import random
+import shlex
+import time
+import numpy as np
+import tensorflow as tf
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+from types import SimpleNamespace
+from tensorflow.keras.optimizers import Adam # type: ignore
+from tensorflow.keras.callbacks import ReduceLROnPlateau # type: ignore
+
+from src.checkpointing import CALLBACK_STATE
+from src.data_preprocessing import calculate_class_weights
+from src.feature_cache import build_feature_cache, load_split
+from src.model_architecture import create_mobilenet_model, create_head_model
+from src.config import (DATASET_PATH, IMG_SIZE, BATCH_SIZE, SEED, FEATURE_CACHE_VIEWS, TRAINING_RUNS_DIR, MIN_LR,
+                        HEAD_UNITS, HEAD_DROPOUTS, INITIAL_LR, REDUCE_LR_FACTOR, PATIENCE_REDUCE_LR)
+
+# Candidate values per hyperparameter; learning_rate is sampled log-uniformly between the two bounds
+SEARCH_SPACE = {
+    "units": [(64, 32), (128, 64), (256, 64), (256, 128), (512, 128)],
+    "dropouts": [(0.1, 0.1, 0.05), (0.2, 0.15, 0.1), (0.3, 0.2, 0.1), (0.5, 0.3, 0.2)],
+    "learning_rate": (1e-4, 3e-3),
+    "reduce_lr_factor": [0.2, 0.4, 0.6],
+    "reduce_lr_patience": [2, 4, 6],
+}
+
+
+def sample_trials(n, seed=SEED):
+    """Trial 0 is the configured head; the rest are drawn from SEARCH_SPACE."""
+    rng = random.Random(seed)
+    low, high = SEARCH_SPACE["learning_rate"]
+    trials = [{"units": tuple(HEAD_UNITS), "dropouts": tuple(HEAD_DROPOUTS), "learning_rate": INITIAL_LR,
+               "reduce_lr_factor": REDUCE_LR_FACTOR, "reduce_lr_patience": PATIENCE_REDUCE_LR}]
+    while len(trials) < n:
+        trials.append({
+            "units": rng.choice(SEARCH_SPACE["units"]),
+            "dropouts": rng.choice(SEARCH_SPACE["dropouts"]),
+            "learning_rate": float(f"{math.exp(rng.uniform(math.log(low), math.log(high))):.2e}"),
+            "reduce_lr_factor": rng.choice(SEARCH_SPACE["reduce_lr_factor"]),
+            "reduce_lr_patience": rng.choice(SEARCH_SPACE["reduce_lr_patience"]),
+        })
+    return [{"trial": i, "params": params} for i, params in enumerate(trials[:n])]
+
+
+def rung_budgets(min_epochs, max_epochs, eta):
+    """Cumulative epochs per rung: min_epochs * eta**k, capped by (and ending at) max_epochs."""
+    budgets = [min_epochs]
+    while budgets[-1] * eta < max_epochs:
+        budgets.append(budgets[-1] * eta)
+    if budgets[-1] < max_epochs:
+        budgets.append(max_epochs)
+    return budgets
+
+
+def _init_worker(threads):
+    # Runs before the worker's first TF op, while the thread pools can still be sized
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+class _RestoreState(tf.keras.callbacks.Callback):
+    """Put ReduceLROnPlateau progress from the previous rung back after its on_train_begin reset."""
+
+    def __init__(self, callback, state):
+        super().__init__()
+        self.callback = callback
+        self.state = state
+
+    def on_train_begin(self, logs=None):
+        for attr, value in (self.state or {}).items():
+            setattr(self.callback, attr, value)
+
+
+def run_trial(task):
+    """Train one trial's head from `initial_epoch` to `epochs`; runs in a pool worker."""
+    params = task["params"]
+    tf.keras.utils.set_random_seed(task["seed"])
+    x_train, y_train, index = load_split(task["cache_dir"], "train")
+    x_val, y_val, _ = load_split(task["cache_dir"], "valid")
+    num_classes = len(index["class_indices"])
+
+    if task["initial_epoch"] > 0:
+        head = tf.keras.models.load_model(task["path"])
+    else:
+        head = create_head_model(index["feature_dim"], num_classes, params["units"], params["dropouts"])
+        head.compile(optimizer=Adam(learning_rate=params["learning_rate"]),
+                     loss='categorical_crossentropy', metrics=['accuracy'])
+    reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=params["reduce_lr_factor"],
+                                  patience=params["reduce_lr_patience"], min_lr=MIN_LR, verbose=0)
+
+    start = time.perf_counter()
+    history = head.fit(
+        x_train,
+        tf.keras.utils.to_categorical(y_train, num_classes),
+        validation_data=(x_val, tf.keras.utils.to_categorical(y_val, num_classes)),
+        epochs=task["epochs"],
+        initial_epoch=task["initial_epoch"],
+        batch_size=task["batch_size"],
+        class_weight=task["class_weights"],
+        callbacks=[reduce_lr, _RestoreState(reduce_lr, task["reduce_lr_state"])],
+        shuffle=True,
+        verbose=0
+    )
+    seconds = time.perf_counter() - start
+    head.save(task["path"])
+    return {
+        "history": {k: [float(v) for v in values] for k, values in history.history.items()},
+        "seconds": seconds,
+        "reduce_lr_state": {attr: float(getattr(reduce_lr, attr)) for attr in CALLBACK_STATE
+                            if hasattr(reduce_lr, attr)},
+        "pid": os.getpid(),
+    }
+
+
+def rank_key(trial):
+    history = trial["history"]
+    if not history.get("val_accuracy"):
+        return (-1.0, float("inf"))
+    return (-max(history["val_accuracy"]), min(history["val_loss"]))
+
+
+def leaderboard(trials):
+    rows = []
+    for rank, trial in enumerate(sorted(trials, key=rank_key), start=1):
+        history, params = trial["history"], trial["params"]
+        val_acc = history.get("val_accuracy", [])
+        rows.append({
+            "rank": rank,
+            "trial": trial["trial"],
+            **{k: list(v) if isinstance(v, tuple) else v for k, v in params.items()},
+            "best_val_accuracy": max(val_acc) if val_acc else None,
+            "best_val_loss": min(history["val_loss"]) if val_acc else None,
+            "best_epoch": int(np.argmax(val_acc)) + 1 if val_acc else None,
+            "epochs": len(val_acc),
+            "rung": trial["rung"],
+            "seconds": round(trial["seconds"], 3),
+        })
+    return rows
+
+
+def train_model_overrides(params):
+    """The python -m src.train_model --set KEY=value overrides that reproduce a trial's head settings.
+
+    Values are raw literals; shell quoting is only applied when printing the command line.
+    """
+    return [
+        f"HEAD_UNITS={tuple(params['units'])}",
+        f"HEAD_DROPOUTS={tuple(params['dropouts'])}",
+        f"INITIAL_LR={params['learning_rate']}",
+        f"REDUCE_LR_FACTOR={params['reduce_lr_factor']}",
+        f"PATIENCE_REDUCE_LR={params['reduce_lr_patience']}",
+    ]
+
+
+def write_leaderboard(sweep_dir, trials, summary):
+    rows = leaderboard(trials)
+    best = next(t for t in trials if t["trial"] == rows[0]["trial"])
+    report = dict(summary, best_overrides=train_model_overrides(best["params"]), leaderboard=rows)
+    with open(sweep_dir / "leaderboard.json", "w") as f:
+        json.dump(report, f, indent=2)
+    with open(sweep_dir / "leaderboard.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: json.dumps(v) if isinstance(v, list) else v for k, v in row.items()})
+    return rows, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep classification-head hyperparameters with successive halving")
+    parser.add_argument("--trials", type=int, default=27)
+    parser.add_argument("--min-epochs", type=int, default=2, help="Epochs every trial gets in the first rung")
+    parser.add_argument("--max-epochs", type=int, default=18, help="Epochs of the trials that survive every rung")
+    parser.add_argument("--eta", type=int, default=3, help="Keep the best 1/eta of the trials at each rung")
+    parser.add_argument("--workers", type=int, default=None, help="Trial processes (default: CPU count / --threads)")
+    parser.add_argument("--threads", type=int, default=1, help="TensorFlow intra-op threads per worker")
+    parser.add_argument("--dataset", default=str(DATASET_PATH))
+    parser.add_argument("--views", type=int, default=FEATURE_CACHE_VIEWS, help="Cached views per training image")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default=None, help="Sweep directory (default: runs/sweep-<timestamp>)")
+    args = parser.parse_args()
+
+    workers = args.workers or max(1, (os.cpu_count() or 1) // args.threads)
+    budgets = rung_budgets(args.min_epochs, args.max_epochs, args.eta)
+    sweep_dir = Path(args.output or TRAINING_RUNS_DIR / f"sweep-{datetime.datetime.now():%Y%m%d-%H%M%S}")
+    (sweep_dir / "trials").mkdir(parents=True, exist_ok=True)
+
+    # The backbone runs once here; every trial reads the memory-mapped features
+    _, base_model = create_mobilenet_model(img_size=IMG_SIZE)
+    cache_dir = build_feature_cache(base_model, Path(args.dataset), IMG_SIZE, args.views, args.seed)
+    _, y_train, index = load_split(cache_dir, "train")
+    class_weights = calculate_class_weights(SimpleNamespace(classes=y_train, class_indices=index["class_indices"]))
+    del base_model
+
+    trials = [dict(t, history={}, seconds=0.0, rung=0, reduce_lr_state=None) for t in sample_trials(args.trials, args.seed)]
+    print("=" * 70)
+    print(f"🔍 HEAD SWEEP: {len(trials)} trials, rungs at {budgets} epochs, "
+          f"{workers} workers x {args.threads} threads")
+    print("=" * 70)
+
+    summary = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "cache_dir": str(cache_dir),
+        "trials": len(trials),
+        "budgets": budgets,
+        "eta": args.eta,
+        "workers": workers,
+        "threads_per_worker": args.threads,
+    }
+    alive = trials
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                             initializer=_init_worker, initargs=(args.threads,)) as pool:
+        for rung, budget in enumerate(budgets):
+            futures = {}
+            for trial in alive:
+                task = {
+                    "params": trial["params"],
+                    "seed": args.seed + trial["trial"],
+                    "cache_dir": str(cache_dir),
+                    "path": str(sweep_dir / "trials" / f"trial_{trial['trial']:03d}.keras"),
+                    "initial_epoch": len(trial["history"].get("val_accuracy", [])),
+                    "epochs": budget,
+                    "batch_size": args.batch_size,
+                    "class_weights": class_weights,
+                    "reduce_lr_state": trial["reduce_lr_state"],
+                }
+                futures[pool.submit(run_trial, task)] = trial
+            for future in as_completed(futures):
+                trial, result = futures[future], future.result()
+                for key, values in result["history"].items():
+                    trial["history"].setdefault(key, []).extend(values)
+                trial["seconds"] += result["seconds"]
+                trial["reduce_lr_state"] = result["reduce_lr_state"]
+                trial["rung"] = rung
+                print(f"  rung {rung} trial {trial['trial']:>3}: val_acc {max(trial['history']['val_accuracy']):.4f} "
+                      f"after {budget} epochs ({result['seconds']:.1f}s, pid {result['pid']})")
+
+            alive = sorted(alive, key=rank_key)
+            if rung < len(budgets) - 1:
+                keep = max(1, len(alive) // args.eta)
+                print(f"✂️  Rung {rung}: keeping {keep} of {len(alive)} trials")
+                alive = alive[:keep]
+            summary["wall_seconds"] = round(time.perf_counter() - start, 3)
+            write_leaderboard(sweep_dir, trials, summary)
+
+    # What the same trials would have cost run one after another, with and without pruning
+    trial_seconds = sum(t["seconds"] for t in trials)
+    epochs_trained = sum(len(t["history"].get("val_accuracy", [])) for t in trials)
+    full_seconds = trial_seconds / max(epochs_trained, 1) * len(trials) * budgets[-1]
+    summary.update(
+        wall_seconds=round(time.perf_counter() - start, 3),
+        serial_seconds=round(trial_seconds, 3),
+        epochs_trained=epochs_trained,
+        full_budget_epochs=len(trials) * budgets[-1],
+        estimated_full_serial_seconds=round(full_seconds, 3),
+    )
+    rows, report = write_leaderboard(sweep_dir, trials, summary)
+
+    print("\n" + "=" * 70)
+    print(f"{'rank':>4} {'trial':>5} {'units':>10} {'dropouts':>16} {'lr':>9} {'factor':>6} {'pat':>3} "
+          f"{'val_acc':>8} {'epochs':>6}")
+    for row in rows[:10]:
+        print(f"{row['rank']:>4} {row['trial']:>5} {str(tuple(row['units'])):>10} {str(tuple(row['dropouts'])):>16} "
+              f"{row['learning_rate']:>9.2e} {row['reduce_lr_factor']:>6} {row['reduce_lr_patience']:>3} "
+              f"{row['best_val_accuracy']:>8.4f} {row['epochs']:>6}")
+    wall = summary["wall_seconds"]
+    print(f"\n⏱️  Wall time {wall:.1f}s; trials one after another: {summary['serial_seconds']:.1f}s "
+          f"(x{summary['serial_seconds'] / wall:.1f}), every trial to {budgets[-1]} epochs serially: "
+          f"~{full_seconds:.1f}s (x{full_seconds / wall:.1f})")
+    print("🏆 Best head: python -m src.train_model " + " ".join(f"--set {shlex.quote(o)}" for o in report["best_overrides"]))
+    print(f"📝 Leaderboard: {sweep_dir / 'leaderboard.json'}")
+
+
+if __name__ == "__main__":
+    main()
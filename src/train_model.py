@@ -1,163 +1,210 @@
+"""Two-phase MobileNetV2 training as a non-interactive, resumable CLI.
+
+Phase 1 trains the classification head on a frozen backbone. Phase 2 gently
+fine-tunes the top FINE_TUNE_FRACTION of the backbone and is kept only if it
+does not cost more than 0.5% validation accuracy. --phase2 decides whether
+Phase 2 runs; `auto` skips it once Phase 1 reaches PHASE2_SKIP_ABOVE. The
+training values of src/config.py can be overridden with --set KEY=VALUE.
+
+Every run keeps a manifest and checkpoints under runs/<name>/ (see
+src/checkpointing.py): model, optimizer, epoch and learning-rate schedule state
+every CHECKPOINT_EVERY epochs, plus per-phase timings. After a crash or SIGTERM
+(exit status 143), --resume continues from the last checkpoint in either phase.
+
+Usage:
+    python -m src.train_model
+    python -m src.train_model --run-dir runs/spot-01 --set BATCH_SIZE=32 --set EPOCHS_PHASE1=30 --phase2 yes
+    python -m src.train_model --resume                          # latest unfinished run
+    python -m src.train_model --resume --run-dir runs/spot-01
+"""
+import argparse
+import ast
+import datetime
 import os
+import shutil
+import sys
+import time
 import numpy as np
-import datetime
-import matplotlib.pyplot as plt
 import tensorflow as tf
+from pathlib import Path
 from tensorflow.keras.optimizers import Adam # type: ignore
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint, TensorBoard # type: ignore
 
 # Import from src
+from src import config
+from src.checkpointing import TrainingRun, RunCheckpoint, TrainingPreempted, EXIT_PREEMPTED
 from src.data_preprocessing import create_data_generators, calculate_class_weights
 from src.model_architecture import create_mobilenet_model
-from src.config import MODEL_SAVE_PATH, TENSORBOARD_LOG_DIR
-
-
-# DATA PREPARATION
-
-train_gen, val_gen, test_gen = create_data_generators()
-class_weights = calculate_class_weights(train_gen)
-
+from src.profiling import TrainingProfiler
+from src.config import MODEL_SAVE_PATH, TENSORBOARD_LOG_DIR, TRAINING_RUNS_DIR
+
+# Config values a run can override with --set; they are recorded in the run manifest
+OVERRIDABLE = (
+    "DATASET_PATH", "IMG_SIZE", "BATCH_SIZE", "SEED", "DATA_BACKEND",
+    "PHASE1_FEATURE_CACHE", "FEATURE_CACHE_VIEWS", "PROFILE_TRAINING", "PROFILE_TRACE_STEPS",
+    "HEAD_UNITS", "HEAD_DROPOUTS", "INITIAL_LR", "PATIENCE_EARLY_STOP", "PATIENCE_REDUCE_LR", "REDUCE_LR_FACTOR",
+    "MIN_LR", "EPOCHS_PHASE1", "EPOCHS_PHASE2", "FINE_TUNE_FRACTION", "FINE_TUNE_LR", "PHASE2_SKIP_ABOVE",
+    "CHECKPOINT_EVERY",
+)
 
-# MODEL CREATION
 
-model, base_model = create_mobilenet_model()
+def parse_overrides(pairs):
+    """Parse KEY=VALUE pairs into config values (Python literals, otherwise strings)."""
+    overrides = {}
+    for pair in pairs:
+        key, sep, text = pair.partition("=")
+        key = key.strip().upper()
+        if not sep or key not in OVERRIDABLE:
+            raise ValueError(f"Cannot override {pair!r}; expected KEY=VALUE with KEY in {', '.join(OVERRIDABLE)}")
+        if isinstance(getattr(config, key), Path):
+            overrides[key] = text
+            continue
+        try:
+            overrides[key] = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            overrides[key] = text
+    return overrides
 
-#  PHASE 1: Train with frozen MobileNetV2 base model
 
-print("=" * 60)
-print("PHASE 1: Training with frozen MobileNetV2 base model")
-print("=" * 60)
-
-initial_learning_rate = 0.001
-model.compile(
-    optimizer=Adam(learning_rate=initial_learning_rate),
-    loss='categorical_crossentropy',
-    metrics=[
-        'accuracy',
-        tf.keras.metrics.TopKCategoricalAccuracy(k=2, name='top_2_accuracy')
-    ]
-)
-print("✅ Model compiled successfully!")
+def default_config():
+    return {key: str(value) if isinstance(value, Path) else value
+            for key, value in ((key, getattr(config, key)) for key in OVERRIDABLE)}
 
-# TensorBoard setup
-log_dir = TENSORBOARD_LOG_DIR / datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-tensorboard_callback = TensorBoard(log_dir=log_dir, histogram_freq=1)
 
-# Callbacks for phase 1
-callbacks_phase1 = [
-    tensorboard_callback,
-    EarlyStopping(
-        monitor='val_accuracy',
-        patience=12,
-        restore_best_weights=True,
-        verbose=1
-    ),
-    ReduceLROnPlateau(
-        monitor='val_loss',
-        factor=0.4,
-        patience=4,
-        min_lr=1e-7,
-        verbose=1
-    ),
-    ModelCheckpoint(
-        os.path.join(MODEL_SAVE_PATH, "best_mobilenet_phase1.h5"),
-        monitor='val_accuracy',
-        save_best_only=True,
-        verbose=1
+def compile_model(model, learning_rate):
+    model.compile(
+        optimizer=Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=[
+            'accuracy',
+            tf.keras.metrics.TopKCategoricalAccuracy(k=2, name='top_2_accuracy')
+        ]
     )
-]
-
-EPOCHS_PHASE1 = 20
-
-# Train model (Phase 1)
-history_phase1 = model.fit(
-    train_gen,
-    epochs=EPOCHS_PHASE1,
-    validation_data=val_gen,
-    class_weight=class_weights,
-    callbacks=callbacks_phase1,
-    verbose=1
-)
 
-print("✅ Phase 1 training completed!")
 
+def find_backbone(model):
+    """The nested MobileNetV2 of a model built by create_mobilenet_model (or loaded from a checkpoint)."""
+    return next(layer for layer in model.layers if isinstance(layer, tf.keras.Model))
 
-#  PHASE 1 RESULTS
 
-def plot_training_history(history, phase_name):
-    """Plot training history"""
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
+def make_profiler(run, cfg, log_dir, phase):
+    if not cfg["PROFILE_TRAINING"]:
+        return None
+    # A resumed attempt writes its own step CSV and summary next to the earlier ones
+    attempt = len(run.manifest["attempts"])
+    label = phase if attempt == 1 else f"{phase}-attempt{attempt}"
+    return TrainingProfiler(log_dir, label, cfg["PROFILE_TRACE_STEPS"])
 
-    # Accuracy
-    ax1.plot(history.history['accuracy'], label='Training Accuracy', linewidth=2)
-    ax1.plot(history.history['val_accuracy'], label='Validation Accuracy', linewidth=2)
-    ax1.set_title(f'{phase_name} - Model Accuracy')
-    ax1.set_xlabel('Epoch')
-    ax1.set_ylabel('Accuracy')
-    ax1.legend()
-    ax1.grid(True, alpha=0.3)
 
-    # Loss
-    ax2.plot(history.history['loss'], label='Training Loss', linewidth=2)
-    ax2.plot(history.history['val_loss'], label='Validation Loss', linewidth=2)
-    ax2.set_title(f'{phase_name} - Model Loss')
-    ax2.set_xlabel('Epoch')
-    ax2.set_ylabel('Loss')
-    ax2.legend()
-    ax2.grid(True, alpha=0.3)
-
-    plt.tight_layout()
-    plt.show()
-
-    # Print best metrics
-    best_val_acc = max(history.history['val_accuracy'])
-    best_val_loss = min(history.history['val_loss'])
-    print(f"🏆 Best validation accuracy: {best_val_acc:.4f}")
-    print(f"📉 Best validation loss: {best_val_loss:.4f}")
-
-plot_training_history(history_phase1, "Phase 1 - MobileNetV2")
+def phase_done(run, phase, epochs):
+    state = run.state
+    return state["phase"] == phase and (state["stopped"] or state["epoch"] >= epochs)
 
 
+#  PHASE 1: Train with frozen MobileNetV2 base model
 
-#  PHASE 2: Fine-Tuning MobileNetV2 
+def train_phase1(run, cfg, model, base_model, train_gen, val_gen, class_weights, log_dir):
+    print("=" * 60)
+    print("PHASE 1: Training with frozen MobileNetV2 base model")
+    print("=" * 60)
 
+    early_stopping = EarlyStopping(
+        monitor='val_accuracy',
+        patience=cfg["PATIENCE_EARLY_STOP"],
+        restore_best_weights=True,
+        verbose=1
+    )
+    reduce_lr = ReduceLROnPlateau(
+        monitor='val_loss',
+        factor=cfg["REDUCE_LR_FACTOR"],
+        patience=cfg["PATIENCE_REDUCE_LR"],
+        min_lr=cfg["MIN_LR"],
+        verbose=1
+    )
+    callbacks = [TensorBoard(log_dir=log_dir, histogram_freq=1), early_stopping, reduce_lr]
+
+    # Step timings, input stalls, images/sec and RSS are written to <log_dir>/profile/
+    profiler = make_profiler(run, cfg, log_dir, "phase1")
+    if profiler is not None:
+        callbacks.append(profiler)
+
+    best_path = os.path.join(MODEL_SAVE_PATH, "best_mobilenet_phase1.h5")
+    if cfg["PHASE1_FEATURE_CACHE"]:
+        # Backbone is frozen: run it once per image, train only the head, graft it back.
+        # The head fit is short, so it is checkpointed as a whole rather than per epoch.
+        from src.feature_cache import train_head_on_cached_features
+        if profiler is not None:
+            profiler.samples = train_gen.samples * cfg["FEATURE_CACHE_VIEWS"]
+        start = time.perf_counter()
+        history = train_head_on_cached_features(
+            model,
+            base_model,
+            epochs=cfg["EPOCHS_PHASE1"],
+            class_weights=class_weights,
+            callbacks=callbacks,
+            learning_rate=cfg["INITIAL_LR"],
+            dataset_path=Path(cfg["DATASET_PATH"]),
+            img_size=cfg["IMG_SIZE"],
+            views=cfg["FEATURE_CACHE_VIEWS"],
+            seed=cfg["SEED"],
+            batch_size=cfg["BATCH_SIZE"],
+            head_units=cfg["HEAD_UNITS"],
+            head_dropouts=cfg["HEAD_DROPOUTS"]
+        )
+        phase = run.phase("phase1")
+        phase["epochs"] = [{"epoch": epoch + 1, **{k: float(v[i]) for k, v in history.history.items()}}
+                           for i, epoch in enumerate(history.epoch)]
+        phase["seconds"] = round(time.perf_counter() - start, 3)
+        model.save(best_path)
+        run.checkpoint(model, "phase1", len(history.epoch), stopped=True)
+    else:
+        if profiler is not None:
+            train_gen = profiler.wrap(train_gen)
+        callbacks.append(
+            ModelCheckpoint(
+                best_path,
+                monitor='val_accuracy',
+                save_best_only=True,
+                initial_value_threshold=run.best("phase1"),
+                verbose=1
+            )
+        )
+        # Last: it restores EarlyStopping / ReduceLROnPlateau state after their on_train_begin resets,
+        # and writes the end-of-phase checkpoint after EarlyStopping has restored the best weights
+        callbacks.append(RunCheckpoint(run, "phase1", cfg["CHECKPOINT_EVERY"], stateful=[early_stopping, reduce_lr]))
+        model.fit(
+            train_gen,
+            epochs=cfg["EPOCHS_PHASE1"],
+            initial_epoch=run.state["epoch"],
+            validation_data=val_gen,
+            class_weight=class_weights,
+            callbacks=callbacks,
+            verbose=1
+        )
 
-print("=" * 60)
-print("PHASE 2: Ultra-Gentle Fine-Tuning of MobileNetV2")
-print("=" * 60)
+    run.phase("phase1")["finished"] = datetime.datetime.now().isoformat(timespec="seconds")
+    run.save()
+    print("✅ Phase 1 training completed!")
 
-# --- Baseline Performance Reference from Phase 1 ---
-phase1_best_val_acc = max(history_phase1.history['val_accuracy'])
-phase1_best_epoch = history_phase1.history['val_accuracy'].index(phase1_best_val_acc) + 1
 
-print(f"📊 Baseline from Phase 1:")
-print(f"   Best Validation Accuracy: {phase1_best_val_acc:.4f} (Epoch {phase1_best_epoch})")
-print(f"   This is our minimum acceptable performance threshold\n")
+#  PHASE 2: Fine-Tuning MobileNetV2
 
-# Optional confirmation
-proceed = input("Proceed with ultra-gentle fine-tuning? (y/n): ").lower()
-if proceed != 'y':
-    print("\n✅ Skipping Phase 2 — using Phase 1 model as final.")
-    import shutil
-    shutil.copy(
-        os.path.join(MODEL_SAVE_PATH, 'best_mobilenet_phase1.h5'),
-        os.path.join(MODEL_SAVE_PATH, 'pawscan_final.h5')
-    )
-    print("   Saved as: pawscan_final.h5")
-else:
-    print("\n🔬 Starting ultra-gentle fine-tuning...")
+def decide_phase2(policy, phase1_best, skip_above):
+    if policy == "yes":
+        return True
+    if policy == "no":
+        return False
+    return phase1_best is None or phase1_best < skip_above
 
-   
-    # STEP 1: VERY CONSERVATIVE LAYER UNFREEZING
 
+def unfreeze_top_layers(model, base_model, fraction):
     base_model.trainable = True
     total_layers = len(base_model.layers)
-    unfreeze_percentage = 0.05  # Only 5% of layers
-    fine_tune_at = int(total_layers * (1 - unfreeze_percentage))
+    fine_tune_at = int(total_layers * (1 - fraction))
 
     print(f"Total MobileNetV2 layers: {total_layers}")
     print(f"Freezing {fine_tune_at} layers ({(fine_tune_at/total_layers)*100:.1f}%)")
-    print(f"Unfreezing {total_layers - fine_tune_at} layers ({unfreeze_percentage*100:.1f}%)\n")
+    print(f"Unfreezing {total_layers - fine_tune_at} layers ({fraction*100:.1f}%)\n")
 
     for layer in base_model.layers[:fine_tune_at]:
         layer.trainable = False
@@ -169,138 +216,124 @@ else:
     print(f"Trainable parameters: {trainable_params:,} ({(trainable_params/total_params)*100:.2f}%)")
     print(f"Frozen parameters: {non_trainable_params:,} ({(non_trainable_params/total_params)*100:.2f}%)")
 
-  
-    # STEP 2: ULTRA-LOW LEARNING RATE
-   
-    fine_tune_learning_rate = 1e-6  # 10x lower than before
-    print(f"\nLearning rate set to {fine_tune_learning_rate} for minimal disruption.\n")
 
-    model.compile(
-        optimizer=Adam(learning_rate=fine_tune_learning_rate),
-        loss='categorical_crossentropy',
-        metrics=[
-            'accuracy',
-            tf.keras.metrics.TopKCategoricalAccuracy(k=2, name='top_2_accuracy')
-        ]
-    )
+def train_phase2(run, cfg, model, train_gen, val_gen, class_weights, log_dir):
+    print("=" * 60)
+    print("PHASE 2: Ultra-Gentle Fine-Tuning of MobileNetV2")
+    print("=" * 60)
 
-    
-    # STEP 3: PROTECTIVE CALLBACKS
-  
-    callbacks_phase2 = [
-        EarlyStopping(
-            monitor='val_accuracy',
-            patience=12,
-            restore_best_weights=True,
-            mode='max',
-            baseline=phase1_best_val_acc,
-            verbose=1
-        ),
-        ReduceLROnPlateau(
-            monitor='val_loss',
-            factor=0.7,
-            patience=5,
-            min_lr=1e-9,
-            verbose=1
-        ),
+    phase1_best_val_acc = run.best("phase1")
+    phase1_epochs = len(run.manifest["phases"]["phase1"]["epochs"])
+
+    if run.state["phase"] == "phase1":
+        print("\n🔬 Starting ultra-gentle fine-tuning...")
+        unfreeze_top_layers(model, find_backbone(model), cfg["FINE_TUNE_FRACTION"])
+        print(f"\nLearning rate set to {cfg['FINE_TUNE_LR']} for minimal disruption.\n")
+        compile_model(model, cfg["FINE_TUNE_LR"])
+        # Phase 2 resumes from here even if it is interrupted before its first epoch ends
+        run.checkpoint(model, "phase2", phase1_epochs)
+
+    early_stopping = EarlyStopping(
+        monitor='val_accuracy',
+        patience=cfg["PATIENCE_EARLY_STOP"],
+        restore_best_weights=True,
+        mode='max',
+        baseline=phase1_best_val_acc,
+        verbose=1
+    )
+    reduce_lr = ReduceLROnPlateau(
+        monitor='val_loss',
+        factor=0.7,
+        patience=5,
+        min_lr=1e-9,
+        verbose=1
+    )
+    callbacks = [
+        early_stopping,
+        reduce_lr,
         ModelCheckpoint(
             os.path.join(MODEL_SAVE_PATH, 'best_mobilenet_phase2.h5'),
             monitor='val_accuracy',
             save_best_only=True,
             mode='max',
+            initial_value_threshold=run.best("phase2"),
             verbose=1
         )
     ]
 
+    profiler = make_profiler(run, cfg, log_dir, "phase2")
+    if profiler is not None:
+        callbacks.append(profiler)
+        train_gen = profiler.wrap(train_gen)
+    callbacks.append(RunCheckpoint(run, "phase2", cfg["CHECKPOINT_EVERY"], stateful=[early_stopping, reduce_lr]))
+
     print("🛡️  EarlyStopping baseline set to Phase 1 best accuracy.")
     print("🧠  Gentle ReduceLROnPlateau for gradual adaptation.\n")
 
-   
-    # STEP 4: EXTENDED TRAINING CONFIGURATION
-    
-    EPOCHS_PHASE2 = 20
-    TOTAL_EPOCHS = EPOCHS_PHASE1 + EPOCHS_PHASE2
-
-    print(f"Training for {EPOCHS_PHASE2} fine-tuning epochs.")
-    print(f"Total epochs including Phase 1: {TOTAL_EPOCHS}")
+    total_epochs = phase1_epochs + cfg["EPOCHS_PHASE2"]
+    print(f"Training for {cfg['EPOCHS_PHASE2']} fine-tuning epochs.")
+    print(f"Total epochs including Phase 1: {total_epochs}")
     print("=" * 60)
 
-    history_phase2 = model.fit(
+    model.fit(
         train_gen,
-        epochs=TOTAL_EPOCHS,
-        initial_epoch=history_phase1.epoch[-1] + 1,
+        epochs=total_epochs,
+        initial_epoch=run.state["epoch"],
         validation_data=val_gen,
         class_weight=class_weights,
-        callbacks=callbacks_phase2,
+        callbacks=callbacks,
         verbose=1
     )
 
+    run.phase("phase2")["finished"] = datetime.datetime.now().isoformat(timespec="seconds")
+    run.save()
     print("✅ Phase 2 fine-tuning completed.\n")
 
-   
-    # STEP 5: PERFORMANCE COMPARISON
-    
-    phase2_best_val_acc = max(history_phase2.history['val_accuracy'])
-    improvement = (phase2_best_val_acc - phase1_best_val_acc) * 100
-
-    print(f"Phase 1 best val acc: {phase1_best_val_acc:.4f}")
-    print(f"Phase 2 best val acc: {phase2_best_val_acc:.4f}")
-    print(f"Change: {improvement:+.2f}%")
-
-    if improvement < -0.5:
-        print("❌ Phase 2 decreased performance. Reverting to Phase 1 model.")
-        use_phase2 = False
-    else:
-        print("✅ Phase 2 maintained or improved performance.")
-        use_phase2 = True
-
-  
-    # STEP 6: SELECT FINAL MODEL
- 
-    import shutil
-    if use_phase2:
-        final_source = 'best_mobilenet_phase2.h5'
-        final_acc = phase2_best_val_acc
-    else:
-        final_source = 'best_mobilenet_phase1.h5'
-        final_acc = phase1_best_val_acc
 
-    shutil.copy(
-        os.path.join(MODEL_SAVE_PATH, final_source),
-        os.path.join(MODEL_SAVE_PATH, 'pawscan_final.h5')
-    )
+def select_final_model(run):
+    """Copy the better phase's best checkpoint to pawscan_final.h5 and record it in the manifest."""
+    phase1_best_val_acc = run.best("phase1")
+    phase2_best_val_acc = run.best("phase2") if run.state["phase2"] else None
+
+    use_phase2 = False
+    if phase2_best_val_acc is not None:
+        improvement = (phase2_best_val_acc - phase1_best_val_acc) * 100
+        print(f"Phase 1 best val acc: {phase1_best_val_acc:.4f}")
+        print(f"Phase 2 best val acc: {phase2_best_val_acc:.4f}")
+        print(f"Change: {improvement:+.2f}%")
+        if improvement < -0.5:
+            print("❌ Phase 2 decreased performance. Reverting to Phase 1 model.")
+        else:
+            print("✅ Phase 2 maintained or improved performance.")
+            use_phase2 = True
+
+    final_source = 'best_mobilenet_phase2.h5' if use_phase2 else 'best_mobilenet_phase1.h5'
+    final_acc = phase2_best_val_acc if use_phase2 else phase1_best_val_acc
+    final_path = os.path.join(MODEL_SAVE_PATH, 'pawscan_final.h5')
+    shutil.copy(os.path.join(MODEL_SAVE_PATH, final_source), final_path)
     print(f"💾 Final model: {final_source}")
     print(f"   Validation Accuracy: {final_acc:.4f}")
     print(f"   Saved as: pawscan_final.h5\n")
 
+    run.manifest["final"] = {"source": final_source, "val_accuracy": final_acc, "path": final_path}
+    run.state["phase"] = "done"
+    run.save()
 
-# STEP 7: COMBINE HISTORIES AND PLOT
-
-def combine_histories(hist1, hist2):
-    combined_history = {}
-    for key in hist1.history.keys():
-        combined_history[key] = hist1.history[key] + hist2.history[key]
-    return combined_history
-
-if 'history_phase2' in locals():
-    combined_history_dict = combine_histories(history_phase1, history_phase2)
-else:
-    combined_history_dict = history_phase1.history
-
-class CombinedHistory:
-    def __init__(self, history_dict):
-        self.history = history_dict
 
-combined_history = CombinedHistory(combined_history_dict)
+def plot_history(history, phase1_epochs, output_path):
+    """Save accuracy and loss curves of the whole run to output_path (headless)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
 
-def plot_combined_history(combined_history, phase1_epochs):
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 5))
-    epochs = range(1, len(combined_history.history['accuracy']) + 1)
+    epochs = range(1, len(history['accuracy']) + 1)
 
     # Accuracy
-    ax1.plot(epochs, combined_history.history['accuracy'], 'b-', label='Training Accuracy', linewidth=2)
-    ax1.plot(epochs, combined_history.history['val_accuracy'], 'r-', label='Validation Accuracy', linewidth=2)
-    ax1.axvline(x=phase1_epochs, color='gray', linestyle='--', alpha=0.7, label='Fine-tuning starts')
+    ax1.plot(epochs, history['accuracy'], 'b-', label='Training Accuracy', linewidth=2)
+    ax1.plot(epochs, history['val_accuracy'], 'r-', label='Validation Accuracy', linewidth=2)
+    if len(history['accuracy']) > phase1_epochs:
+        ax1.axvline(x=phase1_epochs, color='gray', linestyle='--', alpha=0.7, label='Fine-tuning starts')
     ax1.set_title('Complete Training History - Accuracy')
     ax1.set_xlabel('Epoch')
     ax1.set_ylabel('Accuracy')
@@ -308,9 +341,10 @@ def plot_combined_history(combined_history, phase1_epochs):
     ax1.grid(True, alpha=0.3)
 
     # Loss
-    ax2.plot(epochs, combined_history.history['loss'], 'b-', label='Training Loss', linewidth=2)
-    ax2.plot(epochs, combined_history.history['val_loss'], 'r-', label='Validation Loss', linewidth=2)
-    ax2.axvline(x=phase1_epochs, color='gray', linestyle='--', alpha=0.7, label='Fine-tuning starts')
+    ax2.plot(epochs, history['loss'], 'b-', label='Training Loss', linewidth=2)
+    ax2.plot(epochs, history['val_loss'], 'r-', label='Validation Loss', linewidth=2)
+    if len(history['loss']) > phase1_epochs:
+        ax2.axvline(x=phase1_epochs, color='gray', linestyle='--', alpha=0.7, label='Fine-tuning starts')
     ax2.set_title('Complete Training History - Loss')
     ax2.set_xlabel('Epoch')
     ax2.set_ylabel('Loss')
@@ -318,11 +352,116 @@ def plot_combined_history(combined_history, phase1_epochs):
     ax2.grid(True, alpha=0.3)
 
     plt.tight_layout()
-    plt.show()
+    plt.savefig(output_path, dpi=150)
+    plt.close(fig)
 
-    print(f"\nFinal training accuracy: {combined_history.history['accuracy'][-1]:.4f}")
-    print(f"Final validation accuracy: {combined_history.history['val_accuracy'][-1]:.4f}")
-    print(f"Best validation accuracy: {max(combined_history.history['val_accuracy']):.4f}")
+    print(f"\nFinal training accuracy: {history['accuracy'][-1]:.4f}")
+    print(f"Final validation accuracy: {history['val_accuracy'][-1]:.4f}")
+    print(f"Best validation accuracy: {max(history['val_accuracy']):.4f}")
 
-plot_combined_history(combined_history, EPOCHS_PHASE1)
-print("\n✅ Phase 2 pipeline complete.")
+
+def train(run, policy):
+    cfg = run.manifest["config"]
+    log_dir = TENSORBOARD_LOG_DIR / run.manifest["name"]
+
+    # DATA PREPARATION
+    train_gen, val_gen, _ = create_data_generators(
+        Path(cfg["DATASET_PATH"]), cfg["IMG_SIZE"], cfg["BATCH_SIZE"], cfg["DATA_BACKEND"]
+    )
+    class_weights = calculate_class_weights(train_gen)
+
+    # MODEL CREATION (or the last checkpoint, with its optimizer state)
+    if run.state["checkpoint"] is None:
+        model, base_model = create_mobilenet_model(img_size=cfg["IMG_SIZE"], head_units=cfg["HEAD_UNITS"],
+                                                   head_dropouts=cfg["HEAD_DROPOUTS"])
+        compile_model(model, cfg["INITIAL_LR"])
+        print("✅ Model compiled successfully!")
+    else:
+        model = run.load_model()
+        base_model = find_backbone(model)
+    run.setup_done()
+
+    if run.state["phase"] == "phase1" and not phase_done(run, "phase1", cfg["EPOCHS_PHASE1"]):
+        train_phase1(run, cfg, model, base_model, train_gen, val_gen, class_weights, log_dir)
+
+    phase1_best_val_acc = run.best("phase1")
+    if run.state["phase2"] is None:
+        print(f"📊 Baseline from Phase 1:")
+        print(f"   Best Validation Accuracy: {phase1_best_val_acc:.4f}")
+        run.state["phase2"] = cfg["EPOCHS_PHASE2"] > 0 and decide_phase2(
+            policy, phase1_best_val_acc, cfg["PHASE2_SKIP_ABOVE"])
+        run.save()
+        if not run.state["phase2"]:
+            print(f"\n✅ Skipping Phase 2 (--phase2 {policy}) — using Phase 1 model as final.")
+
+    if run.state["phase2"] and not phase_done(run, "phase2", len(run.history("phase1")["val_accuracy"]) + cfg["EPOCHS_PHASE2"]):
+        train_phase2(run, cfg, model, train_gen, val_gen, class_weights, log_dir)
+
+    select_final_model(run)
+
+    # COMBINE HISTORIES AND PLOT
+    history = run.history("phase1")
+    for key, values in run.history("phase2").items():
+        history[key] = history.get(key, []) + values
+    plot_path = run.dir / "training_history.png"
+    plot_history(history, len(run.history("phase1")["val_accuracy"]), plot_path)
+    print(f"🖼️  Training curves saved to: {plot_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train PawScan (two phases), checkpointed and resumable")
+    parser.add_argument("--run-dir", default=None,
+                        help="Run directory (default: runs/<timestamp>, or the latest unfinished run with --resume)")
+    parser.add_argument("--resume", action="store_true", help="Continue the run from its last checkpoint")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a src/config.py value, e.g. --set BATCH_SIZE=32 (repeatable)")
+    parser.add_argument("--phase2", choices=("auto", "yes", "no"), default=None,
+                        help="Run Phase 2 fine-tuning; auto skips it above PHASE2_SKIP_ABOVE (default: auto)")
+    parser.add_argument("--checkpoint-every", type=int, default=None, help="Epochs between checkpoints")
+    args = parser.parse_args()
+
+    try:
+        overrides = parse_overrides(args.overrides)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.checkpoint_every is not None:
+        overrides["CHECKPOINT_EVERY"] = args.checkpoint_every
+
+    if args.resume:
+        run_dir = args.run_dir or TrainingRun.latest(TRAINING_RUNS_DIR)
+        if run_dir is None or not (Path(run_dir) / "run.json").exists():
+            parser.error(f"No run to resume in {run_dir or TRAINING_RUNS_DIR}")
+        run = TrainingRun.open(run_dir)
+        if run.state["phase"] == "done":
+            print(f"✅ Run {run.dir} is already complete: {run.manifest['final']['path']}")
+            return
+        # Overrides given on resume (e.g. more epochs) apply from here on
+        run.manifest["config"].update(overrides)
+        run.manifest["overrides"].update(overrides)
+        if args.phase2 is not None:
+            run.manifest["phase2_policy"] = args.phase2
+    else:
+        run_dir = args.run_dir or TRAINING_RUNS_DIR / datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        cfg = default_config()
+        cfg.update(overrides)
+        run = TrainingRun.create(run_dir, cfg, overrides, args.phase2 or "auto")
+    print(f"📁 Run directory: {run.dir}")
+
+    run.install_signal_handler()
+    run.start_attempt()
+    try:
+        train(run, run.manifest["phase2_policy"])
+    except TrainingPreempted as exc:
+        print(f"\n⏸️  {exc}. Continue with: python -m src.train_model --resume --run-dir {run.dir}")
+        run.end_attempt("preempted")
+        sys.exit(EXIT_PREEMPTED)
+    except BaseException:
+        run.end_attempt("failed")
+        raise
+    run.end_attempt("done")
+    print("\n✅ Training pipeline complete.")
+    print(f"📝 Run manifest: {run.dir / 'run.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import io
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import api.main as api_main
+from api.executors import BoundedExecutor
+
+LABELS = ["a", "b", "c", "d", "e", "f"]
+
+
+class FakeModel:
+    """Backend stand-in: records every batch and scores images by mean brightness.
+
+    `scale` is the input range the model expects (255 for uint8 pixels, 1 for [0, 1] floats).
+    """
+
+    def __init__(self, scale=255.0, input_size=224):
+        self.scale = scale
+        self.input_size = input_size
+        self.batches = []
+
+    def predict(self, x):
+        self.batches.append(np.array(x))
+        v = x.reshape(len(x), -1).astype("float32").mean(1) / self.scale
+        return np.stack([v, 1 - v] + [np.zeros_like(v)] * (len(LABELS) - 2), 1)
+
+
+def jpeg_bytes(width=224, height=224, seed=0, quality=95):
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(blocks, "RGB").resize((width, height), Image.BICUBIC).save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def api_client(monkeypatch, tmp_path):
+    """Start api.main with a fake backend; call it with the model and any module settings to override."""
+    clients = []
+
+    def start(model, **settings):
+        model_path = tmp_path / "model.h5"
+        model_path.write_bytes(b"weights")
+        labels_path = tmp_path / "labels.txt"
+        labels_path.write_text("\n".join(LABELS))
+        config = dict(MODEL_PATH=str(model_path), LABELS_PATH=str(labels_path), JOBS_DIR=str(tmp_path / "jobs"),
+                      CACHE_MAX_ENTRIES=0, CACHE_DIR=None, GOLDEN_SET_PATH=None, MODEL_WATCH_INTERVAL=0)
+        config.update(settings)
+        for name, value in config.items():
+            monkeypatch.setattr(api_main, name, value)
+        monkeypatch.setattr(api_main, "import_runtime", lambda name: None)
+        monkeypatch.setattr(api_main, "load_backend", lambda name, path, **kwargs: model)
+        # The lifespan shuts the pools down, so every app instance gets its own
+        monkeypatch.setattr(api_main, "decode_pool", BoundedExecutor(2, 64, name="test-decode"))
+        monkeypatch.setattr(api_main, "job_decode_pool", api_main.ThreadPoolExecutor(max_workers=2))
+        monkeypatch.setattr(api_main, "_startup_error", None)
+        api_main._ready.clear()
+
+        client = TestClient(api_main.app)
+        client.__enter__()
+        clients.append(client)
+        deadline = time.time() + 10
+        while client.get("/health/ready").status_code != 200:
+            assert time.time() < deadline, api_main._startup_error
+            time.sleep(0.02)
+        return client
+
+    yield start
+    for client in clients:
+        client.__exit__(None, None, None)
+    api_main._ready.clear()
@@ -0,0 +1,88 @@
+import io
+import threading
+import time
+from collections import Counter
+
+from api.jobs import JobRunner, JobStore
+
+
+class Upload:
+    def __init__(self, name):
+        self.filename = name
+        self.file = io.BytesIO(name.encode())
+
+
+def make_job(store, images=6):
+    return store.create([Upload(f"img{i}.jpg") for i in range(images)])
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.02)
+
+
+def counting_process_fn(calls, lock, delay=0.02):
+    def process(paths):
+        time.sleep(delay)
+        with lock:
+            calls.update(paths)
+        return [{"disease": "a", "confidence": 90.0} for _ in paths], "v1"
+    return process
+
+
+def test_two_processes_never_infer_an_image_twice(tmp_path):
+    # Two runners with their own store connections stand in for two uvicorn worker processes
+    first, second = JobStore(tmp_path), JobStore(tmp_path)
+    job_id = make_job(first, images=12)
+    calls, lock = Counter(), threading.Lock()
+    runners = [JobRunner(store, counting_process_fn(calls, lock), lambda p: {"n": len(p)}, workers=2, batch_size=2)
+               for store in (first, second)]
+    for runner in runners:
+        runner.start()  # both find the queued job at startup
+        runner.submit(job_id)
+
+    wait_for(lambda: first.get(job_id)["status"] == "completed")
+    job = first.get(job_id)
+    assert set(calls.values()) == {1} and len(calls) == 12
+    assert job["done"] + job["failed"] == job["total"] == 12 and job["progress"] == 1.0
+    for runner in runners:
+        runner.close()
+
+
+def test_recording_a_batch_twice_does_not_overcount(tmp_path):
+    store = JobStore(tmp_path)
+    job_id = make_job(store, images=3)
+    results = [(0, {"disease": "a"}), (1, ValueError("bad"))]
+
+    store.record(job_id, results, "v1")
+    store.record(job_id, results, "v1")
+
+    job = store.get(job_id)
+    assert (job["done"], job["failed"]) == (1, 1)
+
+
+def test_live_lease_blocks_claim_and_expired_lease_is_taken_over(tmp_path):
+    store = JobStore(tmp_path)
+    job_id = make_job(store)
+
+    assert store.claim(job_id, "worker-a", lease_seconds=0.2)
+    assert not store.claim(job_id, "worker-b", lease_seconds=0.2)
+    assert job_id not in store.claimable()
+    time.sleep(0.3)
+    assert store.claimable() == [job_id]
+    assert store.claim(job_id, "worker-b", lease_seconds=0.2)
+    assert not store.renew(job_id, "worker-a", lease_seconds=0.2)
+
+
+def test_idle_runner_resumes_a_job_whose_worker_died(tmp_path):
+    store = JobStore(tmp_path)
+    job_id = make_job(store)
+    store.claim(job_id, "dead-worker", lease_seconds=0.2)
+    calls, lock = Counter(), threading.Lock()
+    runner = JobRunner(store, counting_process_fn(calls, lock), lambda p: {"n": len(p)}, lease_seconds=0.2).start()
+
+    wait_for(lambda: store.get(job_id)["status"] == "completed")
+    assert sum(calls.values()) == 6
+    runner.close()
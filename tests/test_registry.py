@@ -0,0 +1,35 @@
+from api.registry import ModelRegistry, ModelVersion
+from tests.conftest import FakeModel, jpeg_bytes
+
+
+class RemoteFake(FakeModel):
+    """Like RemoteBackend: the served model is identified by the version the server reports."""
+
+    version = "served0123456789"
+
+
+def test_remote_registry_needs_no_local_model_file(tmp_path):
+    loads = []
+
+    def load(path, labels_path):
+        loads.append(path)
+        return ModelVersion(RemoteFake.version, path, labels_path, ["a", "b"], RemoteFake(), None, RemoteFake.version)
+
+    registry = ModelRegistry(load, fingerprint_fn=None)
+    missing = tmp_path / "not-on-this-host.h5"
+    first = registry.reload(missing, tmp_path / "labels.txt")
+    second = registry.reload(missing, tmp_path / "labels.txt")
+
+    assert first.version == RemoteFake.version
+    # The candidate is loaded to ask for its version, then dropped in favour of the loaded one
+    assert second is first and registry.active is first
+    assert len(loads) == 2
+
+
+def test_remote_worker_serves_without_local_model_file(api_client, tmp_path):
+    client = api_client(RemoteFake(), MODEL_BACKEND="remote", MODEL_PATH=str(tmp_path / "missing.h5"))
+
+    response = client.post("/analyze_files", files=[("files", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+
+    assert response.status_code == 200
+    assert response.json()["model_version"] == RemoteFake.version
@@ -0,0 +1,51 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from api.tensors import CONTENT_TYPE, encode_payload
+from tests.conftest import FakeModel, jpeg_bytes
+
+
+def test_tensor_and_file_rows_share_float_batches(api_client):
+    # FAST_DECODE=0 feeds [0, 1] floats; tensor rows must join the same batch at the same scale
+    model = FakeModel(scale=1.0)
+    client = api_client(model, FAST_DECODE=False, BATCH_MAX_WAIT_MS=500.0)
+    jpeg = jpeg_bytes()
+    pixels = np.asarray(Image.open(io.BytesIO(jpeg)).convert("RGB"))
+    model.batches.clear()
+
+    with ThreadPoolExecutor(2) as pool:
+        files = pool.submit(client.post, "/analyze_files", files=[("files", ("a.jpg", jpeg, "image/jpeg"))])
+        tensors = pool.submit(client.post, "/analyze_tensors", content=encode_payload([pixels]),
+                              headers={"Content-Type": CONTENT_TYPE})
+        files, tensors = files.result(), tensors.result()
+
+    assert files.status_code == 200 and tensors.status_code == 200
+    assert [len(batch) for batch in model.batches] == [2]
+    assert all(batch.dtype == np.float32 and batch.max() <= 1.0 for batch in model.batches)
+    assert np.allclose(files.json()["per_image_predictions"][0]["all"],
+                       tensors.json()["per_image_predictions"][0]["all"], atol=1e-3)
+
+
+def test_tensor_rows_stay_uint8_with_fast_decode(api_client):
+    model = FakeModel(scale=255.0)
+    client = api_client(model, FAST_DECODE=True)
+    pixels = np.full((224, 224, 3), 128, dtype=np.uint8)
+    model.batches.clear()
+
+    response = client.post("/analyze_tensors", content=encode_payload([pixels]), headers={"Content-Type": CONTENT_TYPE})
+
+    assert response.status_code == 200
+    assert model.batches[0].dtype == np.uint8
+    assert np.array_equal(model.batches[0][0], pixels)
+
+
+def test_malformed_payload_is_rejected(api_client):
+    client = api_client(FakeModel())
+    body = encode_payload([np.zeros((224, 224, 3), dtype=np.uint8)])
+
+    response = client.post("/analyze_tensors", content=body[:-1], headers={"Content-Type": CONTENT_TYPE})
+
+    assert response.status_code == 400
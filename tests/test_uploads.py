@@ -0,0 +1,49 @@
+import pytest
+
+import api.uploads as uploads
+from tests.conftest import FakeModel, jpeg_bytes
+
+
+@pytest.fixture
+def opened_files(monkeypatch):
+    """Every spooled file the multipart parser opens, including a part rejected mid-stream."""
+    files = []
+
+    class RecordingParser(uploads.LimitedMultiPartParser):
+        def on_headers_finished(self):
+            super().on_headers_finished()
+            if self._current_part.file is not None:
+                files.append(self._current_part.file.file)
+
+    monkeypatch.setattr(uploads, "LimitedMultiPartParser", RecordingParser)
+    return files
+
+
+def test_too_many_files_closes_spooled_uploads(api_client, opened_files):
+    client = api_client(FakeModel(), MAX_FILES_PER_REQUEST=2)
+    image = jpeg_bytes()
+
+    response = client.post("/analyze_files", files=[("files", (f"{i}.jpg", image, "image/jpeg")) for i in range(3)])
+
+    assert response.status_code == 413
+    assert len(opened_files) == 2 and all(f.closed for f in opened_files)
+
+
+def test_oversized_file_closes_spooled_uploads(api_client, opened_files):
+    client = api_client(FakeModel(), MAX_FILE_BYTES=20_000)
+    small, big = jpeg_bytes(64, 64), jpeg_bytes(1024, 1024)
+    assert len(small) < 20_000 < len(big)
+
+    response = client.post("/analyze_files", files=[("files", ("a.jpg", small, "image/jpeg")),
+                                                    ("files", ("b.jpg", big, "image/jpeg"))])
+
+    assert response.status_code == 413
+    assert len(opened_files) == 2 and all(f.closed for f in opened_files)
+
+
+def test_non_multipart_body_is_rejected(api_client):
+    client = api_client(FakeModel())
+
+    response = client.post("/analyze_files", content=b"not a form")
+
+    assert response.status_code == 400